@@ -0,0 +1,126 @@
+"""Just enough of bpy and mathutils to import vpipeline_addon outside Blender
+
+Only the addon's NumPy helpers are tested with it: anything that reaches into
+real Blender data needs the fake meshes and palettes below, not the stub.
+"""
+
+import re, sys, types
+
+import numpy as np
+
+class _Classes(types.ModuleType):
+    # bpy.types: every name is a plain base class
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        cls = type(name, (), {})
+        setattr(self, name, cls)
+        return cls
+
+class _Props(types.ModuleType):
+    # bpy.props: property definitions are only annotations here
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: None
+
+class Collection(list):
+    """bpy_prop_collection look-alike: a list that is also looked up by name"""
+    def get(self, name, default=None):
+        return next((item for item in self if item.name == name), default)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            item = self.get(key)
+            if item is None:
+                raise KeyError(key)
+            return item
+        return list.__getitem__(self, key)
+
+class PaletteColor:
+    def __init__(self, color):
+        self.color = tuple(color)
+
+class Palette(dict):
+    """A palette with its ID properties as the dict items"""
+    def __init__(self, name, colors=()):
+        super().__init__()
+        self.name = name
+        self.colors = Collection(PaletteColor(c) for c in colors)
+
+    # ID blocks are always true and compare by identity, whatever their properties
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+    def __bool__(self):
+        return True
+
+class Buffer:
+    """Item data of a collection or attribute, read and written through foreach_get/set"""
+    def __init__(self, **props):
+        self.props = {key: np.asarray(value) for key, value in props.items()}
+
+    def __len__(self):
+        return len(next(iter(self.props.values())))
+
+    def foreach_get(self, prop, out):
+        out[:] = self.props[prop].ravel()
+
+    def foreach_set(self, prop, values):
+        self.props[prop] = np.asarray(values).reshape(self.props[prop].shape).copy()
+
+class Layer:
+    def __init__(self, name, data, domain='CORNER'):
+        self.name = name
+        self.data = data
+        self.domain = domain
+
+class Mesh(dict):
+    """Corner data of a mesh: vertex indices, normals, UV layers and color attributes
+
+    Its ID properties are the dict items, other attributes go in attributes.
+    """
+    def __init__(self, vertex_index, normals, uv_layers=(), colors=None):
+        super().__init__()
+        self.loops = Buffer(vertex_index=vertex_index)
+        self.corner_normals = Buffer(vector=normals)
+        self.uv_layers = Collection(Layer("UVMap" if i == 0 else f"UVMap.{i:03d}", Buffer(uv=uvs))
+                                    for i, uvs in enumerate(uv_layers))
+        self.color_attributes = Collection(Layer(name, Buffer(color_srgb=values))
+                                           for name, values in (colors or {}).items())
+        self.attributes = Collection()
+
+def install():
+    """Put the stub modules in sys.modules, unless a real bpy is importable"""
+    try:
+        import bpy
+        return bpy
+    except ImportError:
+        pass
+
+    bpy = types.ModuleType("bpy")
+    bpy.types = _Classes("bpy.types")
+    bpy.props = _Props("bpy.props")
+    bpy.app = types.SimpleNamespace(
+        background=True,
+        version=(4, 2, 0),
+        tempdir="",
+        handlers=types.SimpleNamespace(persistent=lambda func: func, load_post=[], depsgraph_update_post=[]),
+    )
+    bpy.data = types.SimpleNamespace(palettes=Collection(), objects=Collection(), materials=Collection())
+    # bpy.path.clean_name replaces everything but A-Z, a-z and 0-9
+    bpy.path = types.SimpleNamespace(clean_name=lambda name, replace="_": re.sub(r"[^A-Za-z0-9]", replace, name))
+
+    mathutils = types.ModuleType("mathutils")
+    mathutils.Vector = tuple
+    mathutils.Color = tuple
+    mathutils.bvhtree = types.ModuleType("mathutils.bvhtree")
+    mathutils.bvhtree.BVHTree = type("BVHTree", (), {})
+    mathutils.kdtree = types.ModuleType("mathutils.kdtree")
+    mathutils.kdtree.KDTree = type("KDTree", (), {})
+
+    sys.modules.update({
+        "bpy": bpy, "bpy.types": bpy.types, "bpy.props": bpy.props,
+        "mathutils": mathutils, "mathutils.bvhtree": mathutils.bvhtree, "mathutils.kdtree": mathutils.kdtree,
+    })
+    return bpy
@@ -0,0 +1,220 @@
+"""The addon's NumPy helpers, run outside Blender against a stubbed bpy"""
+
+import os, sys, zlib
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy_stub
+
+bpy = bpy_stub.install()
+
+import vpipeline_addon as va
+
+PALETTE = [(0.8, 0.1, 0.1), (0.1, 0.8, 0.1), (0.1, 0.1, 0.8), (0.5, 0.5, 0.5)]
+
+def reference_slots(codes, colors, tol):
+    """The dense table's rule for each code: the last entry within tol, else -1"""
+    rgb = np.stack([(codes >> 16) & 255, (codes >> 8) & 255, codes & 255], -1).astype(np.float32) / np.float32(255.0)
+    slots = np.full(len(codes), -1, dtype=np.int16)
+    for index, color in enumerate(colors):
+        slots[va.color_distance(rgb, color) <= tol] = index
+    return slots
+
+def test_palette_lut_matches_dense_rule():
+    lut = va.build_palette_lut(PALETTE, 0.01)
+
+    # random codes plus every code around each entry, edges of the tolerance included
+    rng = np.random.default_rng(3)
+    offsets = np.stack(np.meshgrid(*[np.arange(-5, 6)] * 3, indexing='ij'), -1).reshape(-1, 3)
+    near = [np.clip(np.rint(np.array(c) * 255.0) + offsets, 0, 255).astype(np.uint32) for c in PALETTE]
+    near = np.concatenate(near)
+    codes = np.concatenate([rng.integers(0, 1 << 24, 20000).astype(np.uint32),
+                            (near[:, 0] << 16) | (near[:, 1] << 8) | near[:, 2]])
+    expected = reference_slots(codes, PALETTE, 0.01)
+    assert (expected >= 0).any()
+    assert (lut[codes] == expected).all()
+
+def test_palette_lut_overlap_keeps_later_entry():
+    lut = va.build_palette_lut([(0.5, 0.5, 0.5), (0.5, 0.5, 0.5)], 0.01)
+    assert lut[va.color_codes(np.array([0.5, 0.5, 0.5]))] == 1
+
+def test_palette_lut_is_cached_until_colors_change():
+    palette = bpy_stub.Palette("LutPalette", PALETTE)
+    first = va.palette_lut(palette)
+    assert va.palette_lut(palette) is first
+
+    palette.colors[0].color = (0.0, 0.0, 0.0)
+    second = va.palette_lut(palette)
+    assert second is not first
+    assert second[va.color_codes(np.array([0.0, 0.0, 0.0]))] == 0
+
+def shift_uvs_per_corner(uvs, indices, axis, map):
+    """The per-corner loop Map/Restore UVs ran before it was vectorized"""
+    out = uvs.copy()
+    for i, slot in enumerate(indices.tolist()):
+        if slot < 0:
+            continue
+        u = float(out[i, axis])
+        u -= np.floor(u)
+        if map:
+            u += slot
+        out[i, axis] = u
+    return out
+
+@pytest.mark.parametrize("map", [True, False])
+def test_shift_uvs_matches_per_corner_loop(map):
+    rng = np.random.default_rng(5)
+    uvs = (rng.random((1000, 2)) * 6.0 - 2.0).astype(np.float32)
+    uvs[:10] = [[0.0, 0.0], [0.0, 0.5], [1.0, 1.0], [2.0, -1.0], [0.999999, 3.0]] * 2
+    for axis in (0, 1):
+        indices = rng.integers(-1, 4, len(uvs)).astype(np.int16)
+        expected = shift_uvs_per_corner(uvs, indices, axis, map)
+        va.shift_uvs(uvs, indices, axis, map)
+        assert uvs.tobytes() == expected.tobytes()
+
+def test_restore_keeps_uvs_in_unit_range():
+    uvs = np.array([[0.0, 0.0], [0.5, 0.5], [1.0, 1.0], [3.25, 2.75]], dtype=np.float32)
+    for axis in (0, 1):
+        va.shift_uvs(uvs, np.zeros(len(uvs), dtype=np.int16), axis, map=False)
+    assert (uvs >= 0.0).all() and (uvs < 1.0).all()
+    assert uvs[:, 1].tolist() == [0.0, 0.5, 0.0, 0.75]
+
+def test_mapped_slots_survive_the_exporters_v_flip():
+    import vpipeline_gltf as vg
+    rng = np.random.default_rng(9)
+    uvs = rng.random((500, 2)).astype(np.float32)
+    uvs[:4] = 0.0
+    slots = rng.integers(0, 4, (len(uvs), 2))
+    for axis in (0, 1):
+        va.shift_uvs(uvs, slots[:, axis].astype(np.int16), axis)
+
+    # what the glTF exporter writes: v' = 1 - v, in float32
+    exported = uvs.copy()
+    exported[:, 1] = np.float32(1.0) - exported[:, 1]
+    assert (vg.uv_slots(exported) == slots).all()
+
+def quad_strip_mesh(colors):
+    """Two quads sharing an edge: 6 vertices, 8 corners, a flat normal and one UV layer"""
+    loops = np.array([0, 1, 4, 3, 1, 2, 5, 4])
+    uvs = np.array([[0, 0], [0.5, 0], [0.5, 1], [0, 1], [0.5, 0], [1, 0], [1, 1], [0.5, 1]], dtype=np.float32)
+    normals = np.tile(np.float32([0.0, 0.0, 1.0]), (len(loops), 1))
+    return bpy_stub.Mesh(loops, normals, [uvs], colors)
+
+def test_vertex_splits_with_uv_layer():
+    per_vertex = np.ones((8, 4), dtype=np.float32)
+    per_vertex[:, 0] = np.array([0, 1, 4, 3, 1, 2, 5, 4]) / 10.0
+    per_face = np.ones((8, 4), dtype=np.float32)
+    per_face[4:, 0] = 0.5
+
+    mesh = quad_strip_mesh({"AO": per_vertex, "ColorX": per_face})
+    stats, before, after = va.vertex_splits(mesh, ["AO", "ColorX"], movable=["AO"])
+
+    # the UVs are continuous across the shared edge, so only ColorX splits its 2 vertices
+    assert before == after == 8
+    assert stats["AO"] == (1.0, True)
+    assert stats["ColorX"] == (8 / 6, False)
+
+def test_unique_rows_counts_uv_pairs():
+    uvs = np.array([[0, 0], [0, 0], [0, 1], [0, 0]], dtype=np.float32)
+    assert va.unique_rows([np.array([0, 0, 0, 1]), uvs]) == 3
+
+def test_fingerprints_are_per_chunk_crcs():
+    rng = np.random.default_rng(11)
+    n = 3 * va.FINGERPRINT_CHUNK + 5
+    codes = [rng.integers(0, 1 << 24, n).astype(np.uint32) for _ in range(2)]
+    uvs = rng.random((n, 2)).astype(np.float32)
+
+    rows = np.ascontiguousarray(np.column_stack(codes + [uvs.view(np.uint32)]))
+    expected = [zlib.crc32(rows[s:e]) for s, e in va.chunk_spans(n, va.FINGERPRINT_CHUNK)]
+    assert va.fingerprints(codes, uvs).view(np.uint32).tolist() == expected
+
+def painted_mesh(n, palettes):
+    rng = np.random.default_rng(13)
+    colors = {}
+    for name, palette in palettes.items():
+        rgba = np.ones((n, 4), dtype=np.float32)
+        rgba[:, :3] = np.array(palette)[rng.integers(0, len(palette), n)]
+        colors[name] = rgba
+    uvs = rng.random((n, 2)).astype(np.float32)
+    return bpy_stub.Mesh(np.arange(n), np.zeros((n, 3), dtype=np.float32), [uvs], colors)
+
+def test_plan_steps_rewrite_only_changed_chunks():
+    names = ("PlanColors", "PlanMetals")
+    for name in names:
+        bpy.data.palettes.append(bpy_stub.Palette(name, PALETTE))
+    n = 3 * va.FINGERPRINT_CHUNK + 100
+    mesh = painted_mesh(n, dict.fromkeys(names, PALETTE))
+
+    uvs, codes, key, corners = va.map_plan(mesh, names, True)
+    assert corners.tolist() == list(range(n))
+
+    # after a map: fingerprints stored and both index attributes present
+    va.store_fingerprints(mesh, key, va.fingerprints(codes, uvs))
+    for name in names:
+        mesh.attributes.append(bpy_stub.Layer(va.index_name(name), bpy_stub.Buffer(value=np.zeros(n, np.int32))))
+    assert len(va.map_plan(mesh, names, True)[3]) == 0
+
+    # a repainted corner dirties its own chunk only
+    colors = mesh.color_attributes["PlanMetals"].data.props["color_srgb"]
+    colors[va.FINGERPRINT_CHUNK + 7, :3] = 0.0
+    corners = va.map_plan(mesh, names, True)[3]
+    assert corners.tolist() == list(range(va.FINGERPRINT_CHUNK, 2 * va.FINGERPRINT_CHUNK))
+
+    # restore, or a palette edit, touches everything again
+    assert len(va.map_plan(mesh, names, False)[3]) == n
+    bpy.data.palettes["PlanColors"].colors[0].color = (0.0, 0.0, 0.0)
+    assert len(va.map_plan(mesh, names, True)[3]) == n
+
+@pytest.mark.parametrize("trace_memory", [False, True])
+def test_recording_traces_memory_only_when_asked(trace_memory):
+    import tracemalloc
+    rec = va.Recording("Test", trace_memory=trace_memory)
+    assert tracemalloc.is_tracing() == trace_memory
+    rec.resume()
+    with va.phase("allocate"):
+        data = [bytes(1000) for _ in range(100)]
+    va.count("items", len(data))
+    rec.finish()
+
+    assert not tracemalloc.is_tracing()
+    assert rec.counters == {"items": 100}
+    assert [name for name, seconds, calls in rec.summary] == ["allocate"]
+    assert (rec.peak is not None) == trace_memory
+    if trace_memory:
+        assert rec.peak >= 100 * 1000
+
+def mesh_object(name, color=None, metal=None):
+    return SimpleNamespace(name=name, type='MESH',
+                           VPipelineObjectProps=SimpleNamespace(color_palette=color, metal_palette=metal))
+
+def test_override_rows_are_persistent(monkeypatch):
+    palettes = bpy_stub.Collection(bpy_stub.Palette(name, PALETTE) for name in
+                                   ("Colors", "Metals", "Red", "Blue", "Chrome", "Rust"))
+    monkeypatch.setattr(bpy.data, "palettes", palettes)
+    props = SimpleNamespace(color_name="Colors", metal_name="Metals")
+    red, blue, chrome, rust = (palettes[name] for name in ("Red", "Blue", "Chrome", "Rust"))
+
+    objects = [mesh_object("b", blue, chrome), mesh_object("a", red, chrome),
+               mesh_object("plain"), mesh_object("c", red)]
+    pairs, rows = va.palette_overrides(objects, props)
+    # new pairs are numbered in object name order, the metal defaults to Metals
+    assert rows == {"a": 1, "b": 2, "c": 3, "plain": 0}
+    assert pairs[1:] == [(red, chrome), (blue, chrome), (red, palettes["Metals"])]
+
+    # an object named to sort first doesn't move the rows already handed out
+    objects.append(mesh_object("0", blue, rust))
+    pairs, rows = va.palette_overrides(objects, props)
+    assert rows == {"0": 4, "a": 1, "b": 2, "c": 3, "plain": 0}
+
+    # a pair whose palette is gone leaves its row to the default pair
+    palettes.remove(chrome)
+    objects = [o for o in objects if o.VPipelineObjectProps.metal_palette is not chrome]
+    pairs, rows = va.palette_overrides(objects, props)
+    default = (palettes["Colors"], palettes["Metals"])
+    assert pairs == [default, default, default, (red, palettes["Metals"]), (blue, rust)]
+    assert rows == {"0": 4, "c": 3, "plain": 0}
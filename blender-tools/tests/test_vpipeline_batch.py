@@ -0,0 +1,53 @@
+"""Batch script helpers that don't need a Blender process, against a stubbed bpy"""
+
+import os, sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy_stub
+
+bpy_stub.install()
+
+import vpipeline_batch as vb
+
+def test_output_stems_keep_colliding_names_apart():
+    names = ["Rock_001", "Rock.001", "rock.001", "Crate", "Rock_001_2"]
+    stems = vb.output_stems([SimpleNamespace(name=n) for n in names])
+
+    assert stems["Crate"] == "Crate"
+    assert len({s.lower() for s in stems.values()}) == len(names)
+    # name order decides who keeps the plain file name
+    assert stems["Rock.001"] == "Rock_001"
+    assert stems["Rock_001"] == "Rock_001_2"
+
+def write_export(path, text):
+    with open(path, "w") as f:
+        f.write('{"asset": {"version": "2.0"}, "extras": "%s"}' % text)
+
+def test_forced_store_replaces_cache_entry(tmp_path):
+    entry = str(tmp_path / "cache" / "abc")
+    os.makedirs(os.path.dirname(entry))
+    out = tmp_path / "out"
+    out.mkdir()
+    filepath = str(out / "Crate.gltf")
+
+    write_export(filepath, "old")
+    vb.cache_store(entry, filepath)
+    write_export(filepath, "new")
+    vb.cache_store(entry, filepath)
+    with open(os.path.join(entry, "Crate.gltf")) as f:
+        assert "old" in f.read()
+
+    vb.cache_store(entry, filepath, replace=True)
+    os.remove(filepath)
+    with open(vb.cache_fetch(entry, str(out))) as f:
+        assert "new" in f.read()
+    assert os.listdir(os.path.dirname(entry)) == ["abc"]
+
+def test_instance_flag_is_part_of_the_cache_key():
+    plain = vb.parse_args(["assets", "--out", "export"])
+    instanced = vb.parse_args(["assets", "--out", "export", "--instance"])
+    assert instanced.instance and not plain.instance
+    assert vb.worker_options(instanced) != vb.worker_options(plain)
@@ -0,0 +1,288 @@
+"""Round trips of vpipeline_gltf.py on the demo asset, no Blender needed"""
+
+import json, os, shutil, struct, sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import vpipeline_gltf as vg
+
+ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "godot-project", "assets")
+PALETTES = vg.shader_palettes(vg.DEFAULT_SHADER)
+SIZES = {name: len(p) for name, p in PALETTES.items()}
+
+@pytest.fixture
+def painted(tmp_path):
+    """test.gltf with ColorX/MetalX painted as COLOR_1/COLOR_2, returns (path, color slots, metal slots)"""
+    for ext in (".gltf", ".bin"):
+        shutil.copy(os.path.join(ASSETS, "test" + ext), tmp_path / ("test" + ext))
+    path = str(tmp_path / "test.gltf")
+
+    asset = vg.Asset(path)
+    prim = next(prim for mesh_index, prim in asset.primitives())
+    count = asset.accessors[prim["attributes"]["POSITION"]]["count"]
+
+    rng = np.random.default_rng(7)
+    slots = {}
+    for attr, name in (("COLOR_1", "colors"), ("COLOR_2", "metals")):
+        slots[name] = rng.integers(0, SIZES[name], count)
+        colors = np.ones((count, 4), dtype=np.float32)
+        colors[:, :3] = vg.srgb_to_linear(np.array(PALETTES[name]))[slots[name]]
+        prim["attributes"][attr] = asset.add_accessor(colors)
+    asset.save()
+    return path, slots["colors"], slots["metals"]
+
+def first_primitive(path):
+    asset = vg.Asset(path)
+    return asset, next(prim for mesh_index, prim in asset.primitives())
+
+def test_encode_writes_slots(painted):
+    path, colors, metals = painted
+    assert vg.encode(path, PALETTES) == 1
+
+    asset, prim = first_primitive(path)
+    slots = vg.uv_slots(asset.accessor_float(prim["attributes"]["TEXCOORD_1"]))
+    assert (slots[:, 0] == colors).all()
+    assert (slots[:, 1] == metals).all()
+
+    report = vg.validate([path], SIZES, jobs=1)
+    assert report["failed"] == 0, report["results"][0]["errors"]
+
+def test_encode_keeps_fraction(painted):
+    path, colors, metals = painted
+    asset, prim = first_primitive(path)
+    before = asset.accessor_float(prim["attributes"]["TEXCOORD_1"]).copy()
+
+    vg.encode(path, PALETTES)
+    asset, prim = first_primitive(path)
+    after = asset.accessor_float(prim["attributes"]["TEXCOORD_1"])
+    assert np.allclose(after - np.floor(after), before - np.floor(before), atol=1e-5)
+
+def test_demo_asset_validates():
+    # exported from Blender through Map UVs, so its V holds the exporter's flip
+    result = vg.validate_file(os.path.join(ASSETS, "test.gltf"), SIZES)
+    assert result["ok"], result["errors"]
+
+def break_asset(path, uvs=None, indices=None):
+    """Rewrite TEXCOORD_1 and/or the indices of the first primitive"""
+    asset, prim = first_primitive(path)
+    if uvs is not None:
+        prim["attributes"]["TEXCOORD_1"] = asset.add_accessor(uvs(asset.accessor_float(prim["attributes"]["TEXCOORD_1"])))
+    if indices is not None:
+        data = indices(asset.accessor(prim["indices"]).copy())
+        prim["indices"] = asset.add_accessor(data, target=vg.ELEMENT_ARRAY_BUFFER)
+    asset.save()
+
+def test_validate_flags_nan_uvs_slots_and_indices(painted):
+    path, colors, metals = painted
+    vg.encode(path, PALETTES)
+
+    def uvs(data):
+        data = data.copy()
+        data[0] = np.nan
+        data[1, 1] -= SIZES["metals"]
+        return data
+
+    def indices(data):
+        data[-1] = len(colors)
+        return data
+
+    break_asset(path, uvs, indices)
+    result = vg.validate_file(path, SIZES)
+    assert not result["ok"]
+    errors = "\n".join(result["errors"])
+    assert "TEXCOORD_1: 1 NaN/inf UVs" in errors
+    assert "metals slots outside" in errors and "colors slots" not in errors
+    assert f"indices reach {len(colors)}, only {len(colors)} vertices" in errors
+
+def test_validate_reports_unreadable_files(tmp_path):
+    path = tmp_path / "broken.gltf"
+    path.write_text("{")
+    result = vg.validate_file(str(path), SIZES)
+    assert not result["ok"] and result["errors"][0].startswith("JSONDecodeError")
+
+def test_validate_cli_over_a_directory(painted, tmp_path):
+    path, colors, metals = painted
+    vg.encode(path, PALETTES)
+    for name in ("good", "bad"):
+        os.makedirs(tmp_path / "assets" / name)
+        for ext in (".gltf", ".bin"):
+            shutil.copy(os.path.splitext(path)[0] + ext, tmp_path / "assets" / name / ("test" + ext))
+    break_asset(str(tmp_path / "assets" / "bad" / "test.gltf"), indices=lambda data: data + len(colors))
+
+    report_path = str(tmp_path / "report.json")
+    args = ["validate", str(tmp_path / "assets"), "--jobs", "2", "--report", report_path]
+    assert vg.main(args) == 1
+    with open(report_path) as f:
+        report = json.load(f)
+    assert (report["files"], report["failed"]) == (2, 1)
+    assert [r["ok"] for r in report["results"]] == [False, True]
+
+    assert vg.main(["validate", str(tmp_path / "assets" / "good")]) == 0
+
+def test_optimize_keeps_triangles(painted, tmp_path):
+    path, colors, metals = painted
+
+    def triangles(path):
+        asset, prim = first_primitive(path)
+        pos = asset.accessor_float(prim["attributes"]["POSITION"])
+        tris = pos[asset.accessor(prim["indices"]).ravel().astype(np.int64)].reshape(-1, 9)
+        return sorted(map(tuple, np.round(tris, 5).tolist()))
+
+    before = triangles(path)
+    out = str(tmp_path / "optimized.gltf")
+    results = vg.optimize(path, out)
+    assert len(results) == 1
+    (acmr_before, atvr_before), (acmr_after, atvr_after) = results[0][1]
+    assert acmr_after <= acmr_before
+    assert triangles(out) == before
+
+def sphere(rings=20, segments=40):
+    """UV sphere positions and its triangles in random order"""
+    theta = np.linspace(0.0, np.pi, rings)[:, None]
+    phi = np.linspace(0.0, 2.0 * np.pi, segments, endpoint=False)
+    positions = np.stack([np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi),
+                          np.cos(theta) * np.ones_like(phi)], -1).reshape(-1, 3)
+    a = (np.arange(rings - 1)[:, None] * segments + np.arange(segments)).ravel()
+    b = (a // segments) * segments + (a + 1) % segments
+    tris = np.concatenate([np.stack([a, a + segments, b], 1), np.stack([b, a + segments, b + segments], 1)])
+    return positions, tris[np.random.default_rng(1).permutation(len(tris))]
+
+def test_overdraw_clusters_keep_cache_order_cost():
+    positions, tris = sphere()
+    tris = tris[vg.tipsify(tris, len(positions))]
+    acmr = vg.cache_stats(tris.ravel())[0]
+
+    starts = vg.overdraw_clusters(tris, 1.05)
+    order = vg.overdraw_order(tris, positions, starts)
+    assert len(starts) > 1
+    assert sorted(order.tolist()) == list(range(len(tris)))
+    assert vg.cache_stats(tris[order].ravel())[0] <= acmr * 1.1
+
+def test_overdraw_order_draws_outer_cluster_first():
+    # two stacked quads facing +z: the upper one hides the lower one from above
+    positions = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0],
+                          [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]], dtype=np.float32)
+    tris = np.array([[0, 1, 2], [0, 2, 3], [4, 5, 6], [4, 6, 7]])
+    order = vg.overdraw_order(tris, positions, np.array([0, 2]))
+    assert order.tolist() == [2, 3, 0, 1]
+
+def test_instance_collapses_repeats(painted, tmp_path):
+    path, colors, metals = painted
+    with open(path) as f:
+        gltf = json.load(f)
+    node = next(i for i, n in enumerate(gltf["nodes"]) if "mesh" in n)
+    for x in (3.0, 6.0):
+        gltf["nodes"].append(dict(gltf["nodes"][node], translation=[x, 0.0, 0.0]))
+        gltf["scenes"][0]["nodes"].append(len(gltf["nodes"]) - 1)
+    with open(path, "w") as f:
+        json.dump(gltf, f)
+
+    out = str(tmp_path / "instanced.gltf")
+    meshes, instanced, before, after = vg.instance(path, out)
+    assert instanced == 3
+
+    asset = vg.Asset(out)
+    nodes = [n for n in asset.gltf["nodes"] if "extensions" in n]
+    assert len(nodes) == 1
+    attributes = nodes[0]["extensions"][vg.INSTANCING]["attributes"]
+    translations = asset.accessor(attributes["TRANSLATION"])
+    assert sorted(translations[:, 0].tolist())[1:] == [3.0, 6.0]
+    # Godot 4.3 refuses files requiring an extension it doesn't read
+    assert vg.INSTANCING in asset.gltf["extensionsUsed"]
+    assert "extensionsRequired" not in asset.gltf
+
+def read_floats(gltf, base_dir, index):
+    """A float accessor read the way vpipeline_import.gd reads it, one list per element"""
+    accessor = gltf["accessors"][index]
+    view = gltf["bufferViews"][accessor["bufferView"]]
+    assert accessor["componentType"] == 5126
+    with open(os.path.join(base_dir, gltf["buffers"][view["buffer"]]["uri"]), "rb") as f:
+        data = f.read()
+    width = {"SCALAR": 1, "VEC3": 3, "VEC4": 4}[accessor["type"]]
+    start = view.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+    stride = view.get("byteStride", width * 4)
+    return [list(struct.unpack_from(f"<{width}f", data, start + i * stride)) for i in range(accessor["count"])]
+
+def test_instanced_palette_rows_import(painted, tmp_path):
+    path, colors, metals = painted
+    with open(path) as f:
+        gltf = json.load(f)
+    node = next(i for i, n in enumerate(gltf["nodes"]) if "mesh" in n)
+    gltf["nodes"][node]["extras"] = {"vp_palette_row": 2}
+    for x, row in ((3.0, 0), (6.0, 5)):
+        gltf["nodes"].append(dict(gltf["nodes"][node], translation=[x, 0.0, 0.0], extras={"vp_palette_row": row}))
+        gltf["scenes"][0]["nodes"].append(len(gltf["nodes"]) - 1)
+    with open(path, "w") as f:
+        json.dump(gltf, f)
+
+    out = str(tmp_path / "instanced.gltf")
+    assert vg.instance(path, out)[1] == 3
+    with open(out) as f:
+        gltf = json.load(f)
+    assert gltf["extensionsUsed"] == [vg.INSTANCING] and "extensionsRequired" not in gltf
+
+    # what the post-import script turns into MultiMesh transforms and custom data
+    node = next(n for n in gltf["nodes"] if vg.INSTANCING in n.get("extensions", {}))
+    attributes = node["extensions"][vg.INSTANCING]["attributes"]
+    translations = read_floats(gltf, str(tmp_path), attributes["TRANSLATION"])
+    rows = read_floats(gltf, str(tmp_path), attributes["_PALETTE_ROW"])
+    assert len(rows) == len(translations) == 3
+    by_x = {round(t[0]): int(r[0]) for t, r in zip(translations, rows)}
+    assert by_x[3] == 0 and by_x[6] == 5 and list(by_x.values()).count(2) == 1
+
+def test_quantize_packs_slots(painted):
+    path, colors, metals = painted
+    vg.encode(path, PALETTES)
+    asset, prim = first_primitive(path)
+    masks = asset.accessor_float(prim["attributes"]["COLOR_0"])[:, :2].copy()
+    fraction = asset.accessor_float(prim["attributes"]["TEXCOORD_1"])
+    fraction = fraction - np.floor(fraction)
+
+    before, after, errors = vg.quantize(path, PALETTES)
+    assert not errors and after < before
+
+    asset, prim = first_primitive(path)
+    packed = asset.accessor(prim["attributes"]["COLOR_0"])
+    assert (packed[:, 2] == colors).all() and (packed[:, 3] == metals).all()
+    assert np.abs(packed[:, :2] / 255.0 - masks).max() <= 0.5 / 255.0 + 1e-6
+    assert np.abs(asset.accessor_float(prim["attributes"]["TEXCOORD_1"]) - fraction).max() < 1e-4
+    assert "extensionsRequired" not in asset.gltf
+    assert vg.is_quantized(asset, prim)
+    assert vg.validate([path], SIZES, jobs=1)["failed"] == 0
+
+def test_quantize_refuses_unencoded(painted):
+    path, colors, metals = painted
+    with open(path) as f:
+        original = f.read()
+
+    before, after, errors = vg.quantize(path, PALETTES)
+    assert any("run encode first" in e for e in errors)
+    with open(path) as f:
+        assert f.read() == original
+
+def test_quantize_refuses_out_of_range_slots(tmp_path):
+    for ext in (".gltf", ".bin"):
+        shutil.copy(os.path.join(ASSETS, "test" + ext), tmp_path / ("test" + ext))
+    path = str(tmp_path / "test.gltf")
+    asset, prim = first_primitive(path)
+    uvs = asset.accessor_float(prim["attributes"]["TEXCOORD_1"])
+    uvs[:, 1] -= SIZES["metals"]
+    prim["attributes"]["TEXCOORD_1"] = asset.add_accessor(uvs.astype(np.float32))
+    asset.save()
+    with open(path) as f:
+        original = f.read()
+
+    before, after, errors = vg.quantize(path, PALETTES)
+    assert any("metals slots outside" in e for e in errors)
+    with open(path) as f:
+        assert f.read() == original
+
+def test_encode_without_palette_colors_writes_nothing(tmp_path):
+    for ext in (".gltf", ".bin"):
+        shutil.copy(os.path.join(ASSETS, "test" + ext), tmp_path / ("test" + ext))
+    out = tmp_path / "encoded.gltf"
+    assert vg.encode(str(tmp_path / "test.gltf"), PALETTES, str(out)) == 0
+    assert not out.exists()
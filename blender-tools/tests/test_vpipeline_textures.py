@@ -0,0 +1,137 @@
+"""PNG and BC3 checks for vpipeline_textures.py against small scalar references"""
+
+import os, struct, sys, zlib
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import vpipeline_textures as vt
+
+def paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+def filter_rows(pixels, kinds):
+    """Scalar PNG filter encoder, one filter type per row"""
+    height, width, channels = pixels.shape
+    rows = pixels.reshape(height, -1).astype(int).tolist()
+    out = bytearray()
+    for y, (row, kind) in enumerate(zip(rows, kinds)):
+        up = rows[y - 1] if y else [0] * len(row)
+        out.append(kind)
+        for x, value in enumerate(row):
+            left = row[x - channels] if x >= channels else 0
+            upleft = up[x - channels] if x >= channels else 0
+            predict = (0, left, up[x], (left + up[x]) // 2, paeth(left, up[x], upleft))[kind]
+            out.append((value - predict) & 0xFF)
+    return bytes(out)
+
+def write_filtered_png(path, pixels, kinds):
+    height, width, channels = pixels.shape
+    color_type = {1: 0, 2: 4, 3: 2, 4: 6}[channels]
+
+    def chunk(kind, body):
+        return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+    with open(path, "wb") as f:
+        f.write(vt.PNG_SIGNATURE)
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(filter_rows(pixels, kinds))))
+        f.write(chunk(b"IEND", b""))
+
+@pytest.mark.parametrize("channels", [1, 2, 3, 4])
+def test_read_png_every_filter(tmp_path, channels):
+    rng = np.random.default_rng(channels)
+    pixels = rng.integers(0, 256, (10, 7, channels), dtype=np.uint8)
+    path = str(tmp_path / "filtered.png")
+    write_filtered_png(path, pixels, [0, 1, 2, 3, 4, 4, 3, 2, 1, 0])
+    assert (vt.read_png(path) == pixels).all()
+
+def test_png_round_trip(tmp_path):
+    pixels = np.random.default_rng(1).integers(0, 256, (9, 13, 4), dtype=np.uint8)
+    path = str(tmp_path / "round.png")
+    vt.write_png(path, pixels)
+    assert (vt.read_png(path) == pixels).all()
+
+def decode_bc3(data, width, height):
+    """Reference BC3 decoder for the top level"""
+    blocks = np.frombuffer(data, dtype=np.uint8).reshape(-1, 16)
+    out = np.zeros((-(-height // 4) * 4, -(-width // 4) * 4, 4), dtype=np.float32)
+    for i, block in enumerate(blocks):
+        by, bx = divmod(i, out.shape[1] // 4)
+        a0, a1 = float(block[0]), float(block[1])
+        alphas = [a0, a1] + ([((7 - k) * a0 + k * a1) / 7 for k in range(1, 7)] if a0 > a1
+                             else [((5 - k) * a0 + k * a1) / 5 for k in range(1, 5)] + [0.0, 255.0])
+        abits = int.from_bytes(bytes(block[2:8]), "little")
+        c0, c1 = (int.from_bytes(bytes(block[o:o + 2]), "little") for o in (8, 10))
+        e0, e1 = vt.expand565(np.array(c0)), vt.expand565(np.array(c1))
+        colors = [e0, e1, (2 * e0 + e1) / 3, (e0 + 2 * e1) / 3] if c0 > c1 else [e0, e1, (e0 + e1) / 2, e0 * 0]
+        cbits = int.from_bytes(bytes(block[12:16]), "little")
+        for t in range(16):
+            y, x = divmod(t, 4)
+            out[by * 4 + y, bx * 4 + x, :3] = colors[(cbits >> (2 * t)) & 3]
+            out[by * 4 + y, bx * 4 + x, 3] = alphas[(abits >> (3 * t)) & 7]
+    return out[:height, :width]
+
+def test_bc3_decodes_close_to_source():
+    # colors along a line per block, which BC3 endpoints can represent
+    y, x = np.mgrid[0:16, 0:12]
+    t = x * 10 + y * 4
+    level = np.stack([t, 255 - t, np.full_like(x, 200), (x + y) * 9], axis=-1).astype(np.uint8)
+    decoded = decode_bc3(vt.bc3_blocks(level), 12, 16)
+    error = np.abs(decoded - level.astype(np.float32))
+    assert error[..., :3].max() <= 12.0
+    assert error[..., 3].max() <= 5.0
+
+def test_bc3_flat_blocks_exact():
+    level = np.zeros((8, 8, 4), dtype=np.uint8)
+    level[..., :] = (255, 0, 255, 37)
+    decoded = decode_bc3(vt.bc3_blocks(level), 8, 8)
+    assert (decoded == level).all()
+
+def test_mip_chain_renormalizes():
+    rng = np.random.default_rng(3)
+    packed = rng.integers(0, 256, (8, 8, 4), dtype=np.uint8)
+    levels = vt.mip_chain(packed)
+    assert [l.shape[:2] for l in levels] == [(8, 8), (4, 4), (2, 2), (1, 1)]
+    for level in levels[1:]:
+        n = level[..., :3].astype(np.float32) / 255.0 * 2.0 - 1.0
+        assert np.allclose(np.linalg.norm(n, axis=-1), 1.0, atol=0.02)
+
+def test_pack_puts_scratches_in_alpha():
+    trim = np.random.default_rng(4).integers(0, 65536, (6, 5, 3), dtype=np.uint16)
+    scratches = np.arange(30, dtype=np.uint8).reshape(6, 5, 1)
+    packed = vt.pack(trim, scratches)
+    assert (packed[..., :3] == vt.to_8bit(trim)).all()
+    assert (packed[..., 3] == scratches[..., 0]).all()
+
+    with pytest.raises(ValueError):
+        vt.pack(trim, scratches[:4])
+
+@pytest.mark.parametrize("format", vt.DDS_FORMATS)
+def test_dds_header_and_levels(tmp_path, format):
+    levels = vt.mip_chain(np.random.default_rng(6).integers(0, 256, (16, 8, 4), dtype=np.uint8))
+    path = str(tmp_path / "packed.dds")
+    size = vt.write_dds(path, levels, format)
+
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data[:4] == b"DDS "
+    header_size, flags, height, width, pitch, depth, mips = struct.unpack("<7I", data[4:32])
+    assert (header_size, height, width, mips) == (124, 16, 8, len(levels))
+    assert len(data) == 4 + 124 + size
+
+    fourcc = data[84:88]
+    if format == "bc3":
+        # one 16 byte block per 4x4 texels, a partial block still takes a whole one
+        assert fourcc == b"DXT5"
+        assert pitch == 2 * 4 * 16
+        assert size == sum(-(-l.shape[0] // 4) * -(-l.shape[1] // 4) * 16 for l in levels)
+    else:
+        assert pitch == 8 * 4
+        assert data[128:128 + 16 * 8 * 4] == levels[0].tobytes()
@@ -9,8 +9,13 @@ bl_info = {
     "category": "Generic"
 }
 
-import bpy, math
+import bpy, math, os, json, time, zlib
+import cProfile, collections, contextlib, functools, tempfile, tracemalloc
+import multiprocessing
+import numpy as np
 from mathutils import Vector, Color
+from mathutils.bvhtree import BVHTree
+from mathutils.kdtree import KDTree
 from bpy.types import (
             Operator,
             PropertyGroup, 
@@ -27,13 +32,17 @@ from bpy.props import (
             PointerProperty,
             CollectionProperty
         )
-    
+
+# palette slots are encoded as integer UV offsets and stored as int16 indices
+MAX_PALETTE_SIZE = 256
+
 ### PROPS
 
 class VPipelineProperties(PropertyGroup):
     color_name : StringProperty(name = "Color Vertex Data", default = "ColorX", description = "Color Vertex Data")
     metal_name : StringProperty(name = "Metal/Rough Vertex Data", default = "MetalX", description = "Color Vertex Data")
     v_name : StringProperty(name = "V Name", default = "", description = "Current Vertex Data Name")
+    palette_size : IntProperty(name = "Palette Size", default = 4, min = 1, max = MAX_PALETTE_SIZE, description = "Number of entries in new palettes")
     
     naming_UI : BoolProperty(name = "Setup", default = False)
     paint_UI : BoolProperty(name = "Paint", default = False)
@@ -41,9 +50,102 @@ class VPipelineProperties(PropertyGroup):
     palette_UI : BoolProperty(name = "Apply", default = False)
     
     active_palette : StringProperty(name = "Active Palette", default = "")
+    profile_UI : BoolProperty(name = "Profiling", default = False)
+    profile : BoolProperty(name = "Record Timings", default = False, description = "Record phase timings and counters of every V Pipeline operator")
+    profile_cprofile : BoolProperty(name = "cProfile", default = False, description = "Also capture a cProfile .prof file per operator run")
+    profile_memory : BoolProperty(name = "Peak Memory", default = False, description = "Also trace Python allocations for the peak memory. Tracing slows the recorded timings down")
+    live_preview : BoolProperty(name = "Live Paint Preview", default = True, description = "Disable the ColorConverter while painting and update only the painted corners")
+    select_slot : IntProperty(name = "Select Slot", default = 0, min = 0, max = MAX_PALETTE_SIZE - 1)
+    
+    job_running : BoolProperty(name = "Job Running", default = False)
+    job_name : StringProperty(name = "Job Name", default = "")
+    job_progress : FloatProperty(name = "Job Progress", default = 0.0, min = 0.0, max = 1.0, subtype = 'FACTOR')
+
+class VPipelineObjectProperties(PropertyGroup):
+    color_palette : PointerProperty(name = "Color Override", type = bpy.types.Palette, description = "Palette used instead of the color palette for this object")
+    metal_palette : PointerProperty(name = "Metal Override", type = bpy.types.Palette, description = "Palette used instead of the metal/rough palette for this object")
 
 ### PANEL
 
+METAL_COLORS = ("Shiny Metal", "Painted Metal", "Gloss Plastic", "Matte Plastic")
+
+# setup completeness per (object, mesh), so redraws skip the palette and attribute lookups;
+# keyed by name as well as pointer, since freed pointers get reused
+_panel_state = {}
+_msgbus_owner = object()
+
+def clear_panel_state(*args):
+    _panel_state.clear()
+
+def panel_key(obj):
+    return (obj.as_pointer(), obj.name, obj.data.as_pointer(), obj.data.name)
+
+def attribute_names(mesh, props):
+    # what the cached state depends on: color attributes and palette index attributes
+    names = {att.name for att in mesh.color_attributes}
+    names.update(name for name in (index_name(props.color_name), index_name(props.metal_name)) if mesh.attributes.get(name))
+    return frozenset(names)
+
+def setup_state(obj, props):
+    if not obj or obj.type != 'MESH':
+        return False
+    
+    key = panel_key(obj)
+    cached = _panel_state.get(key)
+    if cached is None:
+        attribs = obj.data.color_attributes
+        
+        # palettes and vertex colors set up
+        setup = bool(bpy.data.palettes.get(props.color_name) and bpy.data.palettes.get(props.metal_name)
+            and attribs.get(props.color_name) and attribs.get(props.metal_name))
+        cached = _panel_state[key] = (attribute_names(obj.data, props), setup)
+    
+    return cached[1]
+
+@bpy.app.handlers.persistent
+def invalidate_panel_state(scene, depsgraph):
+    # paint strokes update the geometry every time, so only drop entries whose attribute names changed
+    props = scene.VPipelineProps
+    for update in depsgraph.updates:
+        id = update.id.original
+        if isinstance(id, bpy.types.Palette):
+            _panel_state.clear()
+            return
+        
+        if isinstance(id, bpy.types.Object) and id.type == 'MESH' and update.is_updated_geometry:
+            id = id.data
+        if isinstance(id, bpy.types.Mesh):
+            mesh = (id.as_pointer(), id.name)
+            entries = [key for key in _panel_state if key[2:] == mesh]
+            if entries:
+                names = attribute_names(id, props)
+                for key in entries:
+                    if _panel_state[key][0] != names:
+                        del _panel_state[key]
+
+def subscribe_panel_state():
+    bpy.msgbus.clear_by_owner(_msgbus_owner)
+    for name in ("color_name", "metal_name"):
+        bpy.msgbus.subscribe_rna(
+            key=(VPipelineProperties, name),
+            owner=_msgbus_owner,
+            args=(),
+            notify=clear_panel_state,
+        )
+    bpy.msgbus.subscribe_rna(
+        key=(bpy.types.Object, "mode"),
+        owner=_msgbus_owner,
+        args=(),
+        notify=paint_mode_changed,
+    )
+
+@bpy.app.handlers.persistent
+def reload_panel_state(dummy):
+    # file loads drop msgbus subscriptions and invalidate every pointer
+    _panel_state.clear()
+    subscribe_panel_state()
+    reload_paint_preview()
+
 class VPipelinePanel(bpy.types.Panel):
     bl_idname = "OBJECT_PT_v_pipeline"
     bl_label = "V Pipeline"
@@ -82,6 +184,16 @@ class VPipelinePanel(bpy.types.Panel):
         is_color = props.active_palette == props.color_name
         is_metal = props.active_palette == props.metal_name
         
+        if props.job_running:
+            box = layout.box()
+            row = box.row()
+            row.label(text=f"{props.job_name}... (Esc to cancel)")
+            row = box.row()
+            if hasattr(row, "progress"):
+                row.progress(factor=props.job_progress, text=f"{props.job_progress * 100:.0f}%")
+            else:
+                row.prop(props, "job_progress", text="")
+        
         box = layout.box()
         if self.dropdown(box, props, "naming_UI"):
             row = box.row()
@@ -95,26 +207,16 @@ class VPipelinePanel(bpy.types.Panel):
             row.prop(props, "metal_name", text="")
             
             row = box.row()
-            row.operator("object.v_setup", text="Setup")
+            row.prop(props, "palette_size")
+            
+            row = box.row()
+            row.operator("object.v_run_job", text="Setup").job = 'SETUP'
+            row.operator("object.v_setup", text="Setup Collection").target = 'COLLECTION'
         
         # CHECK IF SETUP IS COMPLETE
-        color_p = bpy.data.palettes.get(props.color_name)
-        metal_p = bpy.data.palettes.get(props.metal_name)
-        
         obj = context.active_object
         
-        setup = False
-        if context.active_object:
-            attribs = obj.data.color_attributes
-            
-            color_v = attribs.get(props.color_name)
-            metal_v = attribs.get(props.metal_name)
-            
-            # palettes and vertex colors set up
-            setup = color_p and metal_p and color_v and metal_v
-        
-        
-        if setup:
+        if setup_state(obj, props):
             box = layout.box()
             if self.dropdown(box, props, "paint_UI", f"Paint {props.active_palette}"):
                 
@@ -133,18 +235,18 @@ class VPipelinePanel(bpy.types.Panel):
                 row = box.row()
                 row.operator("object.v_paint", text="Paint Vertex Colors", icon="BRUSH_PAINT_SELECT")
                 
+                row = box.row()
+                row.prop(props, "live_preview")
+                
                 row = box.row()
                 row.prop(context.tool_settings.vertex_paint.brush, "color", text="Active Color")
                 
                 # only display for metal
                 if is_metal:
                     if self.dropdown(box, props, "metal_colors_UI"):
-                        metal_colors = ["Shiny Metal", "Painted Metal", "Gloss Plastic", "Matte Plastic"]
-                        i = 0
-                        for color in metal_colors:
+                        for i, color in enumerate(METAL_COLORS):
                             row = box.row()
                             row.operator("object.v_set_metal_color", text=color).palette_index = i
-                            i += 1
                 
                 # select polys
                 s = ""
@@ -154,11 +256,21 @@ class VPipelinePanel(bpy.types.Panel):
                     index = 0
                 elif props.active_palette == props.metal_name:
                     s = "Metal"
-                    index = 0
+                    index = 1
                 
                 if s != "":
                     row = box.row()
-                    row.operator("object.v_select_current_color", text=f"Select Polys Active {s}").index = index
+                    op = row.operator("object.v_run_job", text=f"Select Polys Active {s}")
+                    op.job = 'SELECT'
+                    op.index = index
+                    
+                    row = box.row()
+                    row.prop(props, "select_slot", text="Slot")
+                    op = row.operator("object.v_run_job", text="Select Faces")
+                    op.job = 'SELECT'
+                    op.index = index
+                    op.slot = props.select_slot
+                    op.mode = 'FACE'
             
             box = layout.box()
             if self.dropdown(box, props, "palette_UI"):
@@ -167,19 +279,42 @@ class VPipelinePanel(bpy.types.Panel):
                 #row.operator("object.v_update_geo_palette", text="Update Geonodes Palette")
                 
                 row = box.row()
-                row.operator("object.v_map_uvs", text="Map UVs").map=True
+                row.operator("object.v_run_job", text="Map UVs").job = 'MAP'
                 
                 row = box.row()
-                row.operator("object.v_map_uvs", text="Restore UVs").map=False
+                row.operator("object.v_run_job", text="Restore UVs").job = 'RESTORE'
                 
                 row = box.row()
                 row.operator("object.v_print_palette", text="Print Palettes")
+                
+                row = box.row()
+                row.operator("object.v_export_palette_texture", text="Export Palette Texture")
+                
+                obj_props = obj.VPipelineObjectProps
+                row = box.row()
+                row.label(text="Palette Override:")
+                row = box.row()
+                row.prop(obj_props, "color_palette", text="Color")
+                row = box.row()
+                row.prop(obj_props, "metal_palette", text="Metal")
             
                 row = box.row()
-                row.operator("object.v_prep_export", text="Prep for Export").reset=False
+                row.operator("object.v_run_job", text="Prep for Export").job = 'PREP'
             
                 row = box.row()
-                row.operator("object.v_prep_export", text="Restore Geo Nodes/Uber Mat").reset=True
+                row.operator("object.v_run_job", text="Restore Geo Nodes/Uber Mat").job = 'RESET'
+                
+                row = box.row()
+                row.operator("object.v_bake_masks", text="Bake AO/Edge Mask")
+                
+                row = box.row()
+                row.operator("object.v_optimize_domains", text="Optimize Attribute Domains")
+                
+                row = box.row()
+                row.operator("object.v_export_gltf", text="Export glTF", icon="EXPORT")
+                
+                row = box.row()
+                row.operator("object.v_export_gltf", text="Export Batched glTF", icon="EXPORT").merge = True
             
                 ts = context.tool_settings
                 if ts.vertex_paint.palette:
@@ -193,7 +328,169 @@ class VPipelinePanel(bpy.types.Panel):
             row = layout.row()
             row.label(text="Setup incomplete.")
         
+        box = layout.box()
+        if self.dropdown(box, props, "profile_UI"):
+            row = box.row()
+            row.prop(props, "profile")
+            row.prop(props, "profile_cprofile")
+            row.prop(props, "profile_memory")
+            
+            rec = _last_recording[0]
+            if rec:
+                row = box.row()
+                if rec.peak is None:
+                    row.label(text=f"{rec.label}: {rec.seconds * 1000.0:.1f} ms")
+                else:
+                    # tracemalloc hooks every allocation, so these timings run slow
+                    row.label(text=f"{rec.label}: {rec.seconds * 1000.0:.1f} ms with memory tracing, "
+                                   f"Python peak {rec.peak / 1048576.0:.1f} MB")
+                for name, seconds, calls in rec.summary:
+                    row = box.row()
+                    row.label(text=f"  {name}" + (f" x{calls}" if calls > 1 else ""))
+                    row.label(text=f"{seconds * 1000.0:.1f} ms")
+                for name, value in rec.counters.items():
+                    row = box.row()
+                    row.label(text=f"  {name}")
+                    row.label(text=f"{value}")
+                if rec.profile_path:
+                    row = box.row()
+                    row.label(text=os.path.basename(rec.profile_path), icon='FILE')
+            
+            row = box.row()
+            row.operator("object.v_write_trace", text="Write Trace", icon='EXPORT')
+            row.operator("object.v_clear_trace", text="Clear", icon='X')
+        
+        
+### INSTRUMENTATION
+
+# Chrome trace events ("X" complete events) of recorded runs, newest last
+TRACE_LIMIT = 100000
+_trace = collections.deque(maxlen=TRACE_LIMIT)
+
+# the run being recorded; phase() and count() do nothing while it is None
+_recording = None
+_last_recording = [None]
+
+_NO_PHASE = contextlib.nullcontext()
+
+def trace_event(name, start, end, args=None):
+    _trace.append({"name": name, "cat": "vpipeline", "ph": "X", "pid": os.getpid(), "tid": 0,
+                   "ts": start * 1e6, "dur": (end - start) * 1e6, "args": args or {}})
+
+class Phase:
+    __slots__ = ("name", "start")
+    
+    def __init__(self, name):
+        self.name = name
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+    
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        rec = _recording
+        if rec is not None:
+            rec.phases.append((self.name, end - self.start))
+            trace_event(self.name, self.start, end)
+
+def phase(name):
+    """Time a block of an operator run; a shared no-op context when nothing is recorded"""
+    if _recording is None:
+        return _NO_PHASE
+    return Phase(name)
+
+def profiling():
+    # guard for counters that cost something to work out
+    return _recording is not None
+
+def count(name, value):
+    rec = _recording
+    if rec is not None:
+        rec.counters[name] = rec.counters.get(name, 0) + int(value)
+
+class Recording:
+    """Phase timings, counters and optionally peak Python memory of one operator run"""
+    
+    def __init__(self, label, use_cprofile=False, trace_memory=False):
+        self.label = label
+        self.phases = []
+        self.counters = {}
+        self.summary = []
+        self.seconds = 0.0
+        self.peak = None
+        self.profile_path = ""
+        self.profiler = cProfile.Profile() if use_cprofile else None
+        
+        self.trace_memory = trace_memory
+        self.own_tracemalloc = trace_memory and not tracemalloc.is_tracing()
+        if self.own_tracemalloc:
+            tracemalloc.start()
+        elif trace_memory:
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+    
+    def resume(self):
+        global _recording
+        _recording = self
+        if self.profiler:
+            self.profiler.enable()
+    
+    def pause(self):
+        global _recording
+        if self.profiler:
+            self.profiler.disable()
+        _recording = None
+    
+    def finish(self):
+        self.pause()
+        end = time.perf_counter()
+        self.seconds = end - self.start
+        if self.trace_memory:
+            self.peak = tracemalloc.get_traced_memory()[1]
+        if self.own_tracemalloc:
+            tracemalloc.stop()
+        
+        if self.profiler:
+            name = f"vpipeline_{bpy.path.clean_name(self.label)}_{int(time.time())}.prof"
+            self.profile_path = os.path.join(bpy.app.tempdir or tempfile.gettempdir(), name)
+            self.profiler.dump_stats(self.profile_path)
+            self.profiler = None
+        
+        # phases run once per object add up under one row
+        totals = {}
+        for name, seconds in self.phases:
+            total, calls = totals.get(name, (0.0, 0))
+            totals[name] = (total + seconds, calls + 1)
+        self.summary = [(name, total, calls) for name, (total, calls) in totals.items()]
+        
+        args = dict(self.counters)
+        if self.peak is not None:
+            args["peak_bytes"] = self.peak
+        trace_event(self.label, self.start, end, args)
+        _last_recording[0] = self
+
+def instrumented(execute):
+    """Record an operator's execute when Record Timings is on in the panel"""
+    @functools.wraps(execute)
+    def wrapper(self, context):
+        props = context.scene.VPipelineProps
+        if not props.profile:
+            return execute(self, context)
         
+        # operators called from a recorded one show up as its phases
+        if _recording is not None:
+            with phase(self.bl_label):
+                return execute(self, context)
+        
+        rec = Recording(self.bl_label, props.profile_cprofile, props.profile_memory)
+        rec.resume()
+        try:
+            return execute(self, context)
+        finally:
+            rec.finish()
+    return wrapper
+
+
 ### HELPER FUNCTIONS
 
 def srgb_to_linear(c):
@@ -216,6 +513,1327 @@ def color_match(col1, col2, tol=0.001):
     d = vector(col1) - vector(col2)
     return d.length <= tol
 
+def loop_vertices(mesh):
+    loop_verts = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_verts)
+    return loop_verts
+
+def attribute_colors(attribute):
+    # whole-buffer read of sRGB RGBA values in the attribute's own domain
+    buf = np.empty(len(attribute.data) * 4, dtype=np.float32)
+    attribute.data.foreach_get("color_srgb", buf)
+    return buf.reshape(-1, 4)
+
+def corner_colors(mesh, attribute):
+    # sRGB corner colors, (n, 3) float32, expanding POINT domain attributes
+    colors = attribute_colors(attribute)[:, :3]
+    if attribute.domain == 'POINT':
+        colors = colors[loop_vertices(mesh)]
+    return colors
+
+def color_codes(colors):
+    # pack sRGB colors into 24-bit byte codes, the key of the palette lookup table
+    b = np.rint(np.clip(colors, 0.0, 1.0) * 255.0).astype(np.uint32)
+    return (b[..., 0] << 16) | (b[..., 1] << 8) | b[..., 2]
+
+def color_distance(colors, target):
+    # color_match's distance, done with the same float32 math mathutils uses
+    colors = np.clip(np.asarray(colors, dtype=np.float32), 0.0, 1.0)
+    target = np.clip(np.asarray(target, dtype=np.float32), 0.0, 1.0)
+    d = colors - target
+    d2 = (d * d).astype(np.float64).sum(axis=-1).astype(np.float32)
+    return np.sqrt(d2.astype(np.float64))
+
+class PaletteLUT:
+    """Sparse 24-bit byte color -> palette index lookup, -1 where no entry matches
+    
+    Only the byte colors within tolerance of an entry are kept (a few hundred
+    per entry, sorted), so indexing it with an array of codes is a searchsorted
+    instead of a 16M entry table held for the whole session.
+    """
+    def __init__(self, codes, indices):
+        self.codes = codes
+        self.indices = indices
+    
+    def __getitem__(self, codes):
+        codes = np.asarray(codes, dtype=np.uint32)
+        if not len(self.codes):
+            return np.full(codes.shape, -1, dtype=np.int16)
+        
+        pos = np.minimum(np.searchsorted(self.codes, codes), len(self.codes) - 1)
+        return np.where(self.codes[pos] == codes, self.indices[pos], -1).astype(np.int16)
+
+# one lookup per palette name, replaced as soon as the palette's colors change
+_palette_luts = {}
+
+def palette_lut(palette, tol=0.01):
+    """24-bit byte color -> palette index lookup, -1 where no entry matches
+    
+    The per-corner index attributes are only refreshed by the operators (VPaint,
+    Select, Map UVs, export) and the paint preview; plain brush strokes leave them
+    stale until the next of those, so readers must not trust them on their own.
+    Map UVs re-resolves every corner whose color changed since its last run.
+    """
+    colors = tuple(tuple(clr.color) for clr in palette.colors[:MAX_PALETTE_SIZE])
+    key = (colors, tol)
+    
+    cached = _palette_luts.get(palette.name)
+    if cached and cached[0] == key:
+        return cached[1]
+    
+    with phase("palette lut"):
+        lut = build_palette_lut(colors, tol)
+    count("palette entries", len(colors))
+    
+    _palette_luts[palette.name] = (key, lut)
+    return lut
+
+def build_palette_lut(colors, tol):
+    # only byte colors within tol of an entry can match, so each entry
+    # only has to test a small neighbourhood of codes around itself
+    reach = int(math.ceil(tol * 255.0)) + 1
+    offsets = np.arange(-reach, reach + 1)
+    offsets = np.stack(np.meshgrid(offsets, offsets, offsets, indexing='ij'), -1).reshape(-1, 3)
+    
+    keys = [np.zeros(0, dtype=np.uint32)]
+    slots = [np.zeros(0, dtype=np.int16)]
+    for index, color in enumerate(colors):
+        center = np.rint(np.clip(color, 0.0, 1.0) * 255.0).astype(np.int64)
+        codes = center + offsets
+        codes = codes[np.all((codes >= 0) & (codes <= 255), axis=1)]
+        
+        near = codes[color_distance(codes.astype(np.float32) / np.float32(255.0), color) <= tol]
+        keys.append(((near[:, 0] << 16) | (near[:, 1] << 8) | near[:, 2]).astype(np.uint32))
+        slots.append(np.full(len(near), index, dtype=np.int16))
+    
+    # where entries overlap the later one wins, as it did in the dense table
+    keys = np.concatenate(keys)[::-1]
+    slots = np.concatenate(slots)[::-1]
+    keys, first = np.unique(keys, return_index=True)
+    return PaletteLUT(keys, slots[first])
+
+def index_name(name):
+    return f"{name}Index"
+
+def update_palette_index(mesh, name, palette):
+    """Refresh the INT corner attribute holding each corner's palette slot"""
+    lut = palette_lut(palette)
+    with phase("palette lookup"):
+        indices = lut[color_codes(corner_colors(mesh, mesh.color_attributes[name]))]
+    count_matches(indices)
+    with phase("write index"):
+        write_palette_index(mesh, name, indices)
+    
+    return indices
+
+def count_matches(indices):
+    count("corners", len(indices))
+    if profiling():
+        misses = int(np.count_nonzero(indices < 0))
+        count("matches", len(indices) - misses)
+        count("misses", misses)
+
+def write_palette_index(mesh, name, indices):
+    att = mesh.attributes.get(index_name(name))
+    if not att:
+        att = mesh.attributes.new(name=index_name(name), type='INT', domain='CORNER')
+    att.data.foreach_set("value", indices.astype(np.int32))
+
+def select_palette_slot(mesh, indices, slot, mode='VERT'):
+    """Add every vertex (or face) using a palette slot to the mesh selection"""
+    with phase("select"):
+        _select_palette_slot(mesh, indices, slot, mode)
+    if profiling():
+        count("selected corners", np.count_nonzero(indices == slot))
+
+def _select_palette_slot(mesh, indices, slot, mode):
+    loop_verts = loop_vertices(mesh)
+    loop_edges = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("edge_index", loop_edges)
+    loop_start = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_start)
+    loop_total = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_total)
+    
+    vert_sel = np.empty(len(mesh.vertices), dtype=bool)
+    mesh.vertices.foreach_get("select", vert_sel)
+    edge_sel = np.empty(len(mesh.edges), dtype=bool)
+    mesh.edges.foreach_get("select", edge_sel)
+    face_sel = np.empty(len(mesh.polygons), dtype=bool)
+    mesh.polygons.foreach_get("select", face_sel)
+    
+    match = indices == slot
+    if mode == 'FACE':
+        loop_faces = np.repeat(np.arange(len(loop_start)), loop_total)
+        face_sel[loop_faces[match]] = True
+        match = face_sel[loop_faces]
+        vert_sel[loop_verts[match]] = True
+        edge_sel[loop_edges[match]] = True
+    else:
+        vert_sel[loop_verts[match]] = True
+        
+        edge_verts = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+        mesh.edges.foreach_get("vertices", edge_verts)
+        edge_sel |= vert_sel[edge_verts].reshape(-1, 2).all(axis=1)
+        if len(loop_start):
+            face_sel |= np.logical_and.reduceat(vert_sel[loop_verts], loop_start)
+    
+    mesh.vertices.foreach_set("select", vert_sel)
+    mesh.edges.foreach_set("select", edge_sel)
+    mesh.polygons.foreach_set("select", face_sel)
+
+def unique_rows(columns):
+    # number of distinct rows across a list of (n, k) arrays
+    rows = np.ascontiguousarray(np.concatenate([c.reshape(len(c), -1).astype(np.float32) for c in columns], axis=1))
+    return len(np.unique(rows.view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1])))))
+
+def corner_normals(mesh):
+    if hasattr(mesh, "corner_normals"):
+        normals = np.empty(len(mesh.corner_normals) * 3, dtype=np.float32)
+        mesh.corner_normals.foreach_get("vector", normals)
+    else:
+        mesh.calc_normals_split()
+        normals = np.empty(len(mesh.loops) * 3, dtype=np.float32)
+        mesh.loops.foreach_get("normal", normals)
+    return normals.reshape(-1, 3)
+
+def vertex_splits(mesh, names, movable=None):
+    """How much each CORNER color attribute splits vertices on export
+    
+    Returns ({name: (split factor, uniform per vertex)}, exported vertex
+    count, exported vertex count with the uniform attributes among movable
+    (default: all of them) on points).
+    """
+    loop_verts = loop_vertices(mesh)
+    used = max(len(np.unique(loop_verts)), 1)
+    
+    # glTF vertices are unique (vertex, normal, uv..., color...) tuples
+    base = [loop_verts, corner_normals(mesh)]
+    for uv in mesh.uv_layers:
+        uvs = np.empty(len(uv.data) * 2, dtype=np.float32)
+        uv.data.foreach_get("uv", uvs)
+        base.append(uvs.reshape(-1, 2))
+    
+    stats = {}
+    corner_values = {}
+    for name in names:
+        att = mesh.color_attributes.get(name)
+        if not att or att.domain != 'CORNER':
+            continue
+        values = attribute_colors(att)
+        corner_values[name] = values
+        
+        # uniform when the attribute adds no (vertex, value) pairs beyond the vertices
+        splits = unique_rows([loop_verts, values])
+        stats[name] = (splits / used, splits == used)
+    
+    before = unique_rows(base + list(corner_values.values()))
+    movable = names if movable is None else movable
+    after = unique_rows(base + [v for n, v in corner_values.items() if not (stats[n][1] and n in movable)])
+    return stats, before, after
+
+def convert_to_point(mesh, name):
+    """Move a per-vertex uniform CORNER color attribute to the POINT domain"""
+    attribs = mesh.color_attributes
+    att = attribs[name]
+    data_type = att.data_type
+    active = attribs.active_color_name
+    default = attribs.default_color_name
+    
+    values = np.zeros((len(mesh.vertices), 4), dtype=np.float32)
+    values[:, 3] = 1.0
+    values[loop_vertices(mesh)] = attribute_colors(att)
+    
+    attribs.remove(att)
+    att = attribs.new(name=name, type=data_type, domain='POINT')
+    att.data.foreach_set("color_srgb", values.ravel())
+    
+    if active:
+        attribs.active_color_name = active
+    if default:
+        attribs.default_color_name = default
+
+def write_grey(mesh, name, values):
+    """Write per-vertex 0..1 values into a color attribute in one foreach_set"""
+    att = mesh.color_attributes[name]
+    if att.domain == 'CORNER':
+        values = values[loop_vertices(mesh)]
+    
+    colors = np.ones((len(values), 4), dtype=np.float32)
+    colors[:, :3] = values[:, None]
+    att.data.foreach_set("color_srgb", colors.ravel())
+
+def edge_mask(mesh, full_angle):
+    """Per-vertex convex edge wear from dihedral angles, 1 at full_angle or sharper"""
+    normals = np.empty(len(mesh.polygons) * 3, dtype=np.float32)
+    mesh.polygons.foreach_get("normal", normals)
+    normals = normals.reshape(-1, 3)
+    centers = np.empty(len(mesh.polygons) * 3, dtype=np.float32)
+    mesh.polygons.foreach_get("center", centers)
+    centers = centers.reshape(-1, 3)
+    
+    loop_edges = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("edge_index", loop_edges)
+    loop_total = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_total)
+    loop_faces = np.repeat(np.arange(len(mesh.polygons)), loop_total)
+    
+    # the two faces of every manifold edge
+    order = np.argsort(loop_edges, kind='stable')
+    edges, first, counts = np.unique(loop_edges[order], return_index=True, return_counts=True)
+    manifold = counts == 2
+    edges = edges[manifold]
+    f1 = loop_faces[order[first[manifold]]]
+    f2 = loop_faces[order[first[manifold] + 1]]
+    
+    cos = np.clip((normals[f1] * normals[f2]).sum(axis=1), -1.0, 1.0)
+    angle = np.arccos(cos)
+    convex = ((centers[f2] - centers[f1]) * normals[f1]).sum(axis=1) < 0.0
+    wear = np.where(convex, np.clip(angle / full_angle, 0.0, 1.0), 0.0)
+    
+    edge_verts = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edge_verts)
+    edge_verts = edge_verts.reshape(-1, 2)[edges]
+    
+    mask = np.zeros(len(mesh.vertices), dtype=np.float32)
+    np.maximum.at(mask, edge_verts[:, 0], wear)
+    np.maximum.at(mask, edge_verts[:, 1], wear)
+    return mask
+
+def hemisphere(samples):
+    # cosine weighted directions around +Z on a fibonacci spiral
+    i = np.arange(samples) + 0.5
+    r = np.sqrt(i / samples)
+    phi = i * math.pi * (3.0 - math.sqrt(5.0))
+    return np.stack([r * np.cos(phi), r * np.sin(phi), np.sqrt(1.0 - r * r)], axis=1)
+
+def polygon_vertices(mesh):
+    # vertex lists per polygon from whole-buffer reads, as BVHTree.FromPolygons takes them
+    loop_start = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_start)
+    loop_total = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_total)
+    loop_verts = loop_vertices(mesh)
+    if len(loop_total) and (loop_total == loop_total[0]).all() and (loop_start == np.arange(len(loop_start)) * loop_total[0]).all():
+        return loop_verts.reshape(len(loop_total), -1).tolist()
+    
+    verts = loop_verts.tolist()
+    return [verts[s:s + t] for s, t in zip(loop_start.tolist(), loop_total.tolist())]
+
+# set before the AO pool forks so workers inherit the BVH tree
+_ao_job = None
+
+def _ao_chunk(span):
+    tree, origins, normals, directions, distance = _ao_job
+    start, end = span
+    
+    # tangent frame per vertex, directions rotated onto the normal
+    n = normals[start:end]
+    helper = np.where(np.abs(n[:, 2:3]) < 0.999, [[0.0, 0.0, 1.0]], [[1.0, 0.0, 0.0]])
+    t = np.cross(helper, n)
+    t /= np.linalg.norm(t, axis=1, keepdims=True)
+    b = np.cross(n, t)
+    rays = (directions[None, :, 0:1] * t[:, None] + directions[None, :, 1:2] * b[:, None]
+            + directions[None, :, 2:3] * n[:, None])
+    
+    # bpy has no batched ray query; keep the per-ray work to the BVH call itself
+    cast = tree.ray_cast
+    hits = [sum(cast(origin, d, distance)[0] is not None for d in dirs)
+            for origin, dirs in zip(origins[start:end].tolist(), rays.tolist())]
+    return 1.0 - np.array(hits, dtype=np.float32) / len(directions)
+
+def ambient_occlusion(mesh, samples, distance, jobs=0, chunk=2048):
+    """Per-vertex AO from BVH ray casts
+    
+    Background runs (blender -b) spread the chunks over a forked process
+    pool; forking the multithreaded UI process isn't safe, so there the
+    bake runs in this process. Vertices without a normal (loose ones)
+    get no occlusion.
+    """
+    global _ao_job
+    
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    co = co.reshape(-1, 3)
+    normals = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("normal", normals)
+    normals = normals.reshape(-1, 3).astype(np.float64)
+    
+    length = np.linalg.norm(normals, axis=1)
+    valid = length > 1e-6
+    normals[~valid] = (0.0, 0.0, 1.0)
+    normals[valid] /= length[valid, None]
+    
+    tree = BVHTree.FromPolygons(co.tolist(), polygon_vertices(mesh))
+    
+    origins = co + normals * (distance * 1e-3)
+    spans = [(i, min(i + chunk, len(co))) for i in range(0, len(co), chunk)]
+    _ao_job = (tree, origins, normals, hemisphere(samples), distance)
+    
+    try:
+        jobs = jobs or os.cpu_count() or 1
+        if (bpy.app.background and jobs > 1 and len(spans) > 1
+                and "fork" in multiprocessing.get_all_start_methods()):
+            with multiprocessing.get_context("fork").Pool(min(jobs, len(spans))) as pool:
+                parts = pool.map(_ao_chunk, spans)
+        else:
+            parts = [_ao_chunk(span) for span in spans]
+    finally:
+        _ao_job = None
+    
+    ao = np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+    ao[~valid] = 1.0
+    return ao
+
+SETUP_ATTRIBUTES = ("Color", "AO", "EdgeMask")
+
+def new_color_palette(name, size=4):
+    if not bpy.data.palettes.get(name):
+        pal = bpy.data.palettes.new(name)
+        
+        for i in range(size):
+            pal.colors.new()
+        
+        pal.colors.active = pal.colors[0]
+
+def new_color_attribute(mesh, name):
+    """Opaque black BYTE_COLOR corner attribute, filled with one foreach_set; False if it exists"""
+    if mesh.color_attributes.get(name):
+        return False
+    
+    att = mesh.color_attributes.new(name=name, type='BYTE_COLOR', domain='CORNER')
+    black = np.zeros((len(mesh.loops), 4), dtype=np.float32)
+    black[:, 3] = 1.0
+    att.data.foreach_set("color", black.ravel())
+    return True
+
+def setup_objects(objects, props):
+    """Setup for any number of mesh objects in one pass
+    
+    Palettes are created once, attributes and palette slots once per mesh
+    (shared meshes included), then the UberShader slot and ColorConverter
+    modifier per object.
+    """
+    names = (props.color_name, props.metal_name)
+    luts = setup_palettes(names, props.palette_size)
+    
+    meshes = {}
+    for obj in objects:
+        meshes.setdefault(obj.data.as_pointer(), obj.data)
+    
+    with phase("attributes"):
+        for mesh in meshes.values():
+            run_steps(setup_mesh_steps(mesh, names, luts))
+    
+    with phase("material/modifier"):
+        for obj in objects:
+            setup_object(obj)
+    
+    count("objects", len(objects))
+    count("meshes", len(meshes))
+    
+    # new palettes don't always show up as depsgraph updates
+    clear_panel_state()
+
+def setup_palettes(names, size):
+    for name in names:
+        new_color_palette(name, size)
+    return [palette_lut(bpy.data.palettes[name]) for name in names]
+
+def setup_mesh_steps(mesh, names, luts):
+    """Setup attributes and palette slots of one mesh, one buffer write or lookup chunk per yield"""
+    for name, lut in zip(names, luts):
+        if new_color_attribute(mesh, name):
+            yield
+            # every corner is black, one lookup covers them all
+            write_palette_index(mesh, name, np.full(len(mesh.loops), lut[0], dtype=np.int32))
+            yield
+        elif not mesh.attributes.get(index_name(name)):
+            yield from palette_index_steps(mesh, name, lut)
+    
+    for name in SETUP_ATTRIBUTES:
+        if new_color_attribute(mesh, name):
+            yield
+
+def setup_object(obj):
+    # UberShader slot and ColorConverter modifier, when missing
+    uber_mat = bpy.data.materials.get("UberShader")
+    if uber_mat not in [m_slot.material for m_slot in obj.material_slots]:
+        obj.data.materials.append(uber_mat)
+    
+    if color_converter(obj) is None:
+        cc = bpy.data.node_groups['ColorConverter']
+        mod = obj.modifiers.new('ColorConverter', type='NODES')
+        mod.node_group = cc
+        mod[cc.interface.items_tree["OutColor"].identifier] = "Color"
+
+def map_mesh_uvs(mesh, props, map=True):
+    """Map (or restore) palette slots in the UVs, redoing only corners changed since the last run"""
+    names = (props.color_name, props.metal_name)
+    with phase("read/fingerprint"):
+        uvs, codes, key, corners = map_plan(mesh, names, map)
+    count("corners", len(uvs))
+    count("corners rewritten", len(corners))
+    if not len(corners):
+        return 0
+    
+    luts = [palette_lut(bpy.data.palettes[name]) for name in names]
+    indices = [read_palette_index(mesh, name) for name in names]
+    with phase("remap"):
+        remap_corners(uvs, codes, luts, indices, corners, map)
+    if profiling():
+        for idx in indices:
+            count("misses", np.count_nonzero(idx[corners] < 0))
+    
+    with phase("write"):
+        write_uvs(mesh, uvs)
+        for name, idx in zip(names, indices):
+            write_palette_index(mesh, name, idx)
+        store_fingerprints(mesh, key, fingerprints(codes, uvs))
+    
+    return len(corners)
+
+# corners per fingerprint; the crc32 of each chunk is kept on the mesh after a map
+FINGERPRINT_CHUNK = 1 << 12
+
+def fingerprints(codes, uvs):
+    return run_steps(fingerprint_steps(codes, uvs))
+
+def fingerprint_steps(codes, uvs):
+    # JOB_CHUNK is a multiple of FINGERPRINT_CHUNK, so steps never split a fingerprint
+    crcs = []
+    for start, end in chunk_spans(len(uvs)):
+        rows = np.ascontiguousarray(np.column_stack([code[start:end] for code in codes] + [uvs[start:end].view(np.uint32)]))
+        crcs += [zlib.crc32(rows[s:e]) for s, e in chunk_spans(len(rows), FINGERPRINT_CHUNK)]
+        yield
+    # signed, so the hashes fit an ID property int array
+    return np.array(crcs, dtype=np.uint32).view(np.int32)
+
+def map_key(names, map):
+    data = bytes([map])
+    for name in names:
+        palette = bpy.data.palettes[name]
+        data += color_codes(np.array([c.color for c in palette.colors], dtype=np.float32).reshape(-1, 3)).tobytes()
+    return int(np.uint32(zlib.crc32(data)).view(np.int32))
+
+def map_plan(mesh, names, map):
+    """Read the buffers once and work out which corners a map/restore has to touch"""
+    return run_steps(plan_steps(mesh, names, map))
+
+def plan_steps(mesh, names, map):
+    # map_plan one whole-buffer read or one chunk of corners at a time
+    uvs = read_uvs(mesh)
+    yield
+    codes = []
+    for name in names:
+        colors = corner_colors(mesh, mesh.color_attributes[name])
+        yield
+        code = np.empty(len(colors), dtype=np.uint32)
+        for start, end in chunk_spans(len(colors)):
+            code[start:end] = color_codes(colors[start:end])
+            yield
+        codes.append(code)
+    key = map_key(names, map)
+    
+    stored = mesh.get("vp_map_hashes")
+    current = yield from fingerprint_steps(codes, uvs)
+    if (mesh.get("vp_map_key") != key or stored is None or len(stored) != len(current)
+            or not all(mesh.attributes.get(index_name(name)) for name in names)):
+        return uvs, codes, key, np.arange(len(uvs))
+    
+    dirty = current != np.array(stored, dtype=np.int32)
+    spans = chunk_spans(len(uvs), FINGERPRINT_CHUNK)
+    sizes = np.array([end - start for start, end in spans])
+    return uvs, codes, key, np.flatnonzero(np.repeat(dirty, sizes))
+
+def remap_corners(uvs, codes, luts, indices, corners, map):
+    for axis, (lut, code, idx) in enumerate(zip(luts, codes, indices)):
+        idx[corners] = lut[code[corners]]
+        sub = uvs[corners]
+        shift_uvs(sub, idx[corners], axis, map)
+        uvs[corners] = sub
+
+def store_fingerprints(mesh, key, hashes):
+    mesh["vp_map_key"] = key
+    mesh["vp_map_hashes"] = hashes.tolist()
+
+def read_palette_index(mesh, name):
+    # current slots, or an unfilled buffer when the attribute doesn't exist yet
+    indices = np.empty(len(mesh.loops), dtype=np.int32)
+    att = mesh.attributes.get(index_name(name))
+    if att:
+        att.data.foreach_get("value", indices)
+    return indices
+
+def read_uvs(mesh):
+    mesh.uv_layers.active = mesh.uv_layers['UVMap']
+    uv_data = mesh.uv_layers.active.data
+    
+    uvs = np.empty(len(uv_data) * 2, dtype=np.float32)
+    uv_data.foreach_get("uv", uvs)
+    return uvs.reshape(-1, 2)
+
+def write_uvs(mesh, uvs):
+    mesh.uv_layers['UVMap'].data.foreach_set("uv", uvs.ravel())
+    mesh.update()
+
+def shift_uvs(uvs, indices, axis=0, map=True):
+    # uvs is the (n, 2) float32 UV buffer, edited in place
+    col = uvs[:, axis]
+    mask = indices >= 0
+    u = col[mask].astype(np.float64)
+    u -= np.floor(u)
+    if map:
+        u += indices[mask]
+    col[mask] = u
+
+def palette_rows(palettes):
+    """Linear RGB rows, one per palette, padded with black to the widest one"""
+    width = max(len(p.colors) for p in palettes)
+    rows = np.zeros((len(palettes), width, 3), dtype=np.float32)
+    for row, palette in zip(rows, palettes):
+        for i, clr in enumerate(palette.colors):
+            row[i] = [srgb_to_linear(c) for c in clr.color]
+    return rows
+
+# ID property on an override color palette: metal palette name -> texture row pair
+OVERRIDE_ROWS = "vp_override_rows"
+
+def override_index(pair, default):
+    """Persistent texture row pair of a palette pair, assigned on first use
+    
+    The number is stored on the color palette, so pairs keep their rows
+    when objects are added, renamed or removed.
+    """
+    if pair == default or None in pair:
+        return 0
+    
+    color, metal = pair
+    stored = color.get(OVERRIDE_ROWS)
+    if stored is not None and metal.name in stored:
+        return int(stored[metal.name])
+    
+    used = [int(i) for p in bpy.data.palettes for i in p.get(OVERRIDE_ROWS, {}).values()]
+    index = max(used, default=0) + 1
+    if stored is None:
+        color[OVERRIDE_ROWS] = {}
+    color[OVERRIDE_ROWS][metal.name] = index
+    return index
+
+def palette_overrides(objects, props):
+    """Palette pairs in texture row order, and the pair index of every object
+    
+    Pair 0 is the color/metal palette; every override pair keeps the index
+    override_index gave it, with the default pair filling the gaps. New pairs
+    are numbered in object name order, so unsaved files number them the same
+    way every run.
+    """
+    default = (bpy.data.palettes.get(props.color_name), bpy.data.palettes.get(props.metal_name))
+    rows = {}
+    for obj in sorted(objects, key=lambda o: o.name):
+        if obj.type != 'MESH':
+            continue
+        o = obj.VPipelineObjectProps
+        rows[obj.name] = override_index((o.color_palette or default[0], o.metal_palette or default[1]), default)
+    
+    indexed = {}
+    for palette in bpy.data.palettes:
+        for metal_name, index in palette.get(OVERRIDE_ROWS, {}).items():
+            metal = bpy.data.palettes.get(metal_name)
+            if metal:
+                indexed[int(index)] = (palette, metal)
+    
+    pairs = [default] * (max(indexed, default=0) + 1)
+    for index, pair in indexed.items():
+        pairs[index] = pair
+    return pairs, rows
+
+def write_palette_texture(filepath, rows):
+    """Write palette rows as a Godot ImageTexture resource (.tres) with an inline RGBFloat image.
+    
+    uber_palette.gdshader reads row 0 as colors and row 1 as metal/roughness with texelFetch,
+    so palette edits only change this file and never the shader source. Override pairs
+    from palette_overrides follow as rows 2k and 2k + 1 for uber_instanced.gdshader, k being
+    the pair's persistent index.
+    """
+    height, width = rows.shape[:2]
+    data = ", ".join(str(b) for b in rows.astype("<f4").tobytes())
+    
+    with open(filepath, "w") as f:
+        f.write('[gd_resource type="ImageTexture" load_steps=2 format=3]\n\n')
+        f.write('[sub_resource type="Image" id="Image_palette"]\n')
+        f.write('data = {\n')
+        f.write(f'"data": PackedByteArray({data}),\n')
+        f.write('"format": "RGBFloat",\n')
+        f.write(f'"height": {height},\n')
+        f.write('"mipmaps": false,\n')
+        f.write(f'"width": {width}\n')
+        f.write('}\n\n')
+        f.write('[resource]\n')
+        f.write('image = SubResource("Image_palette")\n')
+
+def gltf_settings(use_selection=True, extras=False):
+    """glTF exporter arguments for the attributes the uber shader reads (UV, UV2, COLOR)"""
+    settings = dict(
+        export_format='GLTF_SEPARATE',
+        use_selection=use_selection,
+        export_texcoords=True,
+        export_normals=True,
+        export_materials='NONE',
+        export_extras=extras,
+    )
+    if bpy.app.version >= (4, 2, 0):
+        settings["export_vertex_color"] = 'ACTIVE'
+        settings["export_all_vertex_colors"] = True
+    else:
+        settings["export_colors"] = True
+    return settings
+
+def export_gltf(filepath, use_selection=True, extras=False):
+    bpy.ops.export_scene.gltf(filepath=filepath, **gltf_settings(use_selection, extras))
+
+def evaluated_copy(obj, depsgraph, props):
+    """Temporary object holding obj's evaluated mesh, mapped and ready to export"""
+    obj_eval = obj.evaluated_get(depsgraph)
+    mesh = bpy.data.meshes.new_from_object(obj_eval, preserve_all_data_layers=True, depsgraph=depsgraph)
+    mesh.materials.clear()
+    
+    map_mesh_uvs(mesh, props, True)
+    # fingerprints and the like would end up in the glTF extras
+    for key in [key for key in mesh.keys() if key.startswith("vp_")]:
+        del mesh[key]
+    if mesh.color_attributes.get("Color"):
+        mesh.color_attributes.active_color_name = "Color"
+    
+    copy = bpy.data.objects.new(obj.name, mesh)
+    copy.matrix_world = obj.matrix_world
+    return copy
+
+LOD_BORDER_GROUP = "VPipelinePaletteBorder"
+
+def palette_borders(mesh, indices_list):
+    """Vertices whose corners use more than one palette slot"""
+    loop_verts = loop_vertices(mesh)
+    border = np.zeros(len(mesh.vertices), dtype=bool)
+    for indices in indices_list:
+        lo = np.full(len(mesh.vertices), MAX_PALETTE_SIZE, dtype=np.int32)
+        hi = np.full(len(mesh.vertices), -1, dtype=np.int32)
+        np.minimum.at(lo, loop_verts, indices)
+        np.maximum.at(hi, loop_verts, indices)
+        border |= (hi >= 0) & (lo != hi)
+    return border
+
+def corner_samples(mesh):
+    # a point inside each corner's share of its face, to pair corners across LOD levels
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    centers = np.empty(len(mesh.polygons) * 3, dtype=np.float32)
+    mesh.polygons.foreach_get("center", centers)
+    loop_total = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_total)
+    loop_faces = np.repeat(np.arange(len(mesh.polygons)), loop_total)
+    return co.reshape(-1, 3)[loop_vertices(mesh)] * 0.75 + centers.reshape(-1, 3)[loop_faces] * 0.25
+
+def corner_tree(samples):
+    tree = KDTree(len(samples))
+    for i, co in enumerate(samples.tolist()):
+        tree.insert(co, i)
+    tree.balance()
+    return tree
+
+def slot_changes(tree, base_indices, mesh, indices):
+    """Corners whose palette slot differs from the source corner at the same spot
+    
+    Catches collapses that pulled a neighbouring region's color over a corner,
+    not only colors that stopped matching the palette.
+    """
+    nearest = np.array([tree.find(co)[1] for co in corner_samples(mesh).tolist()], dtype=np.int64)
+    changed = np.zeros(len(nearest), dtype=bool)
+    for base, idx in zip(base_indices, indices):
+        changed |= base[nearest] != idx
+    return int(np.count_nonzero(changed))
+
+def lod_copies(context, collection, obj, props, ratios):
+    """Decimated, mapped copies of obj's evaluated mesh, one per ratio
+    
+    Vertices on palette region borders are weighted out of the decimation
+    so collapses don't blend corner colors across regions. Returns the LOD
+    objects and per-level triangle counts and palette errors (corners whose
+    slot differs from the source corner at the same spot).
+    """
+    depsgraph = context.evaluated_depsgraph_get()
+    base = bpy.data.meshes.new_from_object(obj.evaluated_get(depsgraph), preserve_all_data_layers=True, depsgraph=depsgraph)
+    base.materials.clear()
+    
+    names = (props.color_name, props.metal_name)
+    indices = [update_palette_index(base, name, bpy.data.palettes[name]) for name in names]
+    border = palette_borders(base, indices)
+    tree = corner_tree(corner_samples(base)) if len(base.loops) else None
+    stats = [{"level": 0, "ratio": 1.0, "triangles": triangle_count(base), "palette_errors": 0}]
+    
+    src = bpy.data.objects.new(obj.name + "_lod_source", base)
+    collection.objects.link(src)
+    group = src.vertex_groups.new(name=LOD_BORDER_GROUP)
+    group.add(np.flatnonzero(border).tolist(), 1.0, 'REPLACE')
+    
+    # inverted, so border vertices get zero weight and the highest collapse cost
+    mod = src.modifiers.new("Decimate", 'DECIMATE')
+    mod.vertex_group = LOD_BORDER_GROUP
+    mod.invert_vertex_group = True
+    mod.vertex_group_factor = 1000.0
+    
+    lods = []
+    try:
+        for level, ratio in enumerate(ratios, 1):
+            mod.ratio = ratio
+            depsgraph = context.evaluated_depsgraph_get()
+            mesh = bpy.data.meshes.new_from_object(src.evaluated_get(depsgraph), preserve_all_data_layers=True, depsgraph=depsgraph)
+            
+            lod_indices = [update_palette_index(mesh, name, bpy.data.palettes[name]) for name in names]
+            errors = slot_changes(tree, indices, mesh, lod_indices) if tree else 0
+            map_mesh_uvs(mesh, props, True)
+            if mesh.color_attributes.get("Color"):
+                mesh.color_attributes.active_color_name = "Color"
+            
+            lod = bpy.data.objects.new(f"{obj.name}_LOD{level}", mesh)
+            lod.matrix_world = obj.matrix_world
+            lods.append(lod)
+            stats.append({"level": level, "ratio": ratio, "triangles": triangle_count(mesh), "palette_errors": errors})
+    finally:
+        bpy.data.objects.remove(src)
+        bpy.data.meshes.remove(base)
+    
+    return lods, stats
+
+def uses_uber(obj):
+    return any(slot.material and slot.material.name == "UberShader" for slot in obj.material_slots)
+
+def cell_key(obj, cell_size):
+    # grid cell holding the world space center of the object's bounds
+    corners = [obj.matrix_world @ Vector(c) for c in obj.bound_box]
+    center = sum(corners, Vector()) / len(corners)
+    return tuple(int(math.floor(c / cell_size)) for c in center)
+
+def triangle_count(mesh):
+    loop_total = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_total)
+    return int((loop_total - 2).sum())
+
+def merge_copies(context, objects, copies, cell_size):
+    """Join the copies into one transform-baked mesh per spatial cell
+    
+    Returns the batch objects and the layout written next to the export.
+    """
+    cells = {}
+    for obj, copy in zip(objects, copies):
+        cells.setdefault(cell_key(obj, cell_size), []).append((obj, copy))
+    
+    batches = []
+    layout = {"cell_size": cell_size, "batches": {}}
+    for key, members in sorted(cells.items()):
+        group = [copy for obj, copy in members]
+        for copy in group:
+            copy.data.transform(copy.matrix_world)
+            copy.matrix_world.identity()
+        
+        batch = group[0]
+        if len(group) > 1:
+            with context.temp_override(active_object=batch, object=batch,
+                                       selected_objects=group, selected_editable_objects=group):
+                bpy.ops.object.join()
+        
+        batch.name = "Batch_" + "_".join(str(k) for k in key)
+        batches.append(batch)
+        layout["batches"][batch.name] = {
+            "cell": list(key),
+            "objects": [obj.name for obj, copy in members],
+            "triangles": triangle_count(batch.data),
+        }
+    
+    return batches, layout
+
+# corners of evaluated copies alive at once; larger exports are split into part files
+EXPORT_GROUP_CORNERS = 1 << 23
+
+def export_groups(units, corners, limit):
+    """Split units (lists of objects exported together) into groups of at most limit corners
+    
+    A unit larger than the limit still gets a group of its own.
+    """
+    groups = [[]]
+    size = 0
+    for unit in units:
+        n = sum(len(obj.data.loops) for obj in unit) * corners
+        if groups[-1] and size + n > limit:
+            groups.append([])
+            size = 0
+        groups[-1] += unit
+        size += n
+    return groups
+
+def export_evaluated(context, objects, filepath, props, cell_size=0.0, lod_ratios=(), group_corners=EXPORT_GROUP_CORNERS, rows=None):
+    """Export objects through the depsgraph without modifying them
+    
+    The geometry nodes result is read from the evaluated mesh and the UV
+    mapping is done on a temporary copy, so nothing has to be restored.
+    With a cell_size the copies are merged into one mesh per spatial cell
+    and the batch layout is written to <file>.batches.json (lod_ratios
+    must be empty then, batches have no LODs). Otherwise
+    lod_ratios adds <name>_LOD1..N objects, reported in <file>.lods.json,
+    and objects with palette overrides get their texture row pair as the
+    vp_palette_row node extra (merged batches always use pair 0). rows maps
+    object names to their pair, palette_overrides of the objects by default.
+    
+    Copies only exist for group_corners corners at a time (whole cells when
+    merging). Exports that don't fit are written as <file>_part1..N.gltf,
+    listed in <file>.parts.json.
+    """
+    if cell_size > 0.0 and lod_ratios:
+        raise ValueError("LODs can't be generated for merged batches")
+    if rows is None:
+        rows = palette_overrides(objects, props)[1]
+    if cell_size > 0.0:
+        cells = {}
+        for obj in objects:
+            cells.setdefault(cell_key(obj, cell_size), []).append(obj)
+        units = [cells[key] for key in sorted(cells)]
+    else:
+        units = [[obj] for obj in objects]
+    groups = export_groups(units, 1.0 + sum(lod_ratios), group_corners)
+    
+    stem = os.path.splitext(filepath)[0]
+    paths = [filepath] if len(groups) == 1 else [f"{stem}_part{i}.gltf" for i in range(1, len(groups) + 1)]
+    
+    report = {}
+    for group, path in zip(groups, paths):
+        part = export_group(context, group, path, props, cell_size, lod_ratios, rows)
+        if "batches" in part:
+            report.setdefault("batches", {"cell_size": cell_size, "batches": {}})
+            for name, batch in part["batches"]["batches"].items():
+                report["batches"]["batches"][name] = dict(batch, file=os.path.basename(path))
+        if "lods" in part:
+            report.setdefault("lods", {}).update(part["lods"])
+    if len(paths) > 1:
+        report["parts"] = [os.path.basename(path) for path in paths]
+    elif os.path.exists(stem + ".parts.json"):
+        # left over from an earlier, larger export to the same path
+        os.remove(stem + ".parts.json")
+    
+    for key in ("batches", "lods", "parts"):
+        if key in report:
+            with open(stem + f".{key}.json", "w") as f:
+                json.dump(report[key], f, indent=1)
+    
+    return report
+
+def export_group(context, objects, filepath, props, cell_size, lod_ratios, rows):
+    depsgraph = context.evaluated_depsgraph_get()
+    view_layer = context.view_layer
+    selected = [o for o in view_layer.objects if o.select_get()]
+    active = view_layer.objects.active
+    
+    collection = bpy.data.collections.new("VPipelineExport")
+    context.scene.collection.children.link(collection)
+    
+    copies = []
+    meshes = []
+    names = {}
+    report = {}
+    extras = False
+    try:
+        for obj in objects:
+            with phase("evaluate"):
+                copy = evaluated_copy(obj, depsgraph, props)
+            if cell_size <= 0.0 and rows.get(obj.name):
+                copy["vp_palette_row"] = rows[obj.name]
+                extras = True
+            collection.objects.link(copy)
+            copies.append(copy)
+            meshes.append(copy.data)
+        
+        if cell_size > 0.0:
+            copies, report["batches"] = merge_copies(context, objects, copies, cell_size)
+        else:
+            if lod_ratios:
+                report["lods"] = {}
+                for obj in objects:
+                    lods, stats = lod_copies(context, collection, obj, props, lod_ratios)
+                    for lod in lods:
+                        collection.objects.link(lod)
+                        meshes.append(lod.data)
+                    report["lods"][obj.name] = stats
+            
+            # the copies take over the source names so the glTF nodes keep them; the
+            # sources get short placeholders, appending to a long name would truncate it
+            for i, (obj, copy) in enumerate(zip(objects, copies)):
+                names[obj] = obj.name
+                obj.name = f"VPSource{i}"
+            for obj, copy in zip(objects, copies):
+                copy.name = names[obj]
+        
+        for o in selected:
+            o.select_set(False)
+        for copy in collection.objects:
+            copy.select_set(True)
+        
+        with phase("glTF export"):
+            export_gltf(filepath, extras=extras)
+    finally:
+        for copy in list(collection.objects):
+            bpy.data.objects.remove(copy)
+        for mesh in meshes:
+            if mesh.users == 0:
+                bpy.data.meshes.remove(mesh)
+        bpy.data.collections.remove(collection)
+        
+        for obj, name in names.items():
+            obj.name = name
+        for o in selected:
+            o.select_set(True)
+        view_layer.objects.active = active
+    
+    return report
+
+### PAINT PREVIEW
+
+# painted objects with the ColorConverter switched off: name -> (sRGB codes of the palette
+# attributes, the PREVIEW_COLOR buffer from before the preview)
+_paint_preview = {}
+PREVIEW_COLOR = "Color"
+
+# painted objects waiting for the next preview update; strokes in between are diffed together
+_preview_dirty = set()
+PREVIEW_INTERVAL = 0.2
+
+# below this many changed elements, attribute items are written one by one instead of a full foreach_set
+PREVIEW_SPARSE = 4096
+
+def color_converter(obj):
+    cc = bpy.data.node_groups.get('ColorConverter')
+    for mod in obj.modifiers:
+        if mod.type == 'NODES' and mod.node_group == cc:
+            return mod
+    return None
+
+def write_changed(mesh, att, key, corners, values):
+    """Write values for a few corners, mapped onto the attribute's own domain"""
+    items = corners
+    if att.domain == 'POINT':
+        items, first = np.unique(loop_vertices(mesh)[corners], return_index=True)
+        values = values[first]
+    
+    if len(items) <= PREVIEW_SPARSE:
+        for i, value in zip(items.tolist(), values.tolist()):
+            setattr(att.data[i], key, value)
+        return
+    
+    width = values.shape[1] if values.ndim > 1 else 1
+    buf = np.empty(len(att.data) * width, dtype=values.dtype)
+    att.data.foreach_get(key, buf)
+    buf = buf.reshape(-1, width) if width > 1 else buf
+    buf[items] = values
+    att.data.foreach_set(key, buf.ravel())
+
+def start_paint_preview(obj, props):
+    mod = color_converter(obj)
+    if mod is None or obj.name in _paint_preview:
+        return
+    
+    mesh = obj.data
+    codes = {name: color_codes(corner_colors(mesh, mesh.color_attributes[name]))
+             for name in (props.color_name, props.metal_name)}
+    # the preview paints into "Color", so keep what was there to put back afterwards
+    preview = mesh.color_attributes.get(PREVIEW_COLOR)
+    _paint_preview[obj.name] = (codes, attribute_colors(preview) if preview else None)
+    mod.show_viewport = False
+    obj["vp_preview"] = True
+
+def end_paint_preview(obj, props):
+    """Switch the ColorConverter back on, put "Color" back and rebuild the palette slot attributes in full
+    
+    A preview left on by a file saved mid-stroke has no stored "Color" to put back.
+    """
+    codes, original = _paint_preview.pop(obj.name, (None, None))
+    _preview_dirty.discard(obj.name)
+    if "vp_preview" in obj:
+        del obj["vp_preview"]
+    
+    preview = obj.data.color_attributes.get(PREVIEW_COLOR)
+    if original is not None and preview and len(preview.data) == len(original):
+        preview.data.foreach_set("color_srgb", original.ravel())
+    
+    mod = color_converter(obj)
+    if mod:
+        mod.show_viewport = True
+    
+    for name in (props.color_name, props.metal_name):
+        palette = bpy.data.palettes.get(name)
+        if palette and obj.data.color_attributes.get(name):
+            update_palette_index(obj.data, name, palette)
+
+def end_all_previews(props):
+    for name in list(_paint_preview):
+        obj = bpy.data.objects.get(name)
+        if obj:
+            end_paint_preview(obj, props)
+        else:
+            del _paint_preview[name]
+
+def preview_diff(obj, props):
+    mesh = obj.data
+    codes = _paint_preview[obj.name][0]
+    
+    for name in (props.color_name, props.metal_name):
+        att = mesh.color_attributes.get(name)
+        if not att or name not in codes:
+            continue
+        
+        colors = corner_colors(mesh, att)
+        current = color_codes(colors)
+        changed = np.flatnonzero(current != codes[name])
+        if not len(changed):
+            continue
+        codes[name] = current
+        
+        indices = palette_lut(bpy.data.palettes[name])[current[changed]]
+        index_att = mesh.attributes.get(index_name(name))
+        if index_att:
+            write_changed(mesh, index_att, "value", changed, indices.astype(np.int32))
+        
+        # the material shows "Color" while the converter is off
+        preview = mesh.color_attributes.get(PREVIEW_COLOR)
+        if name == props.color_name and preview:
+            rgba = np.ones((len(changed), 4), dtype=np.float32)
+            rgba[:, :3] = colors[changed]
+            write_changed(mesh, preview, "color_srgb", changed, rgba)
+
+@bpy.app.handlers.persistent
+def paint_preview_update(scene, depsgraph):
+    # every stroke step is a depsgraph update; only note the object and diff on a timer
+    if not _paint_preview:
+        return
+    
+    for update in depsgraph.updates:
+        id = update.id.original
+        if isinstance(id, bpy.types.Object) and id.name in _paint_preview and update.is_updated_geometry:
+            _preview_dirty.add(id.name)
+    
+    if _preview_dirty and not bpy.app.timers.is_registered(flush_paint_preview):
+        bpy.app.timers.register(flush_paint_preview, first_interval=PREVIEW_INTERVAL)
+
+def flush_paint_preview():
+    props = bpy.context.scene.VPipelineProps
+    for name in list(_preview_dirty):
+        _preview_dirty.discard(name)
+        obj = bpy.data.objects.get(name)
+        if obj and name in _paint_preview:
+            preview_diff(obj, props)
+    # one shot, the next stroke registers it again
+    return None
+
+def paint_mode_changed(*args):
+    props = bpy.context.scene.VPipelineProps
+    obj = bpy.context.active_object
+    
+    for name in list(_paint_preview):
+        painted = bpy.data.objects.get(name)
+        if painted is None:
+            del _paint_preview[name]
+        elif painted != obj or painted.mode != 'VERTEX_PAINT':
+            end_paint_preview(painted, props)
+    
+    if obj and obj.mode == 'VERTEX_PAINT' and props.live_preview and setup_state(obj, props):
+        start_paint_preview(obj, props)
+
+def reload_paint_preview():
+    # a file saved mid-stroke still has its ColorConverter switched off
+    _paint_preview.clear()
+    _preview_dirty.clear()
+    for obj in bpy.data.objects:
+        if obj.get("vp_preview"):
+            end_paint_preview(obj, bpy.context.scene.VPipelineProps)
+
+
+### JOBS
+
+# corners handled per step of a modal job; foreach_get/set only move whole
+# buffers, so each of those is a step of its own
+JOB_CHUNK = 1 << 18
+
+def chunk_spans(count, size=JOB_CHUNK):
+    # an empty mesh still gets one (empty) step
+    return [(start, min(start + size, count)) for start in range(0, count, size)] or [(0, 0)]
+
+def run_steps(steps):
+    """Run a step generator to the end in one go, returning its result"""
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+def palette_index_steps(mesh, name, lut):
+    """update_palette_index in steps: the color read, each lookup chunk and the write"""
+    colors = corner_colors(mesh, mesh.color_attributes[name])
+    yield
+    indices = np.empty(len(colors), dtype=np.int16)
+    for start, end in chunk_spans(len(colors)):
+        indices[start:end] = lut[color_codes(colors[start:end])]
+        yield
+    count_matches(indices)
+    write_palette_index(mesh, name, indices)
+    return indices
+
+def read_selection(mesh):
+    selection = []
+    for items in (mesh.vertices, mesh.edges, mesh.polygons):
+        sel = np.empty(len(items), dtype=bool)
+        items.foreach_get("select", sel)
+        selection.append(sel)
+    return selection
+
+def write_selection(mesh, selection):
+    for items, sel in zip((mesh.vertices, mesh.edges, mesh.polygons), selection):
+        items.foreach_set("select", sel)
+
+def object_state(obj):
+    return ({att.name for att in obj.data.attributes},
+            {mod.name for mod in obj.modifiers},
+            list(obj.data.materials))
+
+def restore_object_state(obj, state):
+    """Drop attributes and modifiers added since the snapshot and put the materials back"""
+    names, modifiers, materials = state
+    
+    for name in [att.name for att in obj.data.attributes if att.name not in names]:
+        att = obj.data.attributes.get(name)
+        if att:
+            obj.data.attributes.remove(att)
+    
+    for mod in [mod for mod in obj.modifiers if mod.name not in modifiers]:
+        obj.modifiers.remove(mod)
+    
+    obj.data.materials.clear()
+    for mat in materials:
+        obj.data.materials.append(mat)
+    
+    clear_panel_state()
+
+def call_on(obj, operator, **kwargs):
+    with bpy.context.temp_override(object=obj, active_object=obj, selected_objects=[obj]):
+        operator(**kwargs)
+
+def map_uvs_job(objects, props, map, rollback):
+    names = (props.color_name, props.metal_name)
+    luts = [palette_lut(bpy.data.palettes[name]) for name in names]
+    total = sum(len(obj.data.loops) for obj in objects) or 1
+    done = 0
+    rewritten = 0
+    corners_total = 0
+    
+    for obj in objects:
+        mesh = obj.data
+        uvs, codes, key, corners = yield from plan_steps(mesh, names, map)
+        corners_total += len(uvs)
+        if not len(corners):
+            done += len(mesh.loops)
+            yield done / total
+            continue
+        
+        existing = [bool(mesh.attributes.get(index_name(name))) for name in names]
+        indices = []
+        for name in names:
+            indices.append(read_palette_index(mesh, name))
+            yield
+        
+        # registered before the first write, so a cancel between writes still restores everything
+        def restore(mesh=mesh, uvs=uvs.copy(), indices=[idx.copy() for idx in indices], existing=existing):
+            write_uvs(mesh, uvs)
+            for name, idx, exists in zip(names, indices, existing):
+                att = mesh.attributes.get(index_name(name))
+                if exists:
+                    write_palette_index(mesh, name, idx)
+                elif att:
+                    mesh.attributes.remove(att)
+            # the stored fingerprints describe the mapped UVs
+            for prop in ("vp_map_key", "vp_map_hashes"):
+                if prop in mesh:
+                    del mesh[prop]
+        rollback.append(restore)
+        
+        for start, end in chunk_spans(len(corners)):
+            remap_corners(uvs, codes, luts, indices, corners[start:end], map)
+            yield (done + len(mesh.loops) * end / len(corners)) / total
+        
+        write_uvs(mesh, uvs)
+        yield
+        for name, idx in zip(names, indices):
+            write_palette_index(mesh, name, idx)
+            yield
+        store_fingerprints(mesh, key, (yield from fingerprint_steps(codes, uvs)))
+        rewritten += len(corners)
+        count("corners rewritten", len(corners))
+        done += len(mesh.loops)
+        yield done / total
+    
+    return f"{rewritten} of {corners_total} corners rewritten"
+
+def select_job(objects, name, slot, mode, rollback):
+    lut = palette_lut(bpy.data.palettes[name])
+    total = sum(len(obj.data.loops) for obj in objects) or 1
+    done = 0
+    
+    for obj in objects:
+        mesh = obj.data
+        indices = yield from palette_index_steps(mesh, name, lut)
+        if slot >= 0:
+            selection = read_selection(mesh)
+            rollback.append(lambda mesh=mesh, selection=selection: write_selection(mesh, selection))
+            yield
+            select_palette_slot(mesh, indices, slot, mode)
+        done += len(mesh.loops)
+        yield done / total
+    
+    if slot >= 0 and mode == 'FACE':
+        bpy.context.tool_settings.mesh_select_mode = (False, False, True)
+    bpy.ops.object.mode_set(mode='EDIT')
+
+def setup_job(objects, props, rollback):
+    names = (props.color_name, props.metal_name)
+    luts = setup_palettes(names, props.palette_size)
+    yield
+    
+    meshes = set()
+    for i, obj in enumerate(objects):
+        rollback.append(snapshot_undo(obj))
+        if obj.data.as_pointer() not in meshes:
+            meshes.add(obj.data.as_pointer())
+            yield from setup_mesh_steps(obj.data, names, luts)
+        setup_object(obj)
+        yield (i + 1) / len(objects)
+    
+    clear_panel_state()
+
+def object_job(objects, run, undo, rollback):
+    """Run a per-object operator, one object per step
+    
+    Used for Prep/Reset: applying a modifier is a single call that can't be
+    split, so an object is the smallest step those get.
+    """
+    for i, obj in enumerate(objects):
+        restore = undo(obj)
+        run(obj)
+        rollback.append(restore)
+        yield (i + 1) / len(objects)
+
+def snapshot_undo(obj):
+    state = object_state(obj)
+    return lambda: restore_object_state(obj, state)
+
+def prep_undo(obj):
+    return lambda: call_on(obj, bpy.ops.object.v_prep_export, reset=True)
+
+
 ### OPERATORS
 
 class SetActive(bpy.types.Operator):
@@ -249,6 +1867,7 @@ class SetActive(bpy.types.Operator):
             props.active_palette = v_name
             #obj.data.use_paint_mask = True
     
+    @instrumented
     def execute(self, context):
         scene = context.scene
         props = scene.VPipelineProps
@@ -275,6 +1894,7 @@ class SetMetalColor(bpy.types.Operator):
         # Make the operator available in all contexts by returning True
         return True  # You can add custom conditions if needed
     
+    @instrumented
     def execute(self, context):
         scene = context.scene
         props = scene.VPipelineProps
@@ -296,12 +1916,20 @@ class SelectCurrentColor(bpy.types.Operator):
     bl_options = {'REGISTER', 'UNDO'}
     
     index: IntProperty(name = "Index", default=0)
+    slot: IntProperty(name = "Palette Slot", default=-1, min=-1, description = "Palette slot to select, -1 uses the brush color")
+    mode: EnumProperty(
+        name = "Mode",
+        items = [('VERT', "Vertices", "Select the vertices of matching corners"),
+                 ('FACE', "Faces", "Select every face using the palette slot")],
+        default = 'VERT'
+    )
     
     @classmethod
     def poll(cls, context):
         # Make the operator available in all contexts by returning True
         return True  # You can add custom conditions if needed
     
+    @instrumented
     def execute(self, context):
         scene = context.scene
         props = scene.VPipelineProps
@@ -317,19 +1945,18 @@ class SelectCurrentColor(bpy.types.Operator):
         
         bpy.ops.object.mode_set(mode='OBJECT')
         
-        color_layer = mesh.color_attributes.get(v_name)
-        target_color = context.tool_settings.vertex_paint.brush.color
+        palette = bpy.data.palettes.get(v_name)
+        indices = update_palette_index(mesh, v_name, palette)
         
-        i = 0
-        for att in color_layer.data:
-            clr = Color((att.color_srgb[0], att.color_srgb[1], att.color_srgb[2]))
-            
-            if color_match(clr, target_color, 0.01):
-                print(target_color)
-                vi = mesh.loops[i].vertex_index
-                mesh.vertices[vi].select = True
-                
-            i += 1
+        slot = self.slot
+        if slot < 0:
+            target_color = context.tool_settings.vertex_paint.brush.color
+            slot = palette_lut(palette)[color_codes(np.array(target_color))]
+        
+        if slot >= 0:
+            select_palette_slot(mesh, indices, slot, self.mode)
+            if self.mode == 'FACE':
+                context.tool_settings.mesh_select_mode = (False, False, True)
         
         bpy.ops.object.mode_set(mode='EDIT')
         
@@ -347,6 +1974,7 @@ class PrintPalette(bpy.types.Operator):
         # Make the operator available in all contexts by returning True
         return True  # You can add custom conditions if needed
     
+    @instrumented
     def execute(self, context):
         scene = context.scene
         props = scene.VPipelineProps
@@ -383,7 +2011,7 @@ class PrintPalette(bpy.types.Operator):
                     b = round(srgb_to_linear(c.b), 6)
                     
                     comma = ","
-                    if i == len(c_p.colors)-1: comma = ""
+                    if i == len(m_p.colors)-1: comma = ""
                     
                     print(f"vec3({r}, {g}, {b})" + comma)
                     i += 1
@@ -393,6 +2021,37 @@ class PrintPalette(bpy.types.Operator):
             
         return {'FINISHED'}
 
+class ExportPaletteTexture(bpy.types.Operator):
+    """Write the color and metal palettes to a Godot palette texture for uber_palette.gdshader"""
+    bl_idname = "object.v_export_palette_texture"
+    bl_label = "Export Palette Texture"
+    bl_options = {'REGISTER'}
+    
+    filepath: StringProperty(subtype='FILE_PATH')
+    filter_glob: StringProperty(default="*.tres", options={'HIDDEN'})
+    
+    def invoke(self, context, event):
+        if not self.filepath:
+            self.filepath = bpy.path.abspath("//palette.tres") if bpy.data.filepath else "palette.tres"
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+    
+    @instrumented
+    def execute(self, context):
+        props = context.scene.VPipelineProps
+        
+        pairs, rows = palette_overrides(context.scene.objects, props)
+        if not all(pairs[0]):
+            self.report({'ERROR'}, "Color and metal palettes are not set up")
+            return {'CANCELLED'}
+        
+        filepath = bpy.path.ensure_ext(self.filepath, ".tres")
+        write_palette_texture(filepath, palette_rows([p for pair in pairs for p in pair]))
+        self.report({'INFO'}, f"Wrote {filepath} with {len(pairs) - 1} override palette pairs")
+        
+        return {'FINISHED'}
+
+
 class Setup(bpy.types.Operator):
     """Setup"""
     bl_idname = "object.v_setup"
@@ -404,75 +2063,27 @@ class Setup(bpy.types.Operator):
         # Make the operator available in all contexts by returning True
         return True  # You can add custom conditions if needed
     
-    def new_color_att(self, obj, props, name):
-        attribs = obj.data.color_attributes
-        if not attribs.get(name):
-            att = obj.data.color_attributes.new(
-                name=name,
-                type='BYTE_COLOR',
-                domain='CORNER'
-            )
-            
-            for v_index in range(len(obj.data.vertices)):
-                att.data[v_index].color = [0, 0, 0, 1]
-    
-    def new_color_palette(self, name):
-        color_p = bpy.data.palettes.get(name)
-        if not color_p:
-            pal = bpy.data.palettes.new(name)
-            
-            p1 = pal.colors.new()
-            p2 = pal.colors.new()
-            p3 = pal.colors.new()
-            p4 = pal.colors.new()
-            
-            pal.colors.active = p1
+    target: EnumProperty(
+        name = "Objects",
+        items = [('SELECTED', "Selected", "Selected mesh objects, or the active one"),
+                 ('COLLECTION', "Collection", "Every mesh in the active collection and its children")],
+        default = 'SELECTED'
+    )
     
+    @instrumented
     def execute(self, context):
         scene = context.scene
         props = scene.VPipelineProps
         
-        obj = context.active_object
+        if self.target == 'COLLECTION':
+            candidates = context.collection.all_objects
+        else:
+            candidates = context.selected_objects or [context.active_object]
         
-        if obj and obj.type == 'MESH':
-            # vertex colors
-            self.new_color_att(obj, props, props.color_name)
-            self.new_color_att(obj, props, props.metal_name)
-            self.new_color_att(obj, props, "Color")
-            self.new_color_att(obj, props, "AO")
-            self.new_color_att(obj, props, "EdgeMask")
-            
-            # materials
-            uber_mat = bpy.data.materials.get("UberShader")
-            
-            found = False
-            for m_slot in obj.material_slots:
-                mat = m_slot.material
-                if mat == uber_mat:
-                    found = True
-                    break
-            
-            if not found:
-                obj.data.materials.append(uber_mat)
-            
-            # palettes
-            self.new_color_palette(props.color_name)
-            self.new_color_palette(props.metal_name)
-            
-            # geonodes
-            cc = bpy.data.node_groups['ColorConverter']
-            found = False
-            for mod in obj.modifiers:
-                if mod.type == 'NODES':
-                    if mod.node_group == cc:
-                        found = True
-                
-            if not found:
-                mod = obj.modifiers.new('ColorConverter', type='NODES')
-                mod.node_group = cc
-                
-                c_id = mod.node_group.interface.items_tree["OutColor"].identifier
-                mod[c_id] = "Color"
+        objects = [obj for obj in candidates if obj and obj.type == 'MESH']
+        if objects:
+            setup_objects(objects, props)
+            self.report({'INFO'}, f"Set up {len(objects)} objects")
             
         return {'FINISHED'}
 
@@ -487,6 +2098,7 @@ class VPaint(bpy.types.Operator):
         # Make the operator available in all contexts by returning True
         return True  # You can add custom conditions if needed
     
+    @instrumented
     def execute(self, context):
         scene = context.scene
         props = scene.VPipelineProps
@@ -496,6 +2108,11 @@ class VPaint(bpy.types.Operator):
         obj.data.use_paint_mask = True
         bpy.ops.paint.vertex_color_set()
         
+        # keep the palette slot attribute in step with the paint
+        palette = bpy.data.palettes.get(props.active_palette)
+        if palette and obj.data.color_attributes.get(props.active_palette):
+            update_palette_index(obj.data, props.active_palette, palette)
+        
         return {'FINISHED'}
 
 
@@ -513,56 +2130,15 @@ class MapUVs(bpy.types.Operator):
         # Make the operator available in all contexts by returning True
         return True  # You can add custom conditions if needed
     
-    def shift_uv(self, mesh, attribute, palette, axis=0):
-        uv_layer = mesh.uv_layers.active.data
-        shift = 0
-        for palette_clr in palette.colors:
-            target_color = palette_clr.color
-            
-            i = 0
-            for att in attribute.data:
-                clr = Color((att.color_srgb[0], att.color_srgb[1], att.color_srgb[2]))
-                
-                if color_match(clr, target_color, 0.01):
-                    vi = mesh.loops[i].vertex_index
-                    uv = uv_layer[i].uv
-                    uv_normx = uv.x - math.floor(uv.x)
-                    uv_normy = uv.y - math.floor(uv.y)
-                    
-                    if self.map:
-                        if axis == 0:
-                            uv_layer[i].uv.x = uv_normx + shift
-                        elif axis == 1:
-                            uv_layer[i].uv.y = uv_normy + shift
-                    else:
-                        if axis == 0:
-                            uv_layer[i].uv.x = uv_normx
-                        elif axis == 1:
-                            uv_layer[i].uv.y = uv_normy
-                
-                i += 1
-                
-            shift += 1
-    
+    @instrumented
     def execute(self, context):
         scene = context.scene
         props = scene.VPipelineProps
         
         obj = context.active_object
         if obj:
-            mesh = obj.data
-        
-            mesh.uv_layers.active = mesh.uv_layers['UVMap']
-            
-            color_layer = mesh.color_attributes.get(props.color_name)
-            color_palette = bpy.data.palettes.get(props.color_name)
-            
-            self.shift_uv(mesh, color_layer, color_palette, 0)
-            
-            metal_layer = mesh.color_attributes.get(props.metal_name)
-            metal_palette = bpy.data.palettes.get(props.metal_name)
-            
-            self.shift_uv(mesh, metal_layer, metal_palette, 1)
+            rewritten = map_mesh_uvs(obj.data, props, self.map)
+            self.report({'INFO'}, f"{rewritten} of {len(obj.data.loops)} corners rewritten")
                     
         return {'FINISHED'}
 
@@ -580,12 +2156,16 @@ class PrepExport(bpy.types.Operator):
         # Make the operator available in all contexts by returning True
         return True  # You can add custom conditions if needed
     
+    @instrumented
     def execute(self, context):
         scene = context.scene
         props = scene.VPipelineProps
         
         obj = context.active_object
         
+        # the converter has to be live again before it can be applied
+        end_all_previews(props)
+        
         if obj:
             if self.reset:
                 # materials
@@ -609,24 +2189,430 @@ class PrepExport(bpy.types.Operator):
                     mod[c_id] = "Color"
                     mod["OutColor"] = "Color"
             else:
-                bpy.ops.object.modifier_apply(modifier="ColorConverter")
+                with phase("apply ColorConverter"):
+                    bpy.ops.object.modifier_apply(modifier="ColorConverter")
                 obj.data.materials.clear()
+                count("corners", len(obj.data.loops))
+        
+        return {'FINISHED'}
+
+
+class BakeMasks(bpy.types.Operator):
+    """Bake AO and EdgeMask vertex colors on the CPU"""
+    bl_idname = "object.v_bake_masks"
+    bl_label = "Bake AO/Edge Mask"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    ao: BoolProperty(name = "AO", default=True)
+    edges: BoolProperty(name = "Edge Mask", default=True)
+    samples: IntProperty(name = "Samples", default=32, min=1, max=1024)
+    distance: FloatProperty(name = "Distance", default=1.0, min=0.0001, subtype='DISTANCE')
+    edge_angle: FloatProperty(name = "Edge Angle", default=math.radians(60.0), min=0.01, max=math.pi, subtype='ANGLE',
+        description = "Dihedral angle at which a convex edge gets the full mask")
+    jobs: IntProperty(name = "Processes", default=0, min=0,
+        description = "AO worker processes in background runs (blender -b), 0 uses every core. The UI bakes in one process")
+    
+    @classmethod
+    def poll(cls, context):
+        return context.active_object and context.active_object.type == 'MESH'
+    
+    @instrumented
+    def execute(self, context):
+        obj = context.active_object
+        mesh = obj.data
+        if obj.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+        
+        for name in ("AO", "EdgeMask"):
+            if not mesh.color_attributes.get(name):
+                self.report({'ERROR'}, f"Missing {name} attribute, run Setup first")
+                return {'CANCELLED'}
+        
+        if self.edges:
+            with phase("edge mask"):
+                write_grey(mesh, "EdgeMask", edge_mask(mesh, self.edge_angle))
+        if self.ao:
+            with phase("ambient occlusion"):
+                write_grey(mesh, "AO", ambient_occlusion(mesh, self.samples, self.distance, self.jobs))
+        count("vertices", len(mesh.vertices))
+        
+        mesh.update()
+        return {'FINISHED'}
+
+
+# baked masks nobody paints by hand; the paint layers only move to points when asked
+POINT_CANDIDATES = ("AO", "EdgeMask")
+
+class OptimizeDomains(bpy.types.Operator):
+    """Report vertex splits caused by corner color attributes and move per-vertex uniform masks to points"""
+    bl_idname = "object.v_optimize_domains"
+    bl_label = "Optimize Attribute Domains"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    convert: BoolProperty(name = "Convert", default=True, description = "Convert uniform AO/EdgeMask attributes to the POINT domain")
+    paint_layers: BoolProperty(name = "Paint Layers", default=False,
+        description = "Also convert uniform color/metal paint layers and Color; painting then colors whole vertices instead of face corners")
+    
+    @classmethod
+    def poll(cls, context):
+        return context.active_object and context.active_object.type == 'MESH'
+    
+    @instrumented
+    def execute(self, context):
+        scene = context.scene
+        props = scene.VPipelineProps
+        
+        obj = context.active_object
+        mesh = obj.data
+        if obj.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+        
+        paint = [props.color_name, props.metal_name, "Color"]
+        allowed = list(POINT_CANDIDATES) + (paint if self.paint_layers else [])
+        stats, before, after = vertex_splits(mesh, paint + list(POINT_CANDIDATES), allowed)
+        
+        uniform = [name for name, (factor, is_uniform) in stats.items() if is_uniform]
+        converted = [name for name in uniform if name in allowed] if self.convert else []
+        for name in converted:
+            convert_to_point(mesh, name)
+        
+        factors = ", ".join(f"{name} {factor:.2f}x" for name, (factor, is_uniform) in stats.items())
+        kept = [name for name in uniform if name not in converted]
+        self.report({'INFO'}, f"Split factors: {factors}. Exported vertices {before} -> {after}, "
+                              f"converted: {', '.join(converted) or 'none'}, "
+                              f"uniform but kept on corners: {', '.join(kept) or 'none'}")
+        
+        return {'FINISHED'}
+
+
+class ExportGLTF(bpy.types.Operator):
+    """Export selected objects to glTF without applying modifiers or clearing materials"""
+    bl_idname = "object.v_export_gltf"
+    bl_label = "Export glTF"
+    bl_options = {'REGISTER'}
+    
+    filepath: StringProperty(name = "File Path", subtype='FILE_PATH', default="")
+    filter_glob: StringProperty(default="*.gltf", options={'HIDDEN'})
+    merge: BoolProperty(name = "Merge", default=False,
+        description = "Merge every UberShader object in the active collection into one mesh per cell")
+    cell_size: FloatProperty(name = "Cell Size", default=50.0, min=0.001, subtype='DISTANCE',
+        description = "Size of the spatial cells objects are batched by")
+    lod_ratios: StringProperty(name = "LOD Ratios", default="",
+        description = "Comma separated decimate ratios for LOD1..N, e.g. 0.5, 0.25")
+    
+    @classmethod
+    def poll(cls, context):
+        return context.mode == 'OBJECT'
+    
+    def invoke(self, context, event):
+        if not self.filepath:
+            self.filepath = bpy.path.ensure_ext(bpy.data.filepath or "untitled", ".gltf")
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+    
+    @instrumented
+    def execute(self, context):
+        scene = context.scene
+        props = scene.VPipelineProps
+        
+        # exports read the evaluated mesh, so paint previews have to convert first
+        end_all_previews(props)
+        
+        if self.merge:
+            candidates = [o for o in context.collection.all_objects if o.type == 'MESH' and uses_uber(o)]
+        else:
+            candidates = context.selected_objects
+        
+        objects = [o for o in candidates if o.type == 'MESH'
+                   and o.data.color_attributes.get(props.color_name)
+                   and o.data.color_attributes.get(props.metal_name)]
+        if not objects:
+            self.report({'WARNING'}, "No objects are set up for V Pipeline")
+            return {'CANCELLED'}
+        
+        try:
+            ratios = [float(r) for r in self.lod_ratios.replace(",", " ").split()]
+        except ValueError:
+            self.report({'ERROR'}, f"Invalid LOD ratios: {self.lod_ratios}")
+            return {'CANCELLED'}
+        
+        if self.merge and ratios:
+            self.report({'WARNING'}, "LOD ratios are ignored when merging into batches")
+            ratios = []
+        
+        filepath = bpy.path.ensure_ext(self.filepath, ".gltf")
+        report = export_evaluated(context, objects, filepath, props, self.cell_size if self.merge else 0.0, ratios)
+        
+        if "batches" in report:
+            self.report({'INFO'}, f"Exported {len(objects)} objects in {len(report['batches']['batches'])} batches")
+        elif "lods" in report:
+            levels = [s for stats in report["lods"].values() for s in stats if s["level"] > 0]
+            errors = sum(s["palette_errors"] for s in levels)
+            self.report({'INFO'}, f"Exported {len(objects)} objects with {len(ratios)} LODs, {errors} palette index errors")
+        else:
+            self.report({'INFO'}, f"Exported {len(objects)} objects")
+        if "parts" in report:
+            self.report({'INFO'}, f"Split into {len(report['parts'])} files, see {os.path.splitext(filepath)[0]}.parts.json")
+        
+        return {'FINISHED'}
+
+
+class RunJob(bpy.types.Operator):
+    """Run a pipeline step over the selected objects in timer steps that keep the UI drawing, Esc cancels and rolls back"""
+    bl_idname = "object.v_run_job"
+    bl_label = "Run V Pipeline Job"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    job: EnumProperty(
+        name = "Job",
+        items = [('MAP', "Map UVs", "Encode palette slots into the UVs"),
+                 ('RESTORE', "Restore UVs", "Strip palette slots from the UVs"),
+                 ('SELECT', "Select", "Select corners using a palette slot"),
+                 ('SETUP', "Setup", "Add palettes, attributes, material and modifier"),
+                 ('PREP', "Prep for Export", "Apply the ColorConverter and clear materials"),
+                 ('RESET', "Restore Geo Nodes/Uber Mat", "Put the ColorConverter and UberShader back")],
+        default = 'MAP'
+    )
+    index: IntProperty(name = "Index", default=0)
+    slot: IntProperty(name = "Palette Slot", default=-1, min=-1, description = "Palette slot to select, -1 uses the brush color")
+    mode: EnumProperty(
+        name = "Mode",
+        items = [('VERT', "Vertices", "Select the vertices of matching corners"),
+                 ('FACE', "Faces", "Select every face using the palette slot")],
+        default = 'VERT'
+    )
+    
+    # seconds of work per timer tick before the UI gets control back
+    budget = 0.05
+    
+    @classmethod
+    def poll(cls, context):
+        return not context.scene.VPipelineProps.job_running
+    
+    def job_label(self):
+        return bpy.types.UILayout.enum_item_name(self, "job", self.job)
+    
+    def job_steps(self, context, objects, rollback):
+        props = context.scene.VPipelineProps
+        
+        if self.job in ('MAP', 'RESTORE'):
+            return map_uvs_job(objects, props, self.job == 'MAP', rollback)
+        
+        if self.job == 'SELECT':
+            name = props.color_name if self.index == 0 else props.metal_name
+            slot = self.slot
+            if slot < 0:
+                target_color = context.tool_settings.vertex_paint.brush.color
+                slot = palette_lut(bpy.data.palettes[name])[color_codes(np.array(target_color))]
+            return select_job(objects, name, int(slot), self.mode, rollback)
+        
+        if self.job == 'SETUP':
+            return setup_job(objects, props, rollback)
+        
+        if self.job == 'PREP':
+            return object_job(objects, lambda obj: call_on(obj, bpy.ops.object.v_prep_export, reset=False), prep_undo, rollback)
+        
+        return object_job(objects, lambda obj: call_on(obj, bpy.ops.object.v_prep_export, reset=True), snapshot_undo, rollback)
+    
+    def start(self, context):
+        objects = [obj for obj in context.selected_objects if obj.type == 'MESH']
+        obj = context.active_object
+        if obj and obj.type == 'MESH' and obj not in objects:
+            objects.append(obj)
+        
+        if not objects:
+            self.report({'WARNING'}, "No mesh objects selected")
+            return False
+        
+        if context.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+        
+        self.objects = objects
+        self.rollback = []
+        self.steps = self.job_steps(context, objects, self.rollback)
+        
+        props = context.scene.VPipelineProps
+        props.job_name = self.job_label()
+        props.job_progress = 0.0
+        return True
+    
+    @instrumented
+    def execute(self, context):
+        # scripts and redo run the whole job in one go
+        if not self.start(context):
+            return {'CANCELLED'}
+        while True:
+            try:
+                next(self.steps)
+            except StopIteration as stop:
+                self.summarize(stop.value)
+                return {'FINISHED'}
+    
+    def objects_valid(self):
+        # the generators hold object and mesh references; stop before touching freed ones
+        try:
+            return all(obj.mode == 'OBJECT' and obj.data for obj in self.objects)
+        except ReferenceError:
+            return False
+    
+    def invoke(self, context, event):
+        if not self.start(context):
+            return {'CANCELLED'}
+        
+        props = context.scene.VPipelineProps
+        props.job_running = True
+        
+        # recorded across timer ticks, paused while the UI has control
+        self.record = Recording(self.job_label(), props.profile_cprofile, props.profile_memory) if props.profile else None
+        
+        wm = context.window_manager
+        self.timer = wm.event_timer_add(0.01, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+    
+    def modal(self, context, event):
+        props = context.scene.VPipelineProps
+        
+        if event.type == 'ESC':
+            self.finish(context)
+            if not self.objects_valid():
+                self.report({'WARNING'}, f"{props.job_name} cancelled, its objects changed so nothing was rolled back")
+                return {'CANCELLED'}
+            for restore in reversed(self.rollback):
+                restore()
+            self.report({'WARNING'}, f"{props.job_name} cancelled, {len(self.rollback)} object(s) rolled back")
+            return {'CANCELLED'}
+        
+        if event.type != 'TIMER':
+            # swallow input so undo, delete or a mode switch can't pull data out from under the job
+            return {'RUNNING_MODAL'}
+        
+        if not self.objects_valid():
+            # nothing safe to roll back onto
+            self.finish(context)
+            self.report({'WARNING'}, f"{props.job_name} stopped, its objects were removed or changed mode")
+            return {'CANCELLED'}
+        
+        deadline = time.perf_counter() + self.budget
+        if self.record:
+            self.record.resume()
+        try:
+            while time.perf_counter() < deadline:
+                with phase("step"):
+                    progress = next(self.steps)
+                # steps inside an object yield None, the job yields its progress between them
+                if progress is not None:
+                    props.job_progress = progress
+        except StopIteration as stop:
+            self.finish(context)
+            self.summarize(stop.value)
+            return {'FINISHED'}
+        except Exception as e:
+            self.finish(context)
+            if self.objects_valid():
+                for restore in reversed(self.rollback):
+                    restore()
+            self.report({'ERROR'}, f"{props.job_name} failed: {e}")
+            return {'CANCELLED'}
+        finally:
+            if self.record:
+                self.record.pause()
+        
+        self.redraw(context)
+        return {'RUNNING_MODAL'}
+    
+    def summarize(self, summary):
+        # jobs may return a line for the info bar
+        if summary:
+            self.report({'INFO'}, summary)
+    
+    def finish(self, context):
+        context.window_manager.event_timer_remove(self.timer)
+        if self.record:
+            self.record.finish()
+            self.record = None
+        context.scene.VPipelineProps.job_running = False
+        self.redraw(context)
+    
+    def redraw(self, context):
+        for area in context.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+
+
+class WriteTrace(bpy.types.Operator):
+    """Write the recorded operator runs as a Chrome trace (chrome://tracing, Perfetto)"""
+    bl_idname = "object.v_write_trace"
+    bl_label = "Write Trace"
+    bl_options = {'REGISTER'}
+    
+    filepath: StringProperty(subtype='FILE_PATH')
+    filter_glob: StringProperty(default="*.json", options={'HIDDEN'})
+    
+    def invoke(self, context, event):
+        if not self.filepath:
+            self.filepath = bpy.path.abspath("//vpipeline_trace.json") if bpy.data.filepath else "vpipeline_trace.json"
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+    
+    def execute(self, context):
+        filepath = bpy.path.ensure_ext(self.filepath, ".json")
+        with open(filepath, "w") as f:
+            json.dump({"traceEvents": list(_trace), "displayTimeUnit": "ms"}, f)
+        self.report({'INFO'}, f"Wrote {len(_trace)} events to {filepath}")
+        
+        return {'FINISHED'}
+
+
+class ClearTrace(bpy.types.Operator):
+    """Drop the recorded trace events"""
+    bl_idname = "object.v_clear_trace"
+    bl_label = "Clear Trace"
+    bl_options = {'REGISTER'}
+    
+    def execute(self, context):
+        _trace.clear()
+        _last_recording[0] = None
         
         return {'FINISHED'}
 
 
 ###
 
-classes = [VPipelineProperties, VPipelinePanel, SetActive, SetMetalColor,
-    SelectCurrentColor, PrintPalette, Setup, VPaint, MapUVs, PrepExport]
+@bpy.app.handlers.persistent
+def reset_jobs(dummy):
+    # a file saved mid-job would otherwise keep the job operators disabled
+    for scene in bpy.data.scenes:
+        scene.VPipelineProps.job_running = False
+
+classes = [VPipelineProperties, VPipelineObjectProperties, VPipelinePanel, SetActive, SetMetalColor,
+    SelectCurrentColor, PrintPalette, ExportPaletteTexture, Setup, VPaint, MapUVs, PrepExport, BakeMasks, OptimizeDomains, ExportGLTF, RunJob, WriteTrace, ClearTrace]
 
 def register():
     for cls in classes:
         bpy.utils.register_class(cls)
     
     bpy.types.Scene.VPipelineProps = PointerProperty(type = VPipelineProperties)
+    bpy.types.Object.VPipelineObjectProps = PointerProperty(type = VPipelineObjectProperties)
+    bpy.app.handlers.load_post.append(reset_jobs)
+    bpy.app.handlers.load_post.append(reload_panel_state)
+    bpy.app.handlers.depsgraph_update_post.append(invalidate_panel_state)
+    bpy.app.handlers.depsgraph_update_post.append(paint_preview_update)
+    subscribe_panel_state()
 
 def unregister():
+    for handlers, handler in ((bpy.app.handlers.load_post, reset_jobs),
+                              (bpy.app.handlers.load_post, reload_panel_state),
+                              (bpy.app.handlers.depsgraph_update_post, invalidate_panel_state),
+                              (bpy.app.handlers.depsgraph_update_post, paint_preview_update)):
+        if handler in handlers:
+            handlers.remove(handler)
+    bpy.msgbus.clear_by_owner(_msgbus_owner)
+    if bpy.app.timers.is_registered(flush_paint_preview):
+        bpy.app.timers.unregister(flush_paint_preview)
+    end_all_previews(bpy.context.scene.VPipelineProps)
+    _panel_state.clear()
+    
     for cls in classes:
         bpy.utils.unregister_class(cls)
 
@@ -0,0 +1,604 @@
+"""Headless batch export for V Pipeline asset libraries.
+
+Run against a directory of .blend files (searched recursively) or a manifest
+listing one .blend per line:
+
+    blender -b -P vpipeline_batch.py -- assets/ --out export/
+    blender -b -P vpipeline_batch.py -- manifest.txt --out export/ --jobs 8 --setup
+
+Each .blend is opened in its own background Blender process. Every mesh object
+set up for the pipeline goes through Setup (with --setup) and is exported from its
+evaluated mesh with the palette UVs mapped, to <out>/<blend>/<object>.gltf. The
+source files are never saved. Per-file logs go to <out>/logs and a summary to <out>/report.json.
+An object that fails to export is logged with its error and the rest of the file carries on;
+the file then counts as failed.
+With --palette-texture the file's palettes are also written to <out>/<blend>/<blend>.palette.tres.
+
+Exports are cached by a hash of each object's source inputs (mesh buffers,
+corner normals, color attributes, modifier settings and the node groups they
+use, palettes, glTF export settings, the pipeline scripts' source). Unchanged objects reuse the cached
+.gltf/.bin instead of being exported again. The cache lives in <out>/.cache
+unless --cache is given, is trimmed to --cache-size MB (least recently used
+entries go first) and is bypassed for lookups with --force.
+"""
+
+import argparse, functools, hashlib, json, os, shutil, subprocess, sys, time, traceback
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import bpy
+    import vpipeline_addon
+except ImportError:
+    bpy = None
+
+### ARGUMENTS
+
+def script_args():
+    # blender passes everything after "--" through to the script
+    if "--" in sys.argv:
+        return sys.argv[sys.argv.index("--") + 1:]
+    return sys.argv[1:] if bpy is None else []
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="vpipeline_batch", description="V Pipeline batch export")
+    parser.add_argument("sources", nargs="*", help=".blend directories or manifest files")
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="parallel Blender processes")
+    parser.add_argument("--setup", action="store_true", help="run Setup on every mesh object first")
+    parser.add_argument("--blender", default="", help="Blender binary used for the workers")
+    parser.add_argument("--cache", default="", help="export cache directory (default <out>/.cache)")
+    parser.add_argument("--cache-size", type=float, default=2048, help="cache size limit in MB")
+    parser.add_argument("--force", action="store_true", help="export everything, ignoring cached results")
+    parser.add_argument("--quantize", action="store_true",
+                        help="pack palette slots and AO/edge into normalized RGBA8")
+    parser.add_argument("--optimize", action="store_true", help="reorder indices/vertices for vertex cache locality")
+    parser.add_argument("--instance", action="store_true",
+                        help="merge identical meshes and instance repeated nodes (EXT_mesh_gpu_instancing)")
+    parser.add_argument("--merge", action="store_true",
+                        help="merge all UberShader objects of a file into per-cell batches, one .gltf per file")
+    parser.add_argument("--cell-size", type=float, default=50.0, help="batch cell size for --merge")
+    parser.add_argument("--lods", default="", help="comma separated decimate ratios for LOD1..N, e.g. 0.5,0.25")
+    parser.add_argument("--palette-texture", action="store_true",
+                        help="write each file's palettes to <out>/<blend>/<blend>.palette.tres for uber_palette.gdshader")
+    
+    # internal, used by the worker processes
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--key", default="", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def blend_files(sources):
+    files = []
+    for source in sources:
+        if os.path.isdir(source):
+            for root, dirs, names in os.walk(source):
+                dirs.sort()
+                files += [os.path.join(root, n) for n in sorted(names) if n.endswith(".blend")]
+        else:
+            base = os.path.dirname(os.path.abspath(source))
+            with open(source) as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        files.append(os.path.join(base, line))
+    
+    return [os.path.abspath(f) for f in files]
+
+def unique_keys(files):
+    keys = {}
+    used = set()
+    for f in files:
+        stem = os.path.splitext(os.path.basename(f))[0]
+        key = stem
+        n = 1
+        while key in used:
+            key = f"{stem}_{n}"
+            n += 1
+        used.add(key)
+        keys[f] = key
+    return keys
+
+### WORKER
+
+def pipeline_objects(scene, props, setup):
+    objs = []
+    for obj in scene.objects:
+        if obj.type != 'MESH':
+            continue
+        attribs = obj.data.color_attributes
+        if setup or (attribs.get(props.color_name) and attribs.get(props.metal_name)):
+            objs.append(obj)
+    return objs
+
+def output_stems(objects):
+    """A file name stem per object
+    
+    Names that clean to the same file name ("Rock.001" and "Rock_001", or
+    names differing only in case) get _2, _3... in name order instead of
+    overwriting each other's exports.
+    """
+    stems = {}
+    taken = set()
+    for obj in sorted(objects, key=lambda o: o.name):
+        base = bpy.path.clean_name(obj.name)
+        stem = base
+        n = 1
+        while stem.lower() in taken:
+            n += 1
+            stem = f"{base}_{n}"
+        if stem != base:
+            print(f"V Pipeline: {obj.name} cleans to the same file name as another object, exporting it as {stem}.gltf")
+        taken.add(stem.lower())
+        stems[obj.name] = stem
+    return stems
+
+### CACHE
+
+# properties that only change how things look in Blender's UI
+UI_PROPS = {"rna_type", "name", "show_expanded", "show_on_cage", "show_in_editmode", "show_viewport",
+            "is_active", "is_override_data", "use_pin_to_last", "persistent_uid", "execution_time",
+            "location", "width", "height", "dimensions", "select", "hide", "label", "color",
+            "use_custom_color", "show_options", "show_preview", "show_texture", "bl_width_default"}
+
+@functools.lru_cache(maxsize=None)
+def pipeline_version():
+    """bl_info alone isn't bumped on every change, so the scripts' source is hashed too"""
+    h = hashlib.blake2b(repr(vpipeline_addon.bl_info["version"]).encode(), digest_size=20)
+    base = os.path.dirname(os.path.abspath(__file__))
+    for name in ("vpipeline_addon.py", "vpipeline_batch.py", "vpipeline_gltf.py"):
+        with open(os.path.join(base, name), "rb") as f:
+            h.update(f.read())
+    
+    try:
+        import io_scene_gltf2
+        h.update(repr(io_scene_gltf2.bl_info["version"]).encode())
+    except (ImportError, AttributeError, KeyError):
+        pass
+    return h.hexdigest()
+
+def plain_value(value):
+    # IDs by name, arrays/matrices/ID property groups as lists and dicts
+    if isinstance(value, bpy.types.ID):
+        return value.name
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    if hasattr(value, "to_list"):
+        return value.to_list()
+    if hasattr(value, "__len__") and not isinstance(value, str):
+        return [plain_value(v) for v in value]
+    return value
+
+def rna_values(struct):
+    """Name/value pairs of a struct's RNA properties, skipping collections and UI state"""
+    values = []
+    for prop in struct.bl_rna.properties:
+        if prop.identifier in UI_PROPS or prop.type == 'COLLECTION':
+            continue
+        if prop.type == 'POINTER' and not isinstance(getattr(struct, prop.identifier, None), bpy.types.ID):
+            continue
+        values.append((prop.identifier, plain_value(getattr(struct, prop.identifier, None))))
+    return values
+
+def node_tree_values(tree, seen):
+    """Nodes, their settings, unlinked input values and links of a node tree and its groups"""
+    if tree is None or tree.name in seen:
+        return []
+    seen.add(tree.name)
+    
+    values = [tree.name]
+    for node in tree.nodes:
+        values.append((node.bl_idname, node.name, rna_values(node)))
+        for socket in node.inputs:
+            if hasattr(socket, "default_value"):
+                values.append((socket.identifier, plain_value(socket.default_value)))
+        values += node_tree_values(getattr(node, "node_tree", None), seen)
+    for link in tree.links:
+        values.append((link.from_node.name, link.from_socket.identifier, link.to_node.name, link.to_socket.identifier))
+    return values
+
+def modifier_values(obj):
+    seen = set()
+    values = []
+    for mod in obj.modifiers:
+        # geometry nodes inputs are ID properties on the modifier
+        inputs = sorted((key, plain_value(mod[key])) for key in mod.keys())
+        values.append((mod.name, mod.type, rna_values(mod), inputs))
+        values += node_tree_values(getattr(mod, "node_group", None), seen)
+    return values
+
+def source_hash(obj, props, options, rows):
+    """Hash of everything that feeds an object's export"""
+    import numpy as np
+    
+    h = hashlib.blake2b(digest_size=20)
+    h.update(repr((pipeline_version(), options, obj.name, bpy.app.version)).encode())
+    h.update(repr(sorted(vpipeline_addon.gltf_settings().items())).encode())
+    h.update(np.array(obj.matrix_world, dtype=np.float32).tobytes())
+    
+    def add(collection, prop, count, dtype):
+        buf = np.empty(count, dtype=dtype)
+        collection.foreach_get(prop, buf)
+        h.update(buf.tobytes())
+    
+    mesh = obj.data
+    add(mesh.vertices, "co", len(mesh.vertices) * 3, np.float32)
+    add(mesh.loops, "vertex_index", len(mesh.loops), np.int32)
+    add(mesh.polygons, "loop_start", len(mesh.polygons), np.int32)
+    # smoothing, sharp edges and custom normals all end up here
+    h.update(vpipeline_addon.corner_normals(mesh).tobytes())
+    for uv in mesh.uv_layers:
+        h.update(uv.name.encode())
+        add(uv.data, "uv", len(uv.data) * 2, np.float32)
+    for att in mesh.color_attributes:
+        h.update(f"{att.name}/{att.domain}/{att.data_type}".encode())
+        add(att.data, "color", len(att.data) * 4, np.float32)
+    
+    h.update(repr(modifier_values(obj)).encode())
+    
+    for name in (props.color_name, props.metal_name):
+        palette = bpy.data.palettes.get(name)
+        if palette:
+            h.update(np.array([c.color for c in palette.colors], dtype=np.float32).tobytes())
+    
+    # the object's own persistent row pair, from palette_overrides once per worker
+    h.update(repr(rows.get(obj.name, 0)).encode())
+    
+    return h.hexdigest()
+
+def export_parts(filepath):
+    # exports too large for one group are written as <name>_partN.gltf files
+    parts = os.path.splitext(filepath)[0] + ".parts.json"
+    if not os.path.exists(parts):
+        return [filepath]
+    with open(parts) as f:
+        return [os.path.join(os.path.dirname(filepath), name) for name in json.load(f)]
+
+def gltf_files(filepath):
+    # the .gltf (or its parts) plus every external buffer/image and report it references
+    base = os.path.dirname(filepath)
+    files = []
+    for path in export_parts(filepath):
+        with open(path) as f:
+            gltf = json.load(f)
+        files.append(path)
+        for item in gltf.get("buffers", []) + gltf.get("images", []):
+            uri = item.get("uri", "")
+            if uri and not uri.startswith("data:"):
+                files.append(os.path.join(base, uri))
+    
+    for suffix in (".batches.json", ".lods.json", ".parts.json"):
+        report = os.path.splitext(filepath)[0] + suffix
+        if os.path.exists(report):
+            files.append(report)
+    return files
+
+def cache_fetch(entry, out_dir):
+    manifest = os.path.join(entry, "entry.json")
+    if not os.path.exists(manifest):
+        return None
+    
+    with open(manifest) as f:
+        names = json.load(f)["files"]
+    for name in names:
+        shutil.copy2(os.path.join(entry, name), os.path.join(out_dir, name))
+    
+    # touch the entry so it counts as recently used
+    os.utime(entry)
+    return os.path.join(out_dir, names[0])
+
+def cache_store(entry, filepath, replace=False):
+    """Store an export under its cache entry
+    
+    An existing entry is kept unless replace is set (--force exports), in which
+    case the new files are swapped in so later runs don't serve the old ones.
+    """
+    if os.path.exists(entry) and not replace:
+        return
+    
+    tmp = f"{entry}.tmp{os.getpid()}"
+    os.makedirs(tmp, exist_ok=True)
+    names = []
+    for path in gltf_files(filepath):
+        names.append(os.path.basename(path))
+        shutil.copy2(path, os.path.join(tmp, names[-1]))
+    with open(os.path.join(tmp, "entry.json"), "w") as f:
+        json.dump({"files": names}, f)
+    
+    old = None
+    if replace and os.path.exists(entry):
+        # directories can't be renamed over, move the old entry aside first
+        old = f"{entry}.old{os.getpid()}"
+        try:
+            os.rename(entry, old)
+        except OSError:
+            old = None
+    
+    try:
+        os.rename(tmp, entry)
+    except OSError:
+        # another worker stored the same entry first
+        shutil.rmtree(tmp, ignore_errors=True)
+    if old:
+        shutil.rmtree(old, ignore_errors=True)
+
+def cache_trim(cache_dir, limit_mb):
+    if not os.path.isdir(cache_dir):
+        return 0
+    
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if not os.path.isdir(path):
+            continue
+        if ".tmp" in name or ".old" in name:
+            shutil.rmtree(path, ignore_errors=True)
+            continue
+        size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+        entries.append((os.path.getmtime(path), size, path))
+    
+    # newest first, drop whatever no longer fits
+    entries.sort(reverse=True)
+    total = 0
+    removed = 0
+    for mtime, size, path in entries:
+        total += size
+        if total > limit_mb * 1024 * 1024:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    return removed
+
+def export_object(context, obj, filepath, args, rows):
+    if args.setup:
+        vpipeline_addon.setup_objects([obj], context.scene.VPipelineProps)
+    
+    report = vpipeline_addon.export_evaluated(context, [obj], filepath, context.scene.VPipelineProps,
+                                              lod_ratios=lod_ratios(args), rows=rows)
+    for stats in report.get("lods", {}).values():
+        for level in stats:
+            print(f"V Pipeline: {obj.name} LOD{level['level']} {level['triangles']} triangles, "
+                  f"{level['palette_errors']} palette index errors")
+
+def worker_options(args):
+    # every flag that changes what ends up in the exported files
+    return (args.setup, args.quantize, args.optimize, args.instance, args.merge and args.cell_size, lod_ratios(args))
+
+def lod_ratios(args):
+    return tuple(float(r) for r in args.lods.replace(",", " ").split())
+
+def post_process(filepath, props, args):
+    for path in export_parts(filepath):
+        post_process_file(path, props, args)
+
+def post_process_file(filepath, props, args):
+    import vpipeline_gltf
+    
+    if args.quantize:
+        palettes = {}
+        for key, name in (("colors", props.color_name), ("metals", props.metal_name)):
+            palettes[key] = [list(c.color) for c in bpy.data.palettes[name].colors]
+        
+        vpipeline_gltf.encode(filepath, palettes)
+        before, after, errors = vpipeline_gltf.quantize(filepath, palettes)
+        if errors:
+            raise ValueError(f"quantize failed: {'; '.join(errors)}")
+    
+    if args.optimize:
+        for name, (before, after) in vpipeline_gltf.optimize(filepath):
+            print(f"V Pipeline: {name} ACMR {before[0]:.3f} -> {after[0]:.3f}, ATVR {before[1]:.3f} -> {after[1]:.3f}")
+    
+    if args.instance:
+        meshes, instanced, before, after = vpipeline_gltf.instance(filepath)
+        if meshes or instanced:
+            print(f"V Pipeline: {meshes} duplicate meshes removed, {instanced} nodes instanced in {filepath}")
+
+def write_palette_texture(pairs, out_dir, args):
+    if not all(pairs[0]):
+        print("V Pipeline: no palettes set up, skipping the palette texture")
+        return None
+    
+    filepath = os.path.join(out_dir, args.key + ".palette.tres")
+    vpipeline_addon.write_palette_texture(filepath, vpipeline_addon.palette_rows([p for pair in pairs for p in pair]))
+    print(f"V Pipeline: wrote {filepath} with {len(pairs) - 1} override palette pairs")
+    return filepath
+
+def export_merged(context, scene, props, out_dir, args, rows):
+    objs = pipeline_objects(scene, props, args.setup)
+    if args.setup:
+        vpipeline_addon.setup_objects(objs, props)
+    objs = [o for o in objs if vpipeline_addon.uses_uber(o)]
+    if not objs:
+        return []
+    
+    start = time.perf_counter()
+    filepath = os.path.join(out_dir, args.key + ".gltf")
+    
+    h = hashlib.blake2b(digest_size=20)
+    for obj in objs:
+        h.update(source_hash(obj, props, worker_options(args), rows).encode())
+    entry = os.path.join(args.cache, h.hexdigest())
+    
+    cached = None if args.force else cache_fetch(entry, out_dir)
+    if cached:
+        filepath = cached
+    else:
+        vpipeline_addon.export_evaluated(context, objs, filepath, props, args.cell_size, rows=rows)
+        post_process(filepath, props, args)
+        cache_store(entry, filepath, args.force)
+    
+    seconds = time.perf_counter() - start
+    print(f"V Pipeline: {'reused' if cached else 'exported'} {len(objs)} objects as batches in {seconds:.2f}s")
+    return [{"name": obj.name, "gltf": filepath, "cached": bool(cached), "seconds": round(seconds / len(objs), 4)}
+            for obj in objs]
+
+def run_worker(args):
+    if not hasattr(bpy.types.Scene, "VPipelineProps"):
+        vpipeline_addon.register()
+    
+    context = bpy.context
+    if context.object and context.object.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    
+    scene = context.scene
+    props = scene.VPipelineProps
+    out_dir = os.path.join(args.out, args.key)
+    os.makedirs(out_dir, exist_ok=True)
+    
+    # once per file: numbers any new override pairs and gives every object its row pair,
+    # after --setup has made the default palettes the pairs fall back to
+    if args.setup:
+        vpipeline_addon.setup_palettes((props.color_name, props.metal_name), props.palette_size)
+    pairs, rows = vpipeline_addon.palette_overrides(scene.objects, props)
+    
+    result = {"file": bpy.data.filepath, "objects": []}
+    if args.palette_texture:
+        result["palette_texture"] = write_palette_texture(pairs, out_dir, args)
+    
+    if args.merge:
+        try:
+            result["objects"] = export_merged(context, scene, props, out_dir, args, rows)
+        except Exception as e:
+            traceback.print_exc()
+            result["objects"] = [{"name": args.key, "error": f"{type(e).__name__}: {e}"}]
+        pipeline = []
+    else:
+        pipeline = pipeline_objects(scene, props, args.setup)
+    stems = output_stems(pipeline)
+    
+    for obj in pipeline:
+        name = obj.name
+        start = time.perf_counter()
+        filepath = os.path.join(out_dir, stems[name] + ".gltf")
+        
+        # one broken object must not cost the rest of the file its exports
+        try:
+            # the file name is part of the key, cached entries restore files under it
+            entry = os.path.join(args.cache, source_hash(obj, props, worker_options(args) + (stems[name],), rows))
+            cached = None if args.force else cache_fetch(entry, out_dir)
+            if cached:
+                filepath = cached
+            else:
+                export_object(context, obj, filepath, args, rows)
+                post_process(filepath, props, args)
+                cache_store(entry, filepath, args.force)
+        except Exception as e:
+            traceback.print_exc()
+            result["objects"].append({"name": name, "error": f"{type(e).__name__}: {e}"})
+            print(f"V Pipeline: FAILED {name}: {e}")
+            if context.object and context.object.mode != 'OBJECT':
+                bpy.ops.object.mode_set(mode='OBJECT')
+            continue
+        
+        seconds = time.perf_counter() - start
+        result["objects"].append({"name": name, "gltf": filepath, "cached": bool(cached),
+                                  "seconds": round(seconds, 4)})
+        print(f"V Pipeline: {'reused' if cached else 'exported'} {name} in {seconds:.2f}s")
+    
+    with open(os.path.join(args.out, "logs", args.key + ".json"), "w") as f:
+        json.dump(result, f, indent=1)
+
+### COORDINATOR
+
+def run_file(args, blender, blend, key):
+    cmd = [blender, "-b", "--factory-startup", "--python-exit-code", "1", blend,
+           "--python", os.path.abspath(__file__), "--",
+           "--worker", "--out", args.out, "--key", key, "--cache", args.cache]
+    if args.setup:
+        cmd.append("--setup")
+    if args.force:
+        cmd.append("--force")
+    if args.quantize:
+        cmd.append("--quantize")
+    if args.optimize:
+        cmd.append("--optimize")
+    if args.instance:
+        cmd.append("--instance")
+    if args.merge:
+        cmd += ["--merge", "--cell-size", str(args.cell_size)]
+    if args.lods:
+        cmd += ["--lods", args.lods]
+    if args.palette_texture:
+        cmd.append("--palette-texture")
+    
+    log_path = os.path.join(args.out, "logs", key + ".log")
+    start = time.perf_counter()
+    with open(log_path, "w") as log:
+        proc = subprocess.run(cmd, stdout=log, stderr=subprocess.STDOUT)
+    seconds = time.perf_counter() - start
+    
+    entry = {"file": blend, "key": key, "log": log_path, "seconds": round(seconds, 3),
+             "ok": proc.returncode == 0, "returncode": proc.returncode, "objects": []}
+    
+    result_path = os.path.join(args.out, "logs", key + ".json")
+    if os.path.exists(result_path):
+        with open(result_path) as f:
+            entry["objects"] = json.load(f)["objects"]
+    elif entry["ok"]:
+        entry["ok"] = False
+    
+    errors = [o for o in entry["objects"] if "error" in o]
+    if errors:
+        entry["ok"] = False
+    
+    status = "ok" if entry["ok"] else "FAILED"
+    print(f"[{status}] {blend} ({seconds:.1f}s, {len(entry['objects'])} objects, {len(errors)} failed)")
+    return entry
+
+def run_coordinator(args):
+    blender = args.blender or (bpy.app.binary_path if bpy else "blender")
+    files = blend_files(args.sources)
+    keys = unique_keys(files)
+    
+    os.makedirs(os.path.join(args.out, "logs"), exist_ok=True)
+    for key in keys.values():
+        stale = os.path.join(args.out, "logs", key + ".json")
+        if os.path.exists(stale):
+            os.remove(stale)
+    
+    jobs = max(1, min(args.jobs, len(files) or 1))
+    print(f"V Pipeline: exporting {len(files)} files with {jobs} workers")
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        entries = list(pool.map(lambda f: run_file(args, blender, f, keys[f]), files))
+    seconds = time.perf_counter() - start
+    
+    evicted = cache_trim(args.cache, args.cache_size)
+    
+    failed = [e for e in entries if not e["ok"]]
+    report = {
+        "files": len(entries),
+        "failed": len(failed),
+        "objects": sum(len(e["objects"]) for e in entries),
+        "failed_objects": sum("error" in o for e in entries for o in e["objects"]),
+        "cached": sum(o.get("cached", False) for e in entries for o in e["objects"]),
+        "evicted": evicted,
+        "seconds": round(seconds, 3),
+        "jobs": jobs,
+        "results": entries,
+    }
+    with open(os.path.join(args.out, "report.json"), "w") as f:
+        json.dump(report, f, indent=1)
+    
+    print(f"V Pipeline: {report['files']} files, {report['objects']} objects "
+          f"({report['cached']} cached), {report['failed']} failed in {seconds:.1f}s")
+    for e in failed:
+        print(f"  FAILED {e['file']} -> {e['log']}")
+    
+    return 1 if failed else 0
+
+def main():
+    args = parse_args(script_args())
+    if args.merge and args.lods:
+        # merged batches are exported without LODs
+        sys.exit("vpipeline_batch: --lods can't be combined with --merge")
+    args.out = os.path.abspath(args.out)
+    args.cache = os.path.abspath(args.cache or os.path.join(args.out, ".cache"))
+    
+    if args.worker:
+        run_worker(args)
+    else:
+        sys.exit(run_coordinator(args))
+
+if __name__ == "__main__":
+    main()
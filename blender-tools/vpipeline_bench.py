@@ -0,0 +1,257 @@
+"""Headless benchmarks for the V Pipeline operators.
+
+    blender -b --factory-startup -P vpipeline_bench.py -- --out bench.json
+    blender -b --factory-startup -P vpipeline_bench.py -- --baseline bench_baseline.json --threshold 15
+
+Synthetic grid meshes from 10k to 5M corners (--sizes) are painted with random
+ColorX/MetalX palette slots, one slot per face. Each operator's execute is then
+timed through bpy.ops: Setup, Map/Restore UVs, Select (faces of one slot) and
+Prep for Export/Restore. Every timing is the best of --repeat runs.
+
+The UberShader material and the ColorConverter node group are appended from
+vertex-pipeline.blend (--blend); without them Setup and Prep/Reset are skipped.
+
+Results go to --out as JSON. Given a --baseline, every timing that is more than
+--threshold percent (and more than --min-delta seconds) slower than the baseline
+is reported and Blender exits with code 1. --update-baseline writes the results
+to the baseline file instead of comparing.
+"""
+
+import argparse, json, os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy
+import numpy as np
+import vpipeline_addon
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = "10000,100000,1000000,5000000"
+
+### ARGUMENTS
+
+def script_args():
+    # blender passes everything after "--" through to the script
+    if "--" in sys.argv:
+        return sys.argv[sys.argv.index("--") + 1:]
+    return []
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="vpipeline_bench", description="V Pipeline operator benchmarks")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma separated corner counts")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per operator, the best one counts")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the random palettes and paint")
+    parser.add_argument("--blend", default=os.path.join(SCRIPT_DIR, "vertex-pipeline.blend"),
+                        help=".blend with the UberShader material and ColorConverter node group")
+    parser.add_argument("--out", default="", help="write results to this JSON file")
+    parser.add_argument("--baseline", default="", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed slowdown in percent")
+    parser.add_argument("--min-delta", type=float, default=0.002,
+                        help="slowdowns smaller than this many seconds are treated as noise")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline")
+    return parser.parse_args(argv)
+
+### SCENE
+
+def append_pipeline_data(blend):
+    """Append the material and node group Setup expects, returns True when both are there"""
+    if os.path.exists(blend):
+        with bpy.data.libraries.load(blend, link=False) as (data_from, data_to):
+            data_to.materials = [n for n in data_from.materials if n == "UberShader"]
+            data_to.node_groups = [n for n in data_from.node_groups if n == "ColorConverter"]
+
+    return bool(bpy.data.materials.get("UberShader") and bpy.data.node_groups.get("ColorConverter"))
+
+def palettes(props, rng, size=4):
+    result = []
+    for name in (props.color_name, props.metal_name):
+        palette = bpy.data.palettes.get(name) or bpy.data.palettes.new(name)
+        while len(palette.colors) < size:
+            palette.colors.new()
+        for clr in palette.colors:
+            # whole bytes, so painted colors round-trip through BYTE_COLOR exactly
+            clr.color = rng.integers(0, 256, 3) / 255.0
+        result.append(palette)
+    return result
+
+def grid_mesh(name, corners):
+    """Quad grid with about the requested number of corners, built with foreach_set"""
+    faces = max(1, corners // 4)
+    side = int(np.ceil(np.sqrt(faces)))
+    rows = int(np.ceil(faces / side))
+    faces = side * rows
+
+    x, y = np.meshgrid(np.arange(side + 1, dtype=np.float32), np.arange(rows + 1, dtype=np.float32))
+    co = np.stack([x.ravel(), y.ravel(), np.zeros(x.size, dtype=np.float32)], axis=1)
+
+    i, j = np.meshgrid(np.arange(side), np.arange(rows))
+    v0 = (j * (side + 1) + i).ravel()
+    loops = np.stack([v0, v0 + 1, v0 + side + 2, v0 + side + 1], axis=1).astype(np.int32)
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(co))
+    mesh.vertices.foreach_set("co", co.ravel())
+    mesh.loops.add(loops.size)
+    mesh.loops.foreach_set("vertex_index", loops.ravel())
+    mesh.polygons.add(faces)
+    mesh.polygons.foreach_set("loop_start", np.arange(0, loops.size, 4, dtype=np.int32))
+    if not mesh.polygons.bl_rna.properties["loop_total"].is_readonly:
+        mesh.polygons.foreach_set("loop_total", np.full(faces, 4, dtype=np.int32))
+    mesh.update(calc_edges=True)
+
+    uv = mesh.uv_layers.new(name="UVMap")
+    uv.data.foreach_set("uv", (co[loops.ravel(), :2] / max(side, rows)).ravel())
+    return mesh
+
+def paint(mesh, palette_list, rng):
+    faces = len(mesh.polygons)
+    for palette in palette_list:
+        colors = np.array([list(c.color) + [1.0] for c in palette.colors], dtype=np.float32)
+        slots = np.repeat(rng.integers(0, len(colors), faces), 4)
+        att = mesh.color_attributes.new(name=palette.name, type='BYTE_COLOR', domain='CORNER')
+        att.data.foreach_set("color_srgb", colors[slots].ravel())
+
+def make_object(context, corners, palette_list, rng):
+    mesh = grid_mesh(f"Bench{corners}", corners)
+    paint(mesh, palette_list, rng)
+
+    obj = bpy.data.objects.new(mesh.name, mesh)
+    context.scene.collection.objects.link(obj)
+    for o in context.view_layer.objects:
+        o.select_set(False)
+    obj.select_set(True)
+    context.view_layer.objects.active = obj
+    return obj
+
+def strip_setup(obj, props):
+    # undo what Setup adds, so every timed Setup does the full work
+    for name in ("Color", "AO", "EdgeMask"):
+        att = obj.data.color_attributes.get(name)
+        if att:
+            obj.data.color_attributes.remove(att)
+    # the palette index attributes too, or Setup only refreshes them
+    for name in (props.color_name, props.metal_name):
+        att = obj.data.attributes.get(vpipeline_addon.index_name(name))
+        if att:
+            obj.data.attributes.remove(att)
+    for mod in list(obj.modifiers):
+        obj.modifiers.remove(mod)
+    obj.data.materials.clear()
+
+### TIMING
+
+def best_of(repeat, run, before=None, after=None):
+    times = []
+    for i in range(repeat):
+        if before:
+            before()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+        if after:
+            after()
+    return {"seconds": round(min(times), 6), "runs": [round(t, 6) for t in times]}
+
+def object_mode():
+    if bpy.context.object and bpy.context.object.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+
+def bench_object(context, obj, repeat, pipeline):
+    """Time every operator on one object, returning {operator: timing}"""
+    results = {}
+    ops = bpy.ops.object
+
+    props = context.scene.VPipelineProps
+    if pipeline:
+        results["setup"] = best_of(repeat, ops.v_setup, before=lambda: strip_setup(obj, props))
+    else:
+        # Map/Select still need the palette index attributes Setup writes
+        for name in (props.color_name, props.metal_name):
+            vpipeline_addon.update_palette_index(obj.data, name, bpy.data.palettes[name])
+
+    # alternating directions, so neither run finds the UVs already up to date
+    results["map"] = best_of(repeat, lambda: ops.v_map_uvs(map=True), after=lambda: ops.v_map_uvs(map=False))
+    results["restore"] = best_of(repeat, lambda: ops.v_map_uvs(map=False), before=lambda: ops.v_map_uvs(map=True))
+
+    results["select"] = best_of(repeat, lambda: ops.v_select_current_color(index=0, slot=1, mode='FACE'),
+                                after=object_mode)
+
+    if pipeline:
+        results["prep"] = best_of(repeat, lambda: ops.v_prep_export(reset=False),
+                                  after=lambda: ops.v_prep_export(reset=True))
+        results["reset"] = best_of(repeat, lambda: ops.v_prep_export(reset=True),
+                                   before=lambda: ops.v_prep_export(reset=False))
+
+    return results
+
+### BASELINE
+
+def compare(results, baseline, threshold, min_delta):
+    regressions = []
+    for key, timing in sorted(results.items()):
+        base = baseline.get(key)
+        if not base:
+            continue
+
+        before, after = base["seconds"], timing["seconds"]
+        if after > before * (1.0 + threshold / 100.0) and after - before > min_delta:
+            regressions.append((key, before, after))
+    return regressions
+
+def main():
+    args = parse_args(script_args())
+    if not hasattr(bpy.types.Scene, "VPipelineProps"):
+        vpipeline_addon.register()
+
+    context = bpy.context
+    props = context.scene.VPipelineProps
+    rng = np.random.default_rng(args.seed)
+
+    pipeline = append_pipeline_data(args.blend)
+    if not pipeline:
+        print(f"V Pipeline bench: UberShader/ColorConverter not found in {args.blend}, skipping Setup and Prep")
+
+    palette_list = palettes(props, rng)
+    results = {}
+    for corners in (int(s) for s in args.sizes.replace(",", " ").split()):
+        object_mode()
+        obj = make_object(context, corners, palette_list, rng)
+
+        for op, timing in bench_object(context, obj, args.repeat, pipeline).items():
+            key = f"{op}/{corners}"
+            results[key] = dict(timing, corners=len(obj.data.loops))
+            print(f"V Pipeline bench: {key:>20} {timing['seconds'] * 1000.0:10.2f} ms")
+
+        object_mode()
+        mesh = obj.data
+        bpy.data.objects.remove(obj)
+        bpy.data.meshes.remove(mesh)
+
+    report = {
+        "blender": bpy.app.version_string,
+        "addon": ".".join(str(v) for v in vpipeline_addon.bl_info["version"]),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=1)
+
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=1)
+        print(f"V Pipeline bench: baseline written to {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+        regressions = compare(results, baseline, args.threshold, args.min_delta)
+        for key, before, after in regressions:
+            print(f"V Pipeline bench: REGRESSION {key} {before * 1000.0:.2f} -> {after * 1000.0:.2f} ms "
+                  f"(+{(after / before - 1.0) * 100.0:.0f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"V Pipeline bench: no regressions beyond {args.threshold:g}% against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
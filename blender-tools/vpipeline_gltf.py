@@ -0,0 +1,1172 @@
+"""Standalone glTF tools for V Pipeline exports. No Blender required, only NumPy.
+
+The .bin buffers of an exported .gltf are memory-mapped and processed with
+whole-array operations, so large assets can be handled on build machines.
+
+    python vpipeline_gltf.py encode asset.gltf [asset2.gltf ...]
+
+encode: writes the palette-index encoding the uber shader reads into
+TEXCOORD_1 (floor(UV2.x) = color slot, floor(1 - UV2.y) = metal slot), working
+out each vertex's slot from its COLOR accessors. Palettes come from the
+const arrays in uber.gdshader (--shader) or a JSON file (--palettes) with
+sRGB "colors" and "metals" lists, as shown in Blender.
+
+    python vpipeline_gltf.py quantize asset.gltf
+
+quantize: run on encoded assets. Replaces the COLOR attributes and the float
+TEXCOORD_1 with one normalized RGBA8 COLOR_0 (AO, edge, color slot, metal
+slot) and a normalized uint16 TEXCOORD_1, both core glTF types. Slots outside
+the palettes, or a TEXCOORD_1 that doesn't match the palette colors, are
+errors and leave the file as it was. Pair it with uber_quantized.gdshader.
+
+    python vpipeline_gltf.py optimize asset.gltf
+
+optimize: reorders triangles for post-transform vertex cache locality
+(Tipsify), then sorts clusters of them so outward-facing ones draw first
+(overdraw), and vertices by first use, reporting ACMR/ATVR before and after.
+
+    python vpipeline_gltf.py instance level.gltf
+
+instance: meshes with identical buffers (geometry and palette data) are
+collapsed into one, and sibling nodes placing the same mesh become a single
+node with EXT_mesh_gpu_instancing transforms. Palette overrides (the
+vp_palette_row node extra) become a per-instance _PALETTE_ROW attribute.
+
+    python vpipeline_gltf.py validate export/ --report validation.json
+
+validate: checks every .gltf (directories are searched recursively) across a
+process pool. Palette slots read from TEXCOORD_1 (or the quantized COLOR_0) must
+fall inside the shader's colors[]/metals[] arrays, COLOR_0 must carry AO/edge
+mask, UVs must be finite and indices inside the vertex range. Exits with 1
+if any file has errors.
+"""
+
+import argparse, base64, hashlib, json, math, os, re, sys, time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SHADER = os.path.join(SCRIPT_DIR, "..", "godot-project", "shaders", "uber.gdshader")
+
+COMPONENT_DTYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+COMPONENT_TYPES = {np.dtype(v): k for k, v in COMPONENT_DTYPES.items()}
+
+TYPE_SIZES = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9, "MAT4": 16}
+SIZE_TYPES = {1: "SCALAR", 2: "VEC2", 3: "VEC3", 4: "VEC4", 16: "MAT4"}
+
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+### ASSET
+
+class Asset:
+    """A .gltf document with its buffers memory-mapped"""
+
+    def __init__(self, path, writable=False):
+        self.path = os.path.abspath(path)
+        self.writable = writable
+        with open(self.path) as f:
+            self.gltf = json.load(f)
+
+        self.buffers = []
+        for buffer in self.gltf.get("buffers", []):
+            uri = buffer.get("uri", "")
+            if uri.startswith("data:"):
+                data = base64.b64decode(uri.split(",", 1)[1])
+                self.buffers.append(np.frombuffer(data, dtype=np.uint8))
+            else:
+                filepath = os.path.join(os.path.dirname(self.path), uri)
+                self.buffers.append(np.memmap(filepath, dtype=np.uint8, mode="r+" if writable else "r"))
+
+        # bufferView index -> bytes for views added since loading
+        self.pending = {}
+
+    @property
+    def accessors(self):
+        return self.gltf.setdefault("accessors", [])
+
+    @property
+    def buffer_views(self):
+        return self.gltf.setdefault("bufferViews", [])
+
+    def primitives(self):
+        for mesh_index, mesh in enumerate(self.gltf.get("meshes", [])):
+            for prim in mesh.get("primitives", []):
+                yield mesh_index, prim
+
+    def view_bytes(self, view_index):
+        if view_index in self.pending:
+            return self.pending[view_index]
+
+        view = self.buffer_views[view_index]
+        start = view.get("byteOffset", 0)
+        return self.buffers[view["buffer"]][start:start + view["byteLength"]]
+
+    def accessor(self, index):
+        """(count, components) array view of an accessor, unnormalized"""
+        acc = self.accessors[index]
+        if "sparse" in acc:
+            raise ValueError(f"sparse accessor {index} is not supported")
+
+        dtype = np.dtype(COMPONENT_DTYPES[acc["componentType"]])
+        size = TYPE_SIZES[acc["type"]]
+        count = acc["count"]
+        if "bufferView" not in acc:
+            return np.zeros((count, size), dtype=dtype)
+
+        view = self.buffer_views[acc["bufferView"]]
+        stride = view.get("byteStride") or dtype.itemsize * size
+        data = self.view_bytes(acc["bufferView"])
+        return np.ndarray((count, size), dtype=dtype, buffer=data,
+                          offset=acc.get("byteOffset", 0), strides=(stride, dtype.itemsize))
+
+    def accessor_float(self, index):
+        """Accessor as float32, applying normalization"""
+        acc = self.accessors[index]
+        data = self.accessor(index)
+        if not acc.get("normalized"):
+            return data.astype(np.float32)
+
+        info = np.iinfo(data.dtype)
+        return np.maximum(data.astype(np.float32) / np.float32(info.max), -1.0)
+
+    def view_users(self, view_index):
+        return [i for i, acc in enumerate(self.accessors) if acc.get("bufferView") == view_index]
+
+    def owns_view(self, index):
+        # True if the accessor is the only one reading its bufferView
+        view = self.accessors[index].get("bufferView")
+        return view is not None and self.view_users(view) == [index]
+
+    def add_view(self, data, target=None, stride=None):
+        view = {"byteLength": len(data)}
+        if stride:
+            view["byteStride"] = stride
+        if target:
+            view["target"] = target
+
+        self.buffer_views.append(view)
+        self.pending[len(self.buffer_views) - 1] = bytes(data)
+        return len(self.buffer_views) - 1
+
+    def add_accessor(self, data, normalized=False, target=ARRAY_BUFFER, bounds=False):
+        """Append a tightly packed accessor, returns its index"""
+        data = np.ascontiguousarray(data)
+        if data.ndim == 1:
+            data = data.reshape(-1, 1)
+
+        stride = None
+        if target == ARRAY_BUFFER and data.strides[0] % 4:
+            # vertex attributes have to be 4-byte aligned per element
+            padded = np.zeros((len(data), -(-data.strides[0] // 4) * 4), dtype=np.uint8)
+            padded[:, :data.strides[0]] = data.view(np.uint8).reshape(len(data), -1)
+            stride = padded.shape[1]
+            raw = padded.tobytes()
+        else:
+            raw = data.tobytes()
+
+        acc = {
+            "bufferView": self.add_view(raw, target, stride),
+            "componentType": COMPONENT_TYPES[data.dtype],
+            "count": len(data),
+            "type": SIZE_TYPES[data.shape[1]],
+        }
+        if normalized:
+            acc["normalized"] = True
+        if bounds and len(data):
+            acc["min"] = data.min(axis=0).tolist()
+            acc["max"] = data.max(axis=0).tolist()
+
+        self.accessors.append(acc)
+        return len(self.accessors) - 1
+
+    def flush(self):
+        for buffer in self.buffers:
+            if isinstance(buffer, np.memmap):
+                buffer.flush()
+
+    def prune_accessors(self):
+        """Drop accessors nothing refers to any more, renumbering the rest"""
+        used = set()
+        for mesh_index, prim in self.primitives():
+            used.update(prim["attributes"].values())
+            if "indices" in prim:
+                used.add(prim["indices"])
+            for target in prim.get("targets", []):
+                used.update(target.values())
+        for skin in self.gltf.get("skins", []):
+            if "inverseBindMatrices" in skin:
+                used.add(skin["inverseBindMatrices"])
+        for anim in self.gltf.get("animations", []):
+            for sampler in anim.get("samplers", []):
+                used.update((sampler["input"], sampler["output"]))
+        for node in self.gltf.get("nodes", []):
+            instancing = node.get("extensions", {}).get("EXT_mesh_gpu_instancing")
+            if instancing:
+                used.update(instancing["attributes"].values())
+
+        remap = {old: new for new, old in enumerate(sorted(used))}
+        self.gltf["accessors"] = [self.accessors[old] for old in sorted(used)]
+
+        def renumber(mapping):
+            for key in mapping:
+                mapping[key] = remap[mapping[key]]
+
+        for mesh_index, prim in self.primitives():
+            renumber(prim["attributes"])
+            if "indices" in prim:
+                prim["indices"] = remap[prim["indices"]]
+            for target in prim.get("targets", []):
+                renumber(target)
+        for skin in self.gltf.get("skins", []):
+            if "inverseBindMatrices" in skin:
+                skin["inverseBindMatrices"] = remap[skin["inverseBindMatrices"]]
+        for anim in self.gltf.get("animations", []):
+            for sampler in anim.get("samplers", []):
+                sampler["input"] = remap[sampler["input"]]
+                sampler["output"] = remap[sampler["output"]]
+        for node in self.gltf.get("nodes", []):
+            instancing = node.get("extensions", {}).get("EXT_mesh_gpu_instancing")
+            if instancing:
+                renumber(instancing["attributes"])
+
+    def used_views(self):
+        used = set()
+        for acc in self.accessors:
+            if "bufferView" in acc:
+                used.add(acc["bufferView"])
+            sparse = acc.get("sparse")
+            if sparse:
+                used.add(sparse["indices"]["bufferView"])
+                used.add(sparse["values"]["bufferView"])
+        for image in self.gltf.get("images", []):
+            if "bufferView" in image:
+                used.add(image["bufferView"])
+        return sorted(used)
+
+    def save(self, path=None):
+        """Write the document with a single compacted .bin next to it
+
+        Only accessors and bufferViews still referenced are kept, so replaced
+        attributes stop taking space.
+        """
+        path = os.path.abspath(path or self.path)
+        self.prune_accessors()
+        stem = os.path.splitext(os.path.basename(path))[0]
+        bin_path = os.path.join(os.path.dirname(path), stem + ".bin")
+        tmp_path = bin_path + ".tmp"
+
+        remap = {}
+        views = []
+        offset = 0
+        with open(tmp_path, "wb") as f:
+            for old in self.used_views():
+                view = dict(self.buffer_views[old])
+                data = self.view_bytes(old)
+
+                view["buffer"] = 0
+                view["byteOffset"] = offset
+                view["byteLength"] = len(data)
+                f.write(memoryview(data))
+                offset += len(data)
+
+                pad = -offset % 4
+                f.write(b"\0" * pad)
+                offset += pad
+
+                remap[old] = len(views)
+                views.append(view)
+
+        for acc in self.accessors:
+            if "bufferView" in acc:
+                acc["bufferView"] = remap[acc["bufferView"]]
+            sparse = acc.get("sparse")
+            if sparse:
+                sparse["indices"]["bufferView"] = remap[sparse["indices"]["bufferView"]]
+                sparse["values"]["bufferView"] = remap[sparse["values"]["bufferView"]]
+        for image in self.gltf.get("images", []):
+            if "bufferView" in image:
+                image["bufferView"] = remap[image["bufferView"]]
+
+        self.gltf["bufferViews"] = views
+        self.gltf["buffers"] = [{"byteLength": offset, "uri": os.path.basename(bin_path)}]
+
+        # drop the maps before replacing the file they may point at
+        self.buffers = []
+        self.pending = {}
+        os.replace(tmp_path, bin_path)
+        with open(path, "w") as f:
+            json.dump(self.gltf, f, indent=1)
+
+        self.path = path
+        self.buffers = [np.memmap(bin_path, dtype=np.uint8, mode="r+" if self.writable else "r")]
+
+### PALETTES
+
+def srgb_to_linear(c):
+    c = np.asarray(c, dtype=np.float64)
+    return np.where(c < 0.04045, np.maximum(c, 0.0) / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+def linear_to_srgb(c):
+    c = np.asarray(c, dtype=np.float64)
+    return np.where(c < 0.0031308, np.maximum(c, 0.0) * 12.92, 1.055 * np.maximum(c, 0.0031308) ** (1.0 / 2.4) - 0.055)
+
+def shader_palettes(path):
+    """sRGB palettes from the const colors[]/metals[] arrays of uber.gdshader"""
+    with open(path) as f:
+        source = f.read()
+
+    palettes = {}
+    for name in ("colors", "metals"):
+        match = re.search(r"const\s+vec3\s+" + name + r"\s*\[\s*\d*\s*\]\s*=\s*\{(.*?)\}\s*;", source, re.S)
+        if not match:
+            raise ValueError(f"{path}: no const {name}[] array")
+        values = re.findall(r"vec3\(([^)]*)\)", match.group(1))
+        linear = [[float(v) for v in value.split(",")] for value in values]
+        palettes[name] = linear_to_srgb(np.array(linear)).tolist()
+    return palettes
+
+def load_palettes(args):
+    if args.palettes:
+        with open(args.palettes) as f:
+            data = json.load(f)
+        return {"colors": data["colors"], "metals": data["metals"]}
+    return shader_palettes(args.shader)
+
+def color_codes(colors):
+    # pack sRGB colors into 24-bit byte codes, the key of the palette lookup table
+    b = np.rint(np.clip(colors, 0.0, 1.0) * 255.0).astype(np.uint32)
+    return (b[..., 0] << 16) | (b[..., 1] << 8) | b[..., 2]
+
+def palette_lut(palette, tol=0.01):
+    """24-bit byte color -> palette index table, -1 where no entry matches
+
+    Same table the addon builds, so both sides agree on which slot a color is.
+    """
+    reach = int(math.ceil(tol * 255.0)) + 1
+    offsets = np.arange(-reach, reach + 1)
+    offsets = np.stack(np.meshgrid(offsets, offsets, offsets, indexing="ij"), -1).reshape(-1, 3)
+
+    lut = np.full(1 << 24, -1, dtype=np.int16)
+    for index, color in enumerate(palette[:256]):
+        target = np.clip(np.asarray(color, dtype=np.float32), 0.0, 1.0)
+        codes = np.rint(target * 255.0).astype(np.int64) + offsets
+        codes = codes[np.all((codes >= 0) & (codes <= 255), axis=1)]
+
+        d = codes.astype(np.float32) / np.float32(255.0) - target
+        d2 = (d * d).astype(np.float64).sum(axis=1).astype(np.float32)
+        near = codes[np.sqrt(d2.astype(np.float64)) <= tol]
+        lut[(near[:, 0] << 16) | (near[:, 1] << 8) | near[:, 2]] = index
+    return lut
+
+### ENCODE
+
+def color_attributes(prim):
+    return sorted(k for k in prim["attributes"] if k.startswith("COLOR_"))
+
+def palette_indices(asset, index, lut):
+    # glTF colors are linear, palettes are matched in sRGB bytes like in Blender
+    colors = asset.accessor_float(index)[:, :3]
+    return lut[color_codes(linear_to_srgb(colors))]
+
+def best_match(asset, prim, lut, exclude=()):
+    # the COLOR_n accessor whose colors hit the palette most often
+    best, best_rate = None, 0.0
+    for name in color_attributes(prim):
+        if name in exclude:
+            continue
+        rate = float((palette_indices(asset, prim["attributes"][name], lut) >= 0).mean())
+        if rate > best_rate:
+            best, best_rate = name, rate
+    return best if best_rate >= 0.5 else None
+
+def uv_slots(uvs):
+    """Palette slots of an encoded TEXCOORD_1, (n, 2) int64
+    
+    MapUVs stores fractional UV + slot in Blender and the glTF exporter flips
+    V (v' = 1 - v), so the metal slot is floor(1 - v') in the file.
+    """
+    uvs = np.asarray(uvs, dtype=np.float64)
+    return np.floor(np.column_stack([uvs[:, 0], 1.0 - uvs[:, 1]])).astype(np.int64)
+
+def shift_uvs(uvs, indices, axis):
+    # the MapUVs encoding as the exporter writes it, unmatched corners untouched
+    col = uvs[:, axis]
+    mask = indices >= 0
+    u = col[mask].astype(np.float64)
+    if axis == 1:
+        u = 1.0 - u
+    u -= np.floor(u)
+    u += indices[mask]
+    col[mask] = 1.0 - u if axis == 1 else u
+
+def encode_primitive(asset, prim, luts, color_attr=None, metal_attr=None):
+    """Write palette slots into the primitive's TEXCOORD_1, returns True if written"""
+    attributes = prim["attributes"]
+    color_attr = color_attr or best_match(asset, prim, luts["colors"])
+    metal_attr = metal_attr or best_match(asset, prim, luts["metals"], exclude=(color_attr,))
+    if color_attr not in attributes or metal_attr not in attributes:
+        return False
+
+    color_idx = palette_indices(asset, attributes[color_attr], luts["colors"])
+    metal_idx = palette_indices(asset, attributes[metal_attr], luts["metals"])
+
+    uv_index = attributes.get("TEXCOORD_1", attributes.get("TEXCOORD_0"))
+    if uv_index is None:
+        uvs = np.zeros((len(color_idx), 2), dtype=np.float32)
+    else:
+        uvs = asset.accessor_float(uv_index)
+
+    shift_uvs(uvs, color_idx, 0)
+    shift_uvs(uvs, metal_idx, 1)
+
+    existing = attributes.get("TEXCOORD_1")
+    acc = asset.accessors[existing] if existing is not None else None
+    if (asset.writable and acc and acc["componentType"] == 5126 and not acc.get("normalized")
+            and asset.owns_view(existing) and acc["bufferView"] not in asset.pending):
+        # replace in place through the memory map
+        asset.accessor(existing)[:] = uvs
+        return True
+
+    attributes["TEXCOORD_1"] = asset.add_accessor(uvs.astype(np.float32))
+    return True
+
+def encode(path, palettes, output=None, color_attr=None, metal_attr=None):
+    asset = Asset(path, writable=output is None)
+    luts = {name: palette_lut(palette) for name, palette in palettes.items()}
+
+    encoded = 0
+    for mesh_index, prim in asset.primitives():
+        encoded += encode_primitive(asset, prim, luts, color_attr, metal_attr)
+
+    # nothing encoded, nothing written (not even to -o)
+    if encoded and (output or asset.pending):
+        asset.save(output)
+    elif encoded:
+        asset.flush()
+    return encoded
+
+### QUANTIZE
+
+# normalized uint8 COLOR and uint16 TEXCOORD are core glTF, so quantized primitives
+# are marked with this primitive extra instead of an extension
+QUANTIZED = "vp_quantized"
+
+def require_extension(asset, name, required=True):
+    used = asset.gltf.setdefault("extensionsUsed", [])
+    if name not in used:
+        used.append(name)
+    if required:
+        req = asset.gltf.setdefault("extensionsRequired", [])
+        if name not in req:
+            req.append(name)
+
+def attribute_bytes(asset, prim, names):
+    # per-vertex size of the named attributes as stored
+    total = 0
+    for name in names:
+        acc = asset.accessors[prim["attributes"][name]]
+        view = asset.buffer_views[acc["bufferView"]] if "bufferView" in acc else {}
+        size = np.dtype(COMPONENT_DTYPES[acc["componentType"]]).itemsize * TYPE_SIZES[acc["type"]]
+        total += view.get("byteStride") or size
+    return total
+
+def quantize_primitive(asset, prim, luts, sizes, mask_attr="COLOR_0"):
+    """Pack AO, edge mask and both palette slots into one RGBA8 COLOR_0
+
+    r = AO, g = edge mask (from mask_attr; the addon exports its active "Color"
+    attribute, which carries them, as COLOR_0), b = color slot / 255, a = metal
+    slot / 255. TEXCOORD_1 keeps only its fractional part, as normalized uint16,
+    for the scratch lookup.
+    Returns (bytes per vertex before, after), None if already quantized, or
+    a list of errors when the primitive can't be packed; it is left untouched then.
+    """
+    attributes = prim["attributes"]
+    if prim.get("extras", {}).get(QUANTIZED):
+        return None
+    if "TEXCOORD_1" not in attributes:
+        return ["no TEXCOORD_1, palette slots are not encoded"]
+
+    colors = color_attributes(prim)
+    uvs = asset.accessor_float(attributes["TEXCOORD_1"])
+    if not np.isfinite(uvs).all():
+        return ["TEXCOORD_1: NaN/inf UVs"]
+    slots = uv_slots(uvs)
+
+    errors = []
+    palette_attrs = []
+    for axis, name in enumerate(("colors", "metals")):
+        # slots are stored as bytes
+        issue = slot_issue(name, slots[:, axis], min(sizes[name], 256))
+        if issue:
+            errors.append(issue)
+
+        # with the palette colors still there, the slots have to be the ones they encode
+        attr = best_match(asset, prim, luts[name], exclude=palette_attrs)
+        if attr:
+            palette_attrs.append(attr)
+            expected = palette_indices(asset, attributes[attr], luts[name])
+            wrong = (expected >= 0) & (expected != slots[:, axis])
+            if wrong.any():
+                errors.append(f"TEXCOORD_1 doesn't hold the {name} slots of {attr} for "
+                              f"{int(np.count_nonzero(wrong))} vertices, run encode first")
+
+    if mask_attr not in attributes:
+        errors.append(f"no {mask_attr}, AO/EdgeMask are missing")
+    elif mask_attr in palette_attrs:
+        errors.append(f"{mask_attr} holds palette colors, not AO/EdgeMask")
+    if errors:
+        return errors
+
+    packed = np.zeros((len(uvs), 4), dtype=np.uint8)
+    masks = asset.accessor_float(attributes[mask_attr])[:, :2]
+    packed[:, :2] = np.rint(np.clip(masks, 0.0, 1.0) * 255.0)
+    packed[:, 2:] = slots
+
+    fraction = uvs - np.floor(uvs)
+    fraction = np.rint(fraction * 65535.0).astype(np.uint16)
+
+    before = attribute_bytes(asset, prim, colors + ["TEXCOORD_1"])
+    for name in colors:
+        del attributes[name]
+    attributes["COLOR_0"] = asset.add_accessor(packed, normalized=True)
+    attributes["TEXCOORD_1"] = asset.add_accessor(fraction, normalized=True)
+    after = attribute_bytes(asset, prim, ["COLOR_0", "TEXCOORD_1"])
+
+    prim.setdefault("extras", {})[QUANTIZED] = True
+    return before, after
+
+def quantize(path, palettes, output=None, mask_attr="COLOR_0"):
+    """Quantize every primitive, returns (bytes before, bytes after, errors)
+
+    Nothing is written if any primitive fails, so a half packed file never
+    replaces the exported one.
+    """
+    asset = Asset(path)
+    luts = {name: palette_lut(palette) for name, palette in palettes.items()}
+    sizes = {name: len(palette) for name, palette in palettes.items()}
+
+    before = after = 0
+    errors = []
+    for mesh_index, prim in asset.primitives():
+        result = quantize_primitive(asset, prim, luts, sizes, mask_attr)
+        if isinstance(result, list):
+            mesh = asset.gltf["meshes"][mesh_index].get("name", f"mesh {mesh_index}")
+            errors += [f"{mesh}: {e}" for e in result]
+        elif result:
+            count = asset.accessors[prim["attributes"]["COLOR_0"]]["count"]
+            before += result[0] * count
+            after += result[1] * count
+
+    if asset.pending and not errors:
+        asset.save(output)
+    return before, after, errors
+
+### OPTIMIZE
+
+CACHE_SIZE = 16
+
+def cache_misses(indices, cache_size=CACHE_SIZE):
+    """Misses of a FIFO post-transform cache over a flat index buffer"""
+    cache = [-1] * cache_size
+    cached = set()
+    head = 0
+    misses = 0
+    for v in indices.tolist():
+        if v in cached:
+            continue
+        misses += 1
+        cached.discard(cache[head])
+        cache[head] = v
+        cached.add(v)
+        head = (head + 1) % cache_size
+    return misses
+
+def cache_stats(indices, cache_size=CACHE_SIZE):
+    # ACMR: misses per triangle, ATVR: misses per referenced vertex
+    misses = cache_misses(indices, cache_size)
+    return misses / max(len(indices) // 3, 1), misses / max(len(np.unique(indices)), 1)
+
+def tipsify(tris, vertex_count, cache_size=CACHE_SIZE):
+    """Reorder triangles for post-transform cache locality
+
+    Tipsify, Sander et al. 2007. tris is (n, 3), returns the new triangle
+    order as an index array into tris.
+    """
+    n = len(tris)
+    flat = tris.ravel()
+
+    # vertex -> triangles adjacency, CSR style
+    order = np.argsort(flat, kind="stable")
+    adj_tris = (order // 3).tolist()
+    offsets = np.zeros(vertex_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(flat, minlength=vertex_count), out=offsets[1:])
+    offsets = offsets.tolist()
+
+    live = np.bincount(flat, minlength=vertex_count).tolist()
+    stamp = [0] * vertex_count
+    emitted = [False] * n
+    tri_list = tris.tolist()
+
+    out = []
+    dead_end = []
+    time = cache_size + 1
+    cursor = 0
+    f = int(flat[0]) if n else -1
+
+    while f >= 0:
+        candidates = []
+        for t in adj_tris[offsets[f]:offsets[f + 1]]:
+            if emitted[t]:
+                continue
+            emitted[t] = True
+            out.append(t)
+            for v in tri_list[t]:
+                dead_end.append(v)
+                candidates.append(v)
+                live[v] -= 1
+                if time - stamp[v] > cache_size:
+                    stamp[v] = time
+                    time += 1
+
+        # next fanning vertex: the candidate still in cache with the most
+        # remaining triangles, else a recent dead end, else the next live one
+        f = -1
+        best = -1
+        for v in candidates:
+            if live[v] > 0:
+                priority = 0
+                if time - stamp[v] + 2 * live[v] <= cache_size:
+                    priority = time - stamp[v]
+                if priority > best:
+                    best = priority
+                    f = v
+
+        if f < 0:
+            while dead_end:
+                v = dead_end.pop()
+                if live[v] > 0:
+                    f = v
+                    break
+
+        if f < 0:
+            while cursor < vertex_count and live[cursor] == 0:
+                cursor += 1
+            if cursor < vertex_count:
+                f = cursor
+
+    return np.array(out, dtype=np.int64)
+
+OVERDRAW_THRESHOLD = 1.05
+
+class FifoCache:
+    """The FIFO post-transform cache cache_misses simulates, one triangle at a time"""
+    def __init__(self, cache_size=CACHE_SIZE):
+        self.cache = [-1] * cache_size
+        self.cached = set()
+        self.head = 0
+
+    def misses(self, tri):
+        misses = 0
+        for v in tri:
+            if v in self.cached:
+                continue
+            misses += 1
+            self.cached.discard(self.cache[self.head])
+            self.cache[self.head] = v
+            self.cached.add(v)
+            self.head = (self.head + 1) % len(self.cache)
+        return misses
+
+def overdraw_clusters(tris, threshold=OVERDRAW_THRESHOLD, cache_size=CACHE_SIZE):
+    """Start of each cluster of a cache-ordered triangle list
+
+    Clusters start where the cache was flushed anyway (all three vertices of
+    a triangle miss). Each is split further, from an empty cache, as soon as
+    the running ACMR of the piece is within threshold of the whole cluster's,
+    so drawing the pieces in any order costs about that much vertex cache
+    efficiency. Tipsify, Sander et al. 2007, section 4.
+    """
+    tri_list = tris.tolist()
+    cache = FifoCache(cache_size)
+    hard = [i for i, tri in enumerate(tri_list) if cache.misses(tri) == 3 or i == 0]
+    hard.append(len(tri_list))
+
+    starts = []
+    for start, end in zip(hard, hard[1:]):
+        cold = FifoCache(cache_size)
+        limit = threshold * sum(cold.misses(tri) for tri in tri_list[start:end]) / (end - start)
+
+        starts.append(start)
+        cache = FifoCache(cache_size)
+        misses = 0
+        for i in range(start, end - 1):
+            misses += cache.misses(tri_list[i])
+            if misses <= limit * (i + 1 - starts[-1]):
+                starts.append(i + 1)
+                cache = FifoCache(cache_size)
+                misses = 0
+    return np.array(starts, dtype=np.int64)
+
+def overdraw_order(tris, positions, starts):
+    """Triangle order with clusters sorted by view-independent occlusion
+
+    A cluster facing away from the mesh centre occludes more than it is
+    occluded from most viewpoints, so clusters are drawn by decreasing
+    dot(centroid - mesh centroid, normal), all area-weighted.
+    """
+    p = positions[tris].astype(np.float64)
+    normals = np.cross(p[:, 1] - p[:, 0], p[:, 2] - p[:, 0])
+    area = np.linalg.norm(normals, axis=1)
+    centroids = p.mean(axis=1)
+    mesh_centroid = (centroids * area[:, None]).sum(0) / max(area.sum(), 1e-30)
+
+    sizes = np.diff(np.append(starts, len(tris)))
+    cluster_area = np.maximum(np.add.reduceat(area, starts), 1e-30)
+    cluster_centroid = np.add.reduceat(centroids * area[:, None], starts) / cluster_area[:, None]
+    cluster_normal = np.add.reduceat(normals, starts)
+    cluster_normal /= np.maximum(np.linalg.norm(cluster_normal, axis=1), 1e-30)[:, None]
+
+    score = ((cluster_centroid - mesh_centroid) * cluster_normal).sum(1)
+    clusters = np.argsort(-score, kind="stable")
+    return np.concatenate([np.arange(starts[c], starts[c] + sizes[c]) for c in clusters])
+
+def fetch_order(indices, vertex_count):
+    """Vertex order by first use, unreferenced vertices last"""
+    first = np.full(vertex_count, len(indices), dtype=np.int64)
+    np.minimum.at(first, indices, np.arange(len(indices)))
+    return np.argsort(first, kind="stable")
+
+def optimize_primitive(asset, prim, threshold=OVERDRAW_THRESHOLD):
+    """Reorder a triangle list primitive, returns ((acmr, atvr) before, after)"""
+    if prim.get("mode", 4) != 4 or "indices" not in prim:
+        return None
+
+    index_acc = asset.accessors[prim["indices"]]
+    indices = asset.accessor(prim["indices"]).ravel().astype(np.int64)
+    vertex_count = asset.accessors[prim["attributes"]["POSITION"]]["count"]
+    before = cache_stats(indices)
+
+    tris = indices.reshape(-1, 3)
+    tris = tris[tipsify(tris, vertex_count)]
+    if len(tris):
+        positions = asset.accessor_float(prim["attributes"]["POSITION"])
+        tris = tris[overdraw_order(tris, positions, overdraw_clusters(tris, threshold))]
+
+    order = fetch_order(tris.ravel(), vertex_count)
+    remap = np.empty(vertex_count, dtype=np.int64)
+    remap[order] = np.arange(vertex_count)
+    indices = remap[tris.ravel()]
+
+    def reorder(attributes):
+        for name, index in attributes.items():
+            acc = asset.accessors[index]
+            data = asset.accessor(index)[order]
+            attributes[name] = asset.add_accessor(data, normalized=acc.get("normalized", False),
+                                                  bounds="min" in acc)
+
+    reorder(prim["attributes"])
+    for target in prim.get("targets", []):
+        reorder(target)
+
+    dtype = COMPONENT_DTYPES[index_acc["componentType"]]
+    prim["indices"] = asset.add_accessor(indices.astype(dtype), target=ELEMENT_ARRAY_BUFFER)
+
+    return before, cache_stats(indices)
+
+def optimize(path, output=None, threshold=OVERDRAW_THRESHOLD):
+    asset = Asset(path)
+
+    results = []
+    for mesh_index, prim in asset.primitives():
+        stats = optimize_primitive(asset, prim, threshold)
+        if stats:
+            results.append((asset.gltf["meshes"][mesh_index].get("name", str(mesh_index)), stats))
+
+    if asset.pending:
+        asset.save(output)
+    return results
+
+### INSTANCE
+
+INSTANCING = "EXT_mesh_gpu_instancing"
+
+def mesh_hash(asset, mesh):
+    # geometry, palette encoding and every other attribute, byte for byte
+    h = hashlib.blake2b(digest_size=20)
+    for prim in mesh.get("primitives", []):
+        h.update(repr((prim.get("mode", 4), prim.get("material"), sorted(prim["attributes"]))).encode())
+        indices = [prim["indices"]] if "indices" in prim else []
+        for index in [prim["attributes"][k] for k in sorted(prim["attributes"])] + indices:
+            acc = asset.accessors[index]
+            h.update(repr((acc["componentType"], acc["type"], acc.get("normalized", False))).encode())
+            h.update(np.ascontiguousarray(asset.accessor(index)).tobytes())
+        if prim.get("targets"):
+            h.update(repr(prim["targets"]).encode())
+    return h.hexdigest()
+
+def dedupe_meshes(asset):
+    """Point nodes at one copy of each identical mesh, returns meshes removed"""
+    meshes = asset.gltf.get("meshes", [])
+    first = {}
+    remap = []
+    for index, mesh in enumerate(meshes):
+        remap.append(first.setdefault(mesh_hash(asset, mesh), index))
+
+    kept = sorted(set(remap))
+    renumber = {old: new for new, old in enumerate(kept)}
+    asset.gltf["meshes"] = [meshes[i] for i in kept]
+    for node in asset.gltf.get("nodes", []):
+        if "mesh" in node:
+            node["mesh"] = renumber[remap[node["mesh"]]]
+    return len(meshes) - len(kept)
+
+def node_trs(node):
+    """Translation, rotation (xyzw quaternion) and scale of a node"""
+    if "matrix" not in node:
+        return (node.get("translation", [0.0, 0.0, 0.0]), node.get("rotation", [0.0, 0.0, 0.0, 1.0]),
+                node.get("scale", [1.0, 1.0, 1.0]))
+
+    m = np.array(node["matrix"], dtype=np.float64).reshape(4, 4).T
+    t = m[:3, 3]
+    s = np.linalg.norm(m[:3, :3], axis=0)
+    if np.linalg.det(m[:3, :3]) < 0:
+        s[0] = -s[0]
+    r = m[:3, :3] / np.where(s == 0, 1.0, s)
+
+    # rotation matrix -> quaternion
+    trace = r[0, 0] + r[1, 1] + r[2, 2]
+    if trace > 0:
+        k = 0.5 / math.sqrt(trace + 1.0)
+        q = [(r[2, 1] - r[1, 2]) * k, (r[0, 2] - r[2, 0]) * k, (r[1, 0] - r[0, 1]) * k, 0.25 / k]
+    elif r[0, 0] > r[1, 1] and r[0, 0] > r[2, 2]:
+        k = 2.0 * math.sqrt(1.0 + r[0, 0] - r[1, 1] - r[2, 2])
+        q = [0.25 * k, (r[0, 1] + r[1, 0]) / k, (r[0, 2] + r[2, 0]) / k, (r[2, 1] - r[1, 2]) / k]
+    elif r[1, 1] > r[2, 2]:
+        k = 2.0 * math.sqrt(1.0 + r[1, 1] - r[0, 0] - r[2, 2])
+        q = [(r[0, 1] + r[1, 0]) / k, 0.25 * k, (r[1, 2] + r[2, 1]) / k, (r[0, 2] - r[2, 0]) / k]
+    else:
+        k = 2.0 * math.sqrt(1.0 + r[2, 2] - r[0, 0] - r[1, 1])
+        q = [(r[0, 2] + r[2, 0]) / k, (r[1, 2] + r[2, 1]) / k, 0.25 * k, (r[1, 0] - r[0, 1]) / k]
+    q = np.array(q) / np.linalg.norm(q)
+    return t.tolist(), q.tolist(), s.tolist()
+
+def remove_nodes(asset, removed):
+    """Delete nodes, renumbering every reference to the ones left"""
+    nodes = asset.gltf.get("nodes", [])
+    kept = [i for i in range(len(nodes)) if i not in removed]
+    renumber = {old: new for new, old in enumerate(kept)}
+
+    def refs(indices):
+        return [renumber[i] for i in indices if i in renumber]
+
+    asset.gltf["nodes"] = [nodes[i] for i in kept]
+    for node in asset.gltf["nodes"]:
+        if "children" in node:
+            node["children"] = refs(node["children"])
+            if not node["children"]:
+                del node["children"]
+    for scene in asset.gltf.get("scenes", []):
+        scene["nodes"] = refs(scene.get("nodes", []))
+    for skin in asset.gltf.get("skins", []):
+        skin["joints"] = refs(skin["joints"])
+        if "skeleton" in skin:
+            skin["skeleton"] = renumber[skin["skeleton"]]
+    for anim in asset.gltf.get("animations", []):
+        for channel in anim.get("channels", []):
+            if "node" in channel["target"]:
+                channel["target"]["node"] = renumber[channel["target"]["node"]]
+
+def instance_nodes(asset, min_count=2):
+    """Collapse sibling leaf nodes sharing a mesh into EXT_mesh_gpu_instancing nodes
+
+    Returns the number of nodes replaced by instances.
+    """
+    nodes = asset.gltf.get("nodes", [])
+    parents = {}
+    for index, node in enumerate(nodes):
+        for child in node.get("children", []):
+            parents[child] = index
+
+    animated = set()
+    for anim in asset.gltf.get("animations", []):
+        for channel in anim.get("channels", []):
+            animated.add(channel["target"].get("node"))
+    for skin in asset.gltf.get("skins", []):
+        animated.update(skin["joints"])
+
+    groups = {}
+    for index, node in enumerate(nodes):
+        if ("mesh" not in node or node.get("children") or "skin" in node or "weights" in node
+                or "camera" in node or node.get("extensions") or index in animated):
+            continue
+        groups.setdefault((parents.get(index), node["mesh"]), []).append(index)
+
+    removed = set()
+    for (parent, mesh), members in groups.items():
+        if len(members) < min_count:
+            continue
+
+        trs = [node_trs(nodes[i]) for i in members]
+        attributes = {
+            "TRANSLATION": asset.add_accessor(np.array([t for t, r, s in trs], dtype=np.float32), target=None),
+            "ROTATION": asset.add_accessor(np.array([r for t, r, s in trs], dtype=np.float32), target=None),
+            "SCALE": asset.add_accessor(np.array([s for t, r, s in trs], dtype=np.float32), target=None),
+        }
+        # palette override pairs from the addon's vp_palette_row extra; vpipeline_import.gd
+        # puts them in the MultiMesh custom data uber_instanced.gdshader reads
+        rows = [nodes[i].get("extras", {}).get("vp_palette_row", 0) for i in members]
+        if any(rows):
+            attributes["_PALETTE_ROW"] = asset.add_accessor(np.array(rows, dtype=np.float32), target=None)
+        name = asset.gltf["meshes"][mesh].get("name", f"Mesh{mesh}")
+        nodes.append({"name": f"{name}_instances", "mesh": mesh,
+                      "extensions": {INSTANCING: {"attributes": attributes}}})
+
+        if parent is None:
+            for scene in asset.gltf.get("scenes", []):
+                if members[0] in scene.get("nodes", []):
+                    scene["nodes"].append(len(nodes) - 1)
+        else:
+            nodes[parent]["children"].append(len(nodes) - 1)
+        removed.update(members)
+
+    if removed:
+        remove_nodes(asset, removed)
+    return len(removed)
+
+def instance(path, output=None, min_count=2, required=False):
+    asset = Asset(path)
+    size = sum(len(b) for b in asset.buffers)
+
+    meshes = dedupe_meshes(asset)
+    instanced = instance_nodes(asset, min_count)
+    if instanced:
+        require_extension(asset, INSTANCING, required)
+
+    if meshes or instanced or output:
+        asset.save(output)
+    return meshes, instanced, size, sum(len(b) for b in asset.buffers)
+
+### VALIDATE
+
+def gltf_paths(sources):
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            for root, dirs, names in os.walk(source):
+                dirs.sort()
+                paths += [os.path.join(root, n) for n in sorted(names) if n.endswith(".gltf")]
+        else:
+            paths.append(source)
+    return paths
+
+def is_quantized(asset, prim):
+    # COLOR_0 as packed by quantize: normalized RGBA8 with both palette slots in b/a
+    index = prim["attributes"].get("COLOR_0")
+    if index is None or not prim.get("extras", {}).get(QUANTIZED):
+        return False
+    acc = asset.accessors[index]
+    return acc["componentType"] == 5121 and acc["type"] == "VEC4" and acc.get("normalized", False)
+
+def slot_issue(label, slots, size):
+    bad = (slots < 0) | (slots >= size)
+    n = int(np.count_nonzero(bad))
+    if n:
+        return (f"{label} slots outside [0, {size}) for {n} of {len(slots)} vertices "
+                f"(min {int(slots.min())}, max {int(slots.max())})")
+    return None
+
+def validate_primitive(asset, prim, sizes):
+    """Returns (errors, warnings) for one primitive"""
+    errors, warnings = [], []
+    attributes = prim["attributes"]
+    quantized = is_quantized(asset, prim)
+
+    finite = None
+    for name in ("TEXCOORD_0", "TEXCOORD_1"):
+        if name in attributes:
+            uvs = asset.accessor(attributes[name])
+            if uvs.dtype.kind == "f":
+                ok = np.isfinite(uvs).all(axis=1)
+                if not ok.all():
+                    errors.append(f"{name}: {int(np.count_nonzero(~ok))} NaN/inf UVs")
+                if name == "TEXCOORD_1":
+                    finite = ok
+
+    if "COLOR_0" not in attributes:
+        errors.append("no COLOR_0, AO/EdgeMask are missing")
+        masks = None
+    else:
+        masks = asset.accessor_float(attributes["COLOR_0"])
+        if not quantized and not np.isfinite(masks).all():
+            errors.append("COLOR_0: NaN/inf colors")
+        elif len(masks) and not masks[:, 0].any():
+            warnings.append("COLOR_0: AO is 0 everywhere, not baked?")
+
+    if quantized:
+        slots = asset.accessor(attributes["COLOR_0"])[:, 2:].astype(np.int64)
+    elif "TEXCOORD_1" in attributes:
+        uvs = asset.accessor_float(attributes["TEXCOORD_1"])
+        if finite is not None:
+            uvs = uvs[finite]
+        slots = uv_slots(uvs)
+    else:
+        errors.append("no TEXCOORD_1, palette slots are not encoded")
+        slots = None
+
+    if slots is not None and len(slots):
+        for axis, name in enumerate(("colors", "metals")):
+            issue = slot_issue(name, slots[:, axis], sizes[name])
+            if issue:
+                errors.append(issue)
+
+    if "indices" in prim and "POSITION" in attributes:
+        indices = asset.accessor(prim["indices"])
+        vertex_count = asset.accessors[attributes["POSITION"]]["count"]
+        if len(indices) and int(indices.max()) >= vertex_count:
+            errors.append(f"indices reach {int(indices.max())}, only {vertex_count} vertices")
+
+    return errors, warnings
+
+def validate_file(path, sizes):
+    """Validation result of one .gltf as a JSON-ready dict; never raises"""
+    result = {"file": path, "ok": True, "primitives": 0, "errors": [], "warnings": []}
+    try:
+        asset = Asset(path)
+        for mesh_index, prim in asset.primitives():
+            mesh = asset.gltf["meshes"][mesh_index].get("name", f"mesh {mesh_index}")
+            errors, warnings = validate_primitive(asset, prim, sizes)
+            result["errors"] += [f"{mesh}: {e}" for e in errors]
+            result["warnings"] += [f"{mesh}: {w}" for w in warnings]
+            result["primitives"] += 1
+    except Exception as e:
+        result["errors"].append(f"{type(e).__name__}: {e}")
+
+    result["ok"] = not result["errors"]
+    return result
+
+def validate(paths, sizes, jobs=None):
+    """Validate files across a process pool, returns the report dict"""
+    start = time.perf_counter()
+    jobs = jobs or os.cpu_count() or 1
+
+    if jobs > 1 and len(paths) > 1:
+        chunk = max(1, len(paths) // (jobs * 8))
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(validate_file, paths, [sizes] * len(paths), chunksize=chunk))
+    else:
+        results = [validate_file(path, sizes) for path in paths]
+
+    return {
+        "palette_sizes": sizes,
+        "files": len(results),
+        "failed": sum(not r["ok"] for r in results),
+        "warnings": sum(len(r["warnings"]) for r in results),
+        "seconds": round(time.perf_counter() - start, 3),
+        "results": results,
+    }
+
+### CLI
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="vpipeline_gltf", description="V Pipeline glTF tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    palette_args = argparse.ArgumentParser(add_help=False)
+    palette_args.add_argument("files", nargs="+", help=".gltf files, modified in place unless -o is given")
+    palette_args.add_argument("-o", "--output", default="", help="output .gltf (single input only)")
+    palette_args.add_argument("--shader", default=DEFAULT_SHADER, help="uber.gdshader to read palettes from")
+    palette_args.add_argument("--palettes", default="", help="JSON file with sRGB 'colors' and 'metals' lists")
+
+    p = commands.add_parser("encode", parents=[palette_args], help="write palette indices into TEXCOORD_1")
+    p.add_argument("--color-attr", default=None, help="COLOR_n holding ColorX (default: detect)")
+    p.add_argument("--metal-attr", default=None, help="COLOR_n holding MetalX (default: detect)")
+
+    p = commands.add_parser("quantize", parents=[palette_args],
+                            help="pack palette slots and AO/edge masks into normalized RGBA8")
+    p.add_argument("--mask-attr", default="COLOR_0", help="COLOR_n holding AO/EdgeMask (default: COLOR_0)")
+
+    p = commands.add_parser("optimize", help="reorder indices and vertices for cache locality")
+    p.add_argument("files", nargs="+", help=".gltf files, modified in place unless -o is given")
+    p.add_argument("-o", "--output", default="", help="output .gltf (single input only)")
+    p.add_argument("--threshold", type=float, default=OVERDRAW_THRESHOLD,
+                   help="ACMR the overdraw clusters may cost, relative to Tipsify's (default: 1.05)")
+
+    p = commands.add_parser("instance", help="merge identical meshes and instance repeats (EXT_mesh_gpu_instancing)")
+    p.add_argument("files", nargs="+", help=".gltf files, modified in place unless -o is given")
+    p.add_argument("-o", "--output", default="", help="output .gltf (single input only)")
+    p.add_argument("--min-count", type=int, default=2, help="placements needed before a mesh is instanced")
+    p.add_argument("--required", action="store_true",
+                   help="also list the extension as required (Godot 4.3 refuses such files)")
+
+    p = commands.add_parser("validate", help="check palette slots, masks, UVs and indices of exported assets")
+    p.add_argument("files", nargs="+", help=".gltf files or directories")
+    p.add_argument("--shader", default=DEFAULT_SHADER, help="uber.gdshader whose array lengths bound the slots")
+    p.add_argument("--palettes", default="", help="JSON file with sRGB 'colors' and 'metals' lists")
+    p.add_argument("--jobs", type=int, default=0, help="worker processes (default: every core)")
+    p.add_argument("--report", default="", help="write the JSON report here")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "validate":
+        palettes = load_palettes(args)
+        report = validate(gltf_paths(args.files), {name: len(p) for name, p in palettes.items()}, args.jobs)
+        if args.report:
+            with open(args.report, "w") as f:
+                json.dump(report, f, indent=1)
+        for result in report["results"]:
+            for error in result["errors"]:
+                print(f"{result['file']}: {error}")
+        print(f"{report['files']} files, {report['failed']} failed, {report['warnings']} warnings "
+              f"in {report['seconds']:.2f}s")
+        return 1 if report["failed"] else 0
+
+    if args.output and len(args.files) > 1:
+        parser.error("-o only works with a single input")
+
+    if args.command == "instance":
+        for path in args.files:
+            meshes, instanced, before, after = instance(path, args.output or None, args.min_count, args.required)
+            print(f"{path}: {meshes} duplicate meshes removed, {instanced} nodes instanced, "
+                  f".bin {before} -> {after} bytes")
+        return 0
+
+    if args.command == "optimize":
+        for path in args.files:
+            for name, (before, after) in optimize(path, args.output or None, args.threshold):
+                print(f"{path}: {name} ACMR {before[0]:.3f} -> {after[0]:.3f}, "
+                      f"ATVR {before[1]:.3f} -> {after[1]:.3f}")
+        return 0
+
+    palettes = load_palettes(args)
+
+    if args.command == "encode":
+        for path in args.files:
+            n = encode(path, palettes, args.output or None, args.color_attr, args.metal_attr)
+            print(f"{path}: encoded {n} primitives")
+
+    elif args.command == "quantize":
+        failed = 0
+        for path in args.files:
+            before, after, errors = quantize(path, palettes, args.output or None, args.mask_attr)
+            for error in errors:
+                print(f"{path}: {error}")
+            if errors:
+                print(f"{path}: not quantized")
+                failed += 1
+                continue
+            ratio = before / after if after else 0.0
+            print(f"{path}: palette/mask attributes {before} -> {after} bytes ({ratio:.1f}x smaller)")
+        return 1 if failed else 0
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
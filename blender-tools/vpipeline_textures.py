@@ -0,0 +1,296 @@
+"""Offline texture build for the uber shader. No Blender required, only NumPy.
+
+    python vpipeline_textures.py pack trim-sheet.png scratches.png -o uber_packed.dds
+
+pack: stores the scratch mask (red channel of scratches.png) in the alpha
+channel of the trim sheet normal map, so uber_packed.gdshader binds a single
+sampler instead of two. The output is a DDS with the full mip chain already
+built: normal mips are averaged and renormalized instead of box filtered, the
+mask is box filtered. The default BC3 (DXT5) format keeps the normal in the
+color block and the mask in the interpolated alpha block, 1 byte per texel;
+--format rgba8 writes it uncompressed. --png also writes mip 0 as a PNG.
+
+PNG files are decoded and encoded here with zlib and NumPy (8/16-bit gray,
+gray+alpha, RGB and RGBA, non-interlaced).
+"""
+
+import argparse, struct, sys, zlib
+import numpy as np
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# channels per PNG color type
+PNG_CHANNELS = {0: 1, 2: 3, 4: 2, 6: 4}
+
+DDS_FORMATS = ("bc3", "rgba8")
+
+### PNG
+
+def png_chunks(data):
+    pos = len(PNG_SIGNATURE)
+    while pos < len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        yield kind, data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+
+def unfilter(raw, height, row_bytes, bpp):
+    """Undo the PNG scanline filters.
+
+    Average and Paeth depend on the already decoded left neighbour, so rows can't
+    be vectorized on their own. Each texel only depends on the texels left, above
+    and above-left of it though, so every anti-diagonal is decoded in one step,
+    whatever the filters of the rows it crosses.
+    """
+    lines = np.frombuffer(raw, dtype=np.uint8).reshape(height, row_bytes + 1)
+    filters = lines[:, 0]
+    width = row_bytes // bpp
+
+    # one row and column of zeros stand in for the missing neighbours at the edges
+    out = np.zeros((height + 1, width + 1, bpp), dtype=np.int16)
+    filtered = lines[:, 1:].reshape(height, width, bpp).astype(np.int16)
+
+    if not np.isin(filters, (3, 4)).any():
+        # Sub and Up only: prefix sums along and down the rows
+        for y in range(height):
+            row = filtered[y]
+            if filters[y] == 1:
+                row = np.cumsum(row, axis=0, dtype=np.int32)
+            elif filters[y] == 2:
+                row = row + out[y, 1:]
+            out[y + 1, 1:] = row & 0xFF
+        return out[1:, 1:].astype(np.uint8)
+
+    for d in range(width + height - 1):
+        ys = np.arange(max(0, d - width + 1), min(height, d + 1))
+        xs = d - ys
+        f = filters[ys][:, None]
+        a = out[ys + 1, xs]
+        b = out[ys, xs + 1]
+        c = out[ys, xs]
+
+        p = a + b - c
+        pa, pb, pc = np.abs(p - a), np.abs(p - b), np.abs(p - c)
+        paeth = np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+
+        pred = np.select([f == 1, f == 2, f == 3, f == 4], [a, b, (a + b) >> 1, paeth], 0)
+        out[ys + 1, xs + 1] = (filtered[ys, xs] + pred) & 0xFF
+
+    return out[1:, 1:].astype(np.uint8)
+
+def read_png(path):
+    """Decode a PNG into an (h, w, channels) uint8 or uint16 array"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError(f"{path}: not a PNG file")
+
+    header, idat = None, []
+    for kind, body in png_chunks(data):
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", body)
+        elif kind == b"IDAT":
+            idat.append(body)
+
+    width, height, depth, color_type, _, _, interlace = header
+    if color_type not in PNG_CHANNELS or depth not in (8, 16) or interlace:
+        raise ValueError(f"{path}: unsupported PNG (color type {color_type}, {depth}-bit, interlace {interlace})")
+
+    channels = PNG_CHANNELS[color_type]
+    bpp = channels * depth // 8
+    pixels = unfilter(zlib.decompress(b"".join(idat)), height, width * bpp, bpp)
+
+    if depth == 16:
+        pixels = pixels.reshape(height, width * channels, 2).view(">u2")[..., 0].astype(np.uint16)
+    return pixels.reshape(height, width, channels)
+
+def write_png(path, pixels):
+    """Encode an (h, w, channels) uint8 array, Up-filtering every row"""
+    height, width, channels = pixels.shape
+    color_type = {v: k for k, v in PNG_CHANNELS.items()}[channels]
+
+    rows = pixels.reshape(height, width * channels).astype(np.int16)
+    up = (rows - np.vstack([np.zeros((1, rows.shape[1]), dtype=np.int16), rows[:-1]])) & 0xFF
+    lines = np.hstack([np.full((height, 1), 2, dtype=np.uint8), up.astype(np.uint8)])
+
+    def chunk(kind, body):
+        return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+    with open(path, "wb") as f:
+        f.write(PNG_SIGNATURE)
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(lines.tobytes(), 6)))
+        f.write(chunk(b"IEND", b""))
+
+def to_8bit(pixels):
+    if pixels.dtype == np.uint16:
+        return ((pixels.astype(np.uint32) * 255 + 32767) // 65535).astype(np.uint8)
+    return pixels
+
+### PACK
+
+def pack(trim, scratches):
+    """Normal map RGB with the scratch mask in alpha, as (h, w, 4) uint8"""
+    trim, scratches = to_8bit(trim), to_8bit(scratches)
+    if trim.shape[:2] != scratches.shape[:2]:
+        raise ValueError(f"trim sheet is {trim.shape[1]}x{trim.shape[0]}, "
+                         f"scratches are {scratches.shape[1]}x{scratches.shape[0]}")
+
+    packed = np.empty(trim.shape[:2] + (4,), dtype=np.uint8)
+    packed[..., :3] = trim[..., :3] if trim.shape[2] >= 3 else trim[..., :1]
+    packed[..., 3] = scratches[..., 0]
+    return packed
+
+### MIPS
+
+def halve(values):
+    # 2x2 box filter on float data; odd edges drop their last row/column, 1 texel axes stay
+    for axis in (0, 1):
+        n = values.shape[axis]
+        if n > 1:
+            values = np.take(values, np.arange(n // 2 * 2), axis=axis)
+            shape = values.shape[:axis] + (n // 2, 2) + values.shape[axis + 1:]
+            values = values.reshape(shape).mean(axis=axis + 1)
+    return values
+
+def mip_chain(packed, normal=True):
+    """Every level down to 1x1; RGB is treated as a unit normal when normal is set"""
+    levels = [packed]
+    values = packed.astype(np.float32) / 255.0
+    if normal:
+        values[..., :3] = values[..., :3] * 2.0 - 1.0
+
+    while values.shape[0] > 1 or values.shape[1] > 1:
+        values = halve(values)
+        level = values.copy()
+        if normal:
+            n = level[..., :3]
+            n /= np.maximum(np.linalg.norm(n, axis=-1, keepdims=True), 1e-6)
+            level[..., :3] = n * 0.5 + 0.5
+        levels.append(np.rint(np.clip(level, 0.0, 1.0) * 255.0).astype(np.uint8))
+
+    return levels
+
+### DDS
+
+def blocks(level):
+    # (n, 16, 4) texel blocks in row-major block order, edges padded by repetition
+    h, w = level.shape[:2]
+    ph, pw = -h % 4, -w % 4
+    if ph or pw:
+        level = np.pad(level, ((0, ph), (0, pw), (0, 0)), mode="edge")
+    h, w = level.shape[:2]
+    return level.reshape(h // 4, 4, w // 4, 4, 4).transpose(0, 2, 1, 3, 4).reshape(-1, 16, 4)
+
+def rgb565(rgb):
+    r, g, b = (np.rint(rgb[..., i] * (m / 255.0)).astype(np.uint16) for i, m in enumerate((31, 63, 31)))
+    return (r << 11) | (g << 5) | b
+
+def expand565(c):
+    r, g, b = (c >> 11) & 31, (c >> 5) & 63, c & 31
+    return np.stack([r * 255.0 / 31, g * 255.0 / 63, b * 255.0 / 31], axis=-1)
+
+def pack_indices(indices, bits):
+    shifts = np.arange(16, dtype=np.uint64) * np.uint64(bits)
+    return np.bitwise_or.reduce(indices.astype(np.uint64) << shifts, axis=1)
+
+def bc3_blocks(level):
+    """Bounding box BC3 encoder: color endpoints from the block's RGB extent, inset by 1/16
+
+    The box diagonal follows the block's colors: channels that fall while the widest
+    one rises get their min/max swapped, otherwise e.g. a red-up/green-down normal
+    gradient would be fitted on the wrong diagonal.
+    """
+    texels = blocks(level).astype(np.float32)
+    rgb, alpha = texels[..., :3], texels[..., 3]
+
+    lo, hi = rgb.min(axis=1), rgb.max(axis=1)
+    d = rgb - (lo + hi)[:, None] / 2.0
+    main = np.take_along_axis(d, (hi - lo).argmax(axis=1)[:, None, None], axis=2)
+    flip = (main * d).sum(axis=1) < 0.0
+    lo, hi = np.where(flip, hi, lo), np.where(flip, lo, hi)
+    inset = (hi - lo) / 16.0
+    c0, c1 = rgb565(np.clip(hi - inset, 0, 255)), rgb565(np.clip(lo + inset, 0, 255))
+    swap = c0 < c1
+    c0, c1 = np.where(swap, c1, c0), np.where(swap, c0, c1)
+
+    e0, e1 = expand565(c0), expand565(c1)
+    colors = np.stack([e0, e1, (2 * e0 + e1) / 3, (e0 + 2 * e1) / 3], axis=1)
+    dist = ((rgb[:, :, None, :] - colors[:, None, :, :]) ** 2).sum(axis=-1)
+    color_idx = np.where((c0 == c1)[:, None], 0, dist.argmin(axis=2))
+
+    a0, a1 = alpha.max(axis=1), alpha.min(axis=1)
+    weights = np.array([0, 7, 1, 2, 3, 4, 5, 6], dtype=np.float32)
+    ramp = (a0[:, None] * (7 - weights) + a1[:, None] * weights) / 7
+    alpha_idx = np.abs(alpha[:, :, None] - ramp[:, None, :]).argmin(axis=2)
+    alpha_idx = np.where((a0 == a1)[:, None], 0, alpha_idx)
+
+    out = np.zeros((len(texels), 16), dtype=np.uint8)
+    out[:, 0] = a0.astype(np.uint8)
+    out[:, 1] = a1.astype(np.uint8)
+    out[:, 2:8] = pack_indices(alpha_idx, 3)[:, None].view(np.uint8).reshape(-1, 8)[:, :6]
+    out[:, 8:10] = c0[:, None].view(np.uint8)
+    out[:, 10:12] = c1[:, None].view(np.uint8)
+    out[:, 12:16] = pack_indices(color_idx, 2).astype(np.uint32)[:, None].view(np.uint8)
+    return out.tobytes()
+
+def write_dds(path, levels, format="bc3"):
+    """Write a mip chain as DDS, DXT5 compressed or plain RGBA8"""
+    h, w = levels[0].shape[:2]
+
+    if format == "bc3":
+        data = [bc3_blocks(level) for level in levels]
+        flags = 0x1 | 0x2 | 0x4 | 0x1000 | 0x20000 | 0x80000  # caps, size, pixel format, mips, linear size
+        pitch = len(data[0])
+        pixel_format = struct.pack("<II4sIIIII", 32, 0x4, b"DXT5", 0, 0, 0, 0, 0)
+    else:
+        data = [level.tobytes() for level in levels]
+        flags = 0x1 | 0x2 | 0x4 | 0x8 | 0x1000 | 0x20000  # caps, size, pitch, pixel format, mips
+        pitch = w * 4
+        pixel_format = struct.pack("<II4sIIIII", 32, 0x1 | 0x40, b"\0\0\0\0", 32,
+                                   0x000000FF, 0x0000FF00, 0x00FF0000, 0xFF000000)
+
+    header = struct.pack("<7I", 124, flags, h, w, pitch, 0, len(levels)) + b"\0" * 44
+    header += pixel_format
+    header += struct.pack("<5I", 0x1000 | 0x8 | 0x400000, 0, 0, 0, 0)  # texture, complex, mipmap
+
+    with open(path, "wb") as f:
+        f.write(b"DDS ")
+        f.write(header)
+        for level in data:
+            f.write(level)
+
+    return sum(len(level) for level in data)
+
+### CLI
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="vpipeline_textures", description="V Pipeline texture build")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("pack", help="pack the scratch mask into the trim sheet alpha, with mips")
+    p.add_argument("trim", help="trim sheet normal map (.png)")
+    p.add_argument("scratches", help="scratch mask (.png), red channel is used")
+    p.add_argument("-o", "--output", required=True, help="output .dds")
+    p.add_argument("--format", choices=DDS_FORMATS, default="bc3", help="DDS pixel format")
+    p.add_argument("--png", default="", help="also write mip 0 to this .png")
+    p.add_argument("--no-normal", action="store_true", help="box filter RGB mips instead of renormalizing")
+
+    args = parser.parse_args(argv)
+
+    try:
+        trim, scratches = read_png(args.trim), read_png(args.scratches)
+        packed = pack(trim, scratches)
+    except ValueError as e:
+        parser.error(str(e))
+
+    levels = mip_chain(packed, not args.no_normal)
+    size = write_dds(args.output, levels, args.format)
+    if args.png:
+        write_png(args.png, packed)
+
+    print(f"{args.output}: {packed.shape[1]}x{packed.shape[0]}, {len(levels)} mips, {args.format}, "
+          f"{size} bytes for both textures")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
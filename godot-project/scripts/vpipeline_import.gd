@@ -0,0 +1,108 @@
+@tool
+extends EditorScenePostImport
+
+# Post-import script for V Pipeline glTF exports. Objects with a palette override are
+# exported with a vp_palette_row extra, which Godot imports as "extras" metadata; it is
+# copied to the palette_row instance uniform of uber_instanced.gdshader.
+#
+# Godot's glTF importer doesn't read EXT_mesh_gpu_instancing, so nodes written by
+# vpipeline_gltf.py instance come in as a single mesh. They are rebuilt here as a
+# MultiMeshInstance3D from the .gltf itself, with the _PALETTE_ROW attribute in the
+# custom data (INSTANCE_CUSTOM.r).
+
+const INSTANCING = "EXT_mesh_gpu_instancing"
+const FLOAT = 5126
+const COMPONENTS = {"SCALAR": 1, "VEC3": 3, "VEC4": 4}
+
+func _post_import(scene):
+	apply_palette_rows(scene)
+	build_multimeshes(scene, get_source_file())
+	return scene
+
+func apply_palette_rows(node):
+	if node is GeometryInstance3D and node.has_meta("extras"):
+		var extras = node.get_meta("extras")
+		if extras is Dictionary and extras.has("vp_palette_row"):
+			node.set_instance_shader_parameter("palette_row", int(extras["vp_palette_row"]))
+	for child in node.get_children():
+		apply_palette_rows(child)
+
+func build_multimeshes(scene, path):
+	if path.get_extension().to_lower() != "gltf":
+		return
+	var gltf = JSON.parse_string(FileAccess.get_file_as_string(path))
+	if not gltf is Dictionary:
+		return
+
+	var buffers = []
+	for buffer in gltf.get("buffers", []):
+		buffers.append(read_buffer(buffer.get("uri", ""), path.get_base_dir()))
+
+	for node in gltf.get("nodes", []):
+		var instancing = node.get("extensions", {}).get(INSTANCING)
+		if instancing == null or not node.has("name"):
+			continue
+		var target = scene.find_child(String(node["name"]).validate_node_name(), true, false)
+		if target is MeshInstance3D:
+			replace_with_multimesh(scene, target, gltf, buffers, instancing.get("attributes", {}))
+
+func read_buffer(uri, base_dir):
+	if uri.begins_with("data:"):
+		return Marshalls.base64_to_raw(uri.get_slice(",", 1))
+	return FileAccess.get_file_as_bytes(base_dir.path_join(uri.uri_decode()))
+
+func read_floats(gltf, buffers, index):
+	# the float accessors vpipeline_gltf.py writes, one PackedFloat32Array per element
+	var accessor = gltf["accessors"][int(index)]
+	var view = gltf["bufferViews"][int(accessor["bufferView"])]
+	var width = COMPONENTS[accessor["type"]]
+	if int(accessor["componentType"]) != FLOAT:
+		push_warning("V Pipeline: skipping non-float instancing accessor %d" % index)
+		return []
+
+	var data = buffers[int(view["buffer"])]
+	var start = int(view.get("byteOffset", 0)) + int(accessor.get("byteOffset", 0))
+	var stride = int(view.get("byteStride", width * 4))
+	var values = []
+	for i in int(accessor["count"]):
+		var element = PackedFloat32Array()
+		for c in width:
+			element.append(data.decode_float(start + i * stride + c * 4))
+		values.append(element)
+	return values
+
+func replace_with_multimesh(scene, node, gltf, buffers, attributes):
+	var translations = read_floats(gltf, buffers, attributes["TRANSLATION"]) if attributes.has("TRANSLATION") else []
+	var rotations = read_floats(gltf, buffers, attributes["ROTATION"]) if attributes.has("ROTATION") else []
+	var scales = read_floats(gltf, buffers, attributes["SCALE"]) if attributes.has("SCALE") else []
+	var rows = read_floats(gltf, buffers, attributes["_PALETTE_ROW"]) if attributes.has("_PALETTE_ROW") else []
+	var count = max(translations.size(), rotations.size(), scales.size())
+	if count == 0:
+		return
+
+	var multimesh = MultiMesh.new()
+	multimesh.transform_format = MultiMesh.TRANSFORM_3D
+	multimesh.use_custom_data = true
+	multimesh.mesh = node.mesh
+	multimesh.instance_count = count
+	for i in count:
+		var t = translations[i] if i < translations.size() else PackedFloat32Array([0, 0, 0])
+		var r = rotations[i] if i < rotations.size() else PackedFloat32Array([0, 0, 0, 1])
+		var s = scales[i] if i < scales.size() else PackedFloat32Array([1, 1, 1])
+		var basis = Basis(Quaternion(r[0], r[1], r[2], r[3])) * Basis.from_scale(Vector3(s[0], s[1], s[2]))
+		multimesh.set_instance_transform(i, Transform3D(basis, Vector3(t[0], t[1], t[2])))
+		multimesh.set_instance_custom_data(i, Color(rows[i][0] if i < rows.size() else 0.0, 0, 0, 0))
+
+	var instances = MultiMeshInstance3D.new()
+	instances.name = node.name
+	instances.transform = node.transform
+	instances.multimesh = multimesh
+	instances.material_override = node.material_override
+
+	var parent = node.get_parent()
+	var index = node.get_index()
+	parent.remove_child(node)
+	node.free()
+	parent.add_child(instances)
+	parent.move_child(instances, index)
+	instances.owner = scene